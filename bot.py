@@ -1,101 +1,66 @@
 import os
-import json
-import requests
+import time
+import asyncio
+import functools
 from datetime import datetime, timedelta, time as dtime
 
 from telegram import Update
+from telegram.error import RetryAfter, Forbidden, BadRequest
 from telegram.ext import (
     Application,
     CommandHandler,
     ContextTypes
 )
 
+from nds.config import (
+    SYMBOL, LIMIT, TF_MS, SIGNAL_TF, NEAR_BREAKOUT_USD, SIGNAL_STALE_SECONDS, PRICE_TICK_SECONDS, INSTANCE_ID, LEADER_LEASE_SECONDS, LEADER_RENEW_SECONDS,
+    STATE_SYNC_SECONDS, DEPTH_FILTER, DEPTH_MIN_IMBALANCE, VWAP_FILTER, PROFILE_BIN_USD, VALUE_AREA_SHARE,
+    ALERT_SEND_BATCH, MAX_ALERTS_PER_USER, UNIVERSE, REGIME_TF, REGIME_BARS, REGIME_CLUSTER_CORR,
+    REGIME_SCAN_SECONDS, PERF_RING_SIZE, OUTBOX_DRAIN_SECONDS, OUTBOX_SEND_BATCH, OUTBOX_MAX_ATTEMPTS,
+    SIGNAL_LOG_FILE, VIP_FILE, RESTART_LOG_FILE, SNAPSHOT_INTERVAL, STATS_DAYS_KEPT
+)
+from nds.timeutil import iran_time, time_str, today_str
+from nds.state import STATE, load_json, save_json
+from nds.storage import (
+    record_signal, record_strong_move, record_outcome, load_stats, get_day_stats,
+    get_range_stats, grade_counts, backtest_report, get_limit_state, _limit_key
+)
+from nds.market import (
+    MEXC, get_candles, cached_candles, restore_candles, get_depth_book, session_vwap,
+    vwap_summary, profile_summary,
+    composite_ticker, hedged, get_last_price, fetch_universe
+)
+from nds.orderbook import depth_features
+from nds.moves import StrongMoveDetector
+from nds.outcomes import OutcomeTracker
+from nds.alerts import AlertBook, format_alert
+from nds.subscriptions import SubscriptionIndex, parse_subscription, format_subscription
+from nds.strategy import (
+    render_signal, next_poll, candle_hash, evaluate_breakout,
+    signal_atr, trade_levels
+)
+from nds.snapshot import write_snapshot, read_snapshot
+from nds.regime import RegimeScanner, ClusterGate, regime_of
+from nds.perf import PERF, render_perf
+from nds.outbox import Outbox
+
 # =========================
 # CONFIG - V7.9 (STRATEGY B + FULL FEATURES)
 # =========================
+# ثابت‌های استراتژی و ذخیره‌سازی در nds/config.py هستند؛ اینجا فقط تنظیمات تلگرام.
 TOKEN = os.getenv("TELEGRAM_TOKEN")
 
 WEBHOOK_URL = os.getenv("WEBHOOK_URL", "https://your-render-service.onrender.com")
 WEBHOOK_PATH = "/webhook"
 
-SYMBOL = "BTCUSDT"
-LIMIT = 200  # داده‌ی بیشتر برای اندیکاتورها
-
-MIN_PROFIT_USD = 50
-
-RSI_PERIOD = 14
-VOLUME_MULTIPLIER = 0.9
-ATR_PERIOD = 14
-ADX_PERIOD = 14
-
-FUNDING_THRESHOLD = 0.005
-
-DEFAULT_CAPITAL = 10000
-RISK_PERCENT = 0.01
-SAFE_LEVERAGE_LONG = 5
-SAFE_LEVERAGE_SHORT = 3
-
-STRENGTH_THRESHOLD_A = 0.50
-STRENGTH_THRESHOLD_B = 0.40
-STRENGTH_THRESHOLD_C = 0.30
-STRENGTH_THRESHOLD_D = 0.20
-
-STRONG_MOVE_USD = 200
-
-D1_THRESHOLDS = {
-    "15m": 600,
-    "30m": 900,
-    "1h": 1200
-}
-
-MAX_C_SIGNALS_PER_DAY = 6
-MAX_D_SIGNALS_PER_DAY = 8
-
-# =========================
-# PERSISTENT FILES
-# =========================
-SIGNAL_LOG_FILE = "signal_log.json"
-STRONG_MOVE_LOG_FILE = "strong_move_log.json"
-RESTART_LOG_FILE = "restart_log.json"
-VIP_FILE = "vip_users.json"
-LIMIT_FILE = "limit_state.json"
-
 VIP_USERS = set()
 ADMIN_ID = None
 
 # مانیتورینگ اجرای auto_signal
 LAST_SIGNAL_RUN = None
-
-# =========================
-# TIME (IRAN)
-# =========================
-def iran_time():
-    return datetime.utcnow() + timedelta(hours=3, minutes=30)
-
-def time_str():
-    return iran_time().strftime("%Y-%m-%d | %H:%M")
-
-def today_str():
-    return iran_time().strftime("%Y-%m-%d")
-
-# =========================
-# JSON HELPERS
-# =========================
-def load_json(path, default):
-    if os.path.exists(path):
-        try:
-            with open(path, "r") as f:
-                return json.load(f)
-        except Exception:
-            return default
-    return default
-
-def save_json(path, data):
-    try:
-        with open(path, "w") as f:
-            json.dump(data, f, indent=2)
-    except Exception:
-        pass
+LAST_CANDLE_HASH = None
+LAST_NEAR = False
+LAST_SIGNAL_KEY = None  # (candle_time, direction) تا یک کندل دوبار سیگنال ندهد
 
 # =========================
 # VIP
@@ -109,561 +74,375 @@ def load_vips():
 def save_vips():
     save_json(VIP_FILE, {"admin": ADMIN_ID, "vips": list(VIP_USERS)})
 
-load_vips()
-
 # =========================
-# LIMITS (GRADE-BASED)
+# LEADER ELECTION
 # =========================
-def get_limit_state():
-    return load_json(
-        LIMIT_FILE,
-        {"date": today_str(), "c_count": 0, "d_count": 0}
-    )
-
-def can_send_grade(grade):
-    state = get_limit_state()
-    today = today_str()
-    if state.get("date") != today:
-        state = {"date": today, "c_count": 0, "d_count": 0}
-
-    if grade == "C":
-        if state["c_count"] >= MAX_C_SIGNALS_PER_DAY:
-            save_json(LIMIT_FILE, state)
-            return False
-        state["c_count"] += 1
-    elif grade == "D":
-        if state["d_count"] >= MAX_D_SIGNALS_PER_DAY:
-            save_json(LIMIT_FILE, state)
-            return False
-        state["d_count"] += 1
-
-    save_json(LIMIT_FILE, state)
-    return True
+# فقط نسخه‌ای که lease را دارد jobهای زمان‌بندی‌شده را اجرا می‌کند؛
+# webhook روی همه‌ی نسخه‌ها پاسخ می‌دهد.
+IS_LEADER = False
 
-# =========================
-# MARKET DATA
-# =========================
-def get_klines(interval, limit=LIMIT):
+def renew_leadership():
+    global IS_LEADER
+    was = IS_LEADER
     try:
-        r = requests.get(
-            "https://api.mexc.com/api/v3/klines",
-            params={"symbol": SYMBOL, "interval": interval, "limit": limit},
-            timeout=10
-        )
-        r.raise_for_status()
-        data = r.json()
-        candles = []
-        for k in data:
-            candles.append({
-                "open": float(k[1]),
-                "high": float(k[2]),
-                "low": float(k[3]),
-                "close": float(k[4]),
-                "volume": float(k[5])
-            })
-        return candles
-    except requests.exceptions.RequestException:
-        return None
-    except (ValueError, KeyError, TypeError):
-        return None
-
-def get_funding_and_oi():
-    try:
-        r = requests.get("https://api.mexc.com/api/v3/premiumIndex", params={"symbol": SYMBOL}, timeout=10)
-        r.raise_for_status()
-        funding_raw = r.json().get("fundingRate")
-        funding = float(funding_raw)
-
-        r_oi = requests.get("https://api.mexc.com/api/v3/openInterest", params={"symbol": SYMBOL}, timeout=10)
-        r_oi.raise_for_status()
-        oi_raw = r_oi.json().get("openInterestValue")
-        oi = float(oi_raw)
-        return funding, oi
-    except requests.exceptions.RequestException:
-        return None, None
-    except (ValueError, KeyError, TypeError):
-        return None, None
+        IS_LEADER = STATE.acquire_lease("leader", INSTANCE_ID, LEADER_LEASE_SECONDS)
+    except Exception:
+        IS_LEADER = False
+    return IS_LEADER and not was
+
+async def in_thread(fn, *args, **kwargs):
+    # فراخوانی‌های sync شبکه (انتظار بودجه، backoff، timeout) در thread pool اجرا می‌شوند
+    # تا event loop و بقیه‌ی update ها و job ها معطل نمانند
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+def leader_only(job):
+    @functools.wraps(job)
+    async def wrapped(context):
+        if not IS_LEADER:
+            return
+        return await job(context)
+    return wrapped
 
 # =========================
-# INDICATORS
+# D-1 MOVE DETECTION
 # =========================
-def calculate_rsi(c, period=RSI_PERIOD):
-    closes = [x["close"] for x in c]
-    if len(closes) < period + 1:
-        return 50
-    delta = [closes[i] - closes[i-1] for i in range(1, len(closes))]
-    gains = [d if d > 0 else 0 for d in delta]
-    losses = [-d if d < 0 else 0 for d in delta]
-    avg_gain = sum(gains[-period:]) / period
-    avg_loss = sum(losses[-period:]) / period
-    if avg_loss == 0:
-        return 100
-    rs = avg_gain / avg_loss
-    return 100 - (100 / (1 + rs))
-
-def volume_filter(c, grade_level="A"):
-    vols = [x["volume"] for x in c[-21:-1]]
-    if not vols:
-        return False
-    avg_vol = sum(vols) / len(vols)
-    multiplier = 0.80 if grade_level in ["C", "D"] else 1.0 if grade_level == "B" else VOLUME_MULTIPLIER
-    return c[-1]["volume"] > avg_vol * multiplier
-
-def calculate_atr(c, period=ATR_PERIOD):
-    if len(c) < period + 1:
-        return 0
-    trs = []
-    for i in range(1, len(c)):
-        tr = max(
-            c[i]["high"] - c[i]["low"],
-            abs(c[i]["high"] - c[i-1]["close"]),
-            abs(c[i]["low"] - c[i-1]["close"])
-        )
-        trs.append(tr)
-    return sum(trs[-period:]) / period
-
-def calculate_adx(c, period=ADX_PERIOD):
-    if len(c) < period + 20:
-        return 0
-    tr_list = []
-    for i in range(1, len(c)):
-        tr = max(
-            c[i]["high"] - c[i]["low"],
-            abs(c[i]["high"] - c[i-1]["close"]),
-            abs(c[i]["low"] - c[i-1]["close"])
-        )
-        tr_list.append(tr)
-
-    plus_dm = []
-    minus_dm = []
-    for i in range(1, len(c)):
-        up = c[i]["high"] - c[i-1]["high"]
-        down = c[i-1]["low"] - c[i]["low"]
-        plus_dm.append(up if up > down and up > 0 else 0)
-        minus_dm.append(down if down > up and down > 0 else 0)
-
-    atr = tr_list[period-1]
-    atr_list = [atr]
-    for i in range(period, len(tr_list)):
-        atr = (atr * (period - 1) + tr_list[i]) / period
-        atr_list.append(atr)
-
-    plus_di = [100 * plus_dm[period-1] / atr_list[0] if atr_list[0] > 0 else 0]
-    minus_di = [100 * minus_dm[period-1] / atr_list[0] if atr_list[0] > 0 else 0]
-    for i in range(period, len(plus_dm)):
-        denom = atr_list[i - period + 1]
-        pdi = 100 * ((plus_di[-1] * (period - 1) + plus_dm[i]) / period) / denom if denom > 0 else 0
-        mdi = 100 * ((minus_di[-1] * (period - 1) + minus_dm[i]) / period) / denom if denom > 0 else 0
-        plus_di.append(pdi)
-        minus_di.append(mdi)
-
-    dx_list = []
-    for i in range(len(plus_di)):
-        s = plus_di[i] + minus_di[i]
-        dx = 100 * abs(plus_di[i] - minus_di[i]) / s if s > 0 else 0
-        dx_list.append(dx)
-
-    adx = sum(dx_list[-period:]) / period if len(dx_list) >= period else 0
-    return adx
+STRONG_MOVES = StrongMoveDetector()
 
-# =========================
-# STRUCTURE & PRICE ACTION (قدیمی – فعلاً استفاده نمی‌شود ولی نگه می‌داریم)
-# =========================
-def htf_bias_4h():
-    c = get_klines("4h", limit=60)
-    if not c or len(c) < 10:
-        return None
-    lows = [x["low"] for x in c[-10:]]
-    highs = [x["high"] for x in c[-10:]]
-    long_count = sum(1 for i in range(1, 10) if lows[i] > lows[i-1])
-    short_count = sum(1 for i in range(1, 10) if highs[i] < highs[i-1])
-    if long_count >= 6:
-        return "LONG"
-    if short_count >= 6:
-        return "SHORT"
-    return None
-
-def liquidity_sweep(c, bias, grade_level="A"):
-    threshold = 1.02 if grade_level in ["C", "D"] else 1.01 if grade_level == "B" else 1.0
-    if len(c) < 7:
-        return False
-    if bias == "LONG":
-        min_low = min(x["low"] for x in c[-6:-1])
-        return c[-1]["low"] < min_low * threshold
-    if bias == "SHORT":
-        max_high = max(x["high"] for x in c[-6:-1])
-        return c[-1]["high"] > max_high * (2 - threshold)
-    return False
-
-def detect_fvg(c, bias, grade_level="A"):
-    if len(c) < 3:
-        return None
-    threshold = 1.02 if grade_level in ["C", "D"] else 1.01 if grade_level == "B" else 1.0
-    c1, c2, c3 = c[-3], c[-2], c[-1]
-    if bias == "LONG":
-        if c1["high"] < c3["low"] * threshold and c2["low"] > c1["high"]:
-            return (c1["high"], c3["low"] * threshold)
-    if bias == "SHORT":
-        if c1["low"] > c3["high"] * (2 - threshold) and c2["high"] < c1["low"]:
-            return (c3["high"] * (2 - threshold), c1["low"])
-    return None
-
-def compression(c, grade_level="A"):
-    if len(c) < 7:
-        return False
-    ranges = [x["high"] - x["low"] for x in c[-6:-1]]
-    if not ranges:
-        return False
-    avg_range = sum(ranges) / len(ranges)
-    threshold = 0.9 if grade_level in ["C", "D"] else 0.85 if grade_level == "B" else 0.7
-    return (c[-1]["high"] - c[-1]["low"]) < avg_range * threshold
+def detect_d1_move_multi():
+    return STRONG_MOVES.current()
 
-def early_bias(c):
-    if len(c) < 4:
-        return None
-    lows = [x["low"] for x in c[-4:]]
-    highs = [x["high"] for x in c[-4:]]
-    if lows[-1] > lows[-2] > lows[-3]:
-        return "LONG"
-    if highs[-1] < highs[-2] < highs[-3]:
-        return "SHORT"
-    return None
-
-def displacement(c, bias, grade_level="A"):
-    if len(c) < 2:
-        return False
-    last, prev = c[-1], c[-2]
-    body = abs(last["close"] - last["open"])
-    full = last["high"] - last["low"]
-    if full == 0:
-        return False
-    strength = body / full
-    threshold = (
-        STRENGTH_THRESHOLD_A if grade_level == "A"
-        else STRENGTH_THRESHOLD_B if grade_level == "B"
-        else STRENGTH_THRESHOLD_C if grade_level == "C"
-        else STRENGTH_THRESHOLD_D
-    )
-    if bias == "LONG" and last["close"] > prev["high"] and strength > threshold:
-        return True
-    if bias == "SHORT" and last["close"] < prev["low"] and strength > threshold:
-        return True
-    return False
+def track_strong_moves(c):
+    for ev in STRONG_MOVES.feed(c[:-1]):
+        ev.update({"date": today_str(), "time": time_str(), "symbol": SYMBOL})
+        record_strong_move(ev)
 
 # =========================
-# SUPPORT / RESISTANCE (1H)
+# OUTCOME TRACKER (SL / TP1 / TP2)
 # =========================
-def find_nearest_sr_1h(current_price, direction):
-    c = get_klines("1h", limit=120)
-    if not c or len(c) < 20:
-        return None
-
-    highs = [x["high"] for x in c]
-    lows = [x["low"] for x in c]
-
-    if direction == "LONG":
-        candidates = [h for h in highs if h > current_price]
-        if not candidates:
-            return None
-        return min(candidates, key=lambda x: x - current_price)
-    else:
-        candidates = [l for l in lows if l < current_price]
-        if not candidates:
-            return None
-        return max(candidates, key=lambda x: current_price - x)
+OUTCOMES = OutcomeTracker()
 
-# =========================
-# D-1 MOVE DETECTION (MULTI-TF) – فعلاً استفاده نمی‌شود
-# =========================
-def detect_d1_move_multi():
-    results = []
-    for tf, threshold in D1_THRESHOLDS.items():
-        c = get_klines(tf)
-        if not c or len(c) < 6:
+def restore_open_signals():
+    # ژورنال مرجع است؛ وضعیت snapshot فقط برای سیگنال‌هایی که هنوز باز هستند حفظ می‌شود
+    logs = load_json(SIGNAL_LOG_FILE, [])
+    open_ids = {x.get("id") for x in logs if x.get("status") == "open"}
+    for signal_id in [i for i in OUTCOMES.open if i not in open_ids]:
+        OUTCOMES.discard(signal_id)
+    for x in logs:
+        if x.get("id") in OUTCOMES.open:
             continue
-        window = 5
-        recent = c[-window:]
-        highs = [x["high"] for x in recent]
-        lows = [x["low"] for x in recent]
-        max_high = max(highs)
-        min_low = min(lows)
-        move = max_high - min_low
-        if move >= threshold:
-            first_open = recent[0]["open"]
-            last_close = recent[-1]["close"]
-            bias = "LONG" if last_close > first_open else "SHORT"
-            results.append({
-                "tf": tf,
-                "move": move,
-                "bias": bias
-            })
-    return results
+        if x.get("status") == "open" and x.get("id") and x.get("sl") and x.get("tp"):
+            OUTCOMES.register(
+                x["id"], x.get("symbol", SYMBOL), x["bias"], x["entry"],
+                x["sl"], x["tp"], x.get("tp2") or x["tp"], x.get("opened_ts")
+            )
+
+@PERF.timed("job:price_tick")
+async def price_tick(context: ContextTypes.DEFAULT_TYPE):
+    price = await in_thread(get_last_price)
+    if price is None:
+        return
+    for signal_id, fields in OUTCOMES.update(SYMBOL, price):
+        record_outcome(signal_id, fields)
+    ALERTS.sync()
+    fired = ALERTS.check(SYMBOL, price)
+    if fired:
+        await deliver_alerts(context.bot, fired, price)
 
 # =========================
-# SIGNAL CORE (قدیمی – برای سازگاری نگه داشته شده)
+# PRICE ALERTS
 # =========================
-def confidence_score(potential, rsi_conf=0, grade_level="A"):
-    base = 30 if grade_level == "A" else 25 if grade_level == "B" else 15 if grade_level == "C" else 10
-    s = base + rsi_conf
-    bonus = 25 if grade_level == "A" else 20 if grade_level == "B" else 10 if grade_level == "C" else 5
-    if potential > 1000:
-        s += bonus
-    if potential > 1500:
-        s += bonus
-    if potential > 2000:
-        s += bonus / 2
-    return min(s, 95)
-
-def build_signal(c, tf, funding, oi, bias, grade_level, rsi_conf,
-                 htf_bias=None, sr_target=None, atr=None, move_info=None):
-    last_close = c[-1]["close"]
-
-    if atr is None:
-        atr = calculate_atr(c)
-
-    if sr_target:
-        primary_target = sr_target
-    else:
-        if bias == "LONG":
-            primary_target = last_close + 3 * atr
-        else:
-            primary_target = last_close - 3 * atr
-
-    secondary_target = None
-    if move_info and move_info.get("move", 0) >= 1500:
-        if bias == "LONG":
-            secondary_target = primary_target + 2 * atr
-        else:
-            secondary_target = primary_target - 2 * atr
-
-    entry = last_close
-
-    if bias == "LONG":
-        sl = entry - 1.5 * atr
-        tp = primary_target
-        title = "🟢 BTC LONG – NDS PRO V7.8"
-        safe_lev = SAFE_LEVERAGE_LONG
-    else:
-        sl = entry + 1.5 * atr
-        tp = primary_target
-        title = "🔴 BTC SHORT – NDS PRO V7.8"
-        safe_lev = SAFE_LEVERAGE_SHORT
-
-    potential = abs(tp - entry)
-    if potential < MIN_PROFIT_USD:
-        return None, "POTENTIAL_TOO_LOW"
-
-    risk_usd = DEFAULT_CAPITAL * RISK_PERCENT
-    position_size_btc = risk_usd / abs(entry - sl) if abs(entry - sl) > 0 else 0
-
-    conf = confidence_score(potential, rsi_conf, grade_level)
-
-    if grade_level == "A":
-        warning = "عالی و مطمئن—ورود منطقی با پلن ریسک."
-    elif grade_level == "B":
-        warning = "خوب—با احتیاط و مدیریت ریسک."
-    elif grade_level == "C":
-        warning = "متوسط—تایید اضافه کمک می‌کند."
-    else:
-        warning = "تحلیلی و هشداردهنده—برای ورود کور مناسب نیست."
-
-    htf_text = f"HTF Bias (4h): {htf_bias}" if htf_bias else "HTF Bias (4h): نامشخص"
-
-    if secondary_target:
-        tp_text = f"TP1: {tp:.2f}\nTP2: {secondary_target:.2f}"
-    else:
-        tp_text = f"TP: {tp:.2f}"
-
-    move_text = ""
-    if move_info:
-        move_text = f"\nRecent Move ({move_info.get('tf')} window): ~{int(move_info['move'])} USDT"
-
-    message = f"""
-{title}
-
-TF Trigger: {tf}
-🕒 {time_str()}
-
-{htf_text}
-Direction: {bias}
-
-Entry: {entry:.2f}
-SL: {sl:.2f}
-{tp_text}
-
-Position Size (1% risk on ${DEFAULT_CAPITAL}): {position_size_btc:.4f} BTC
-Safe Leverage: {safe_lev}x
-Funding Rate: {funding:.4f}%
-Open Interest: {oi:,.0f}{move_text}
+ALERTS = AlertBook()
+async def deliver_alerts(bot, fired, price):
+    by_chat = {}
+    for alert, level in fired:
+        by_chat.setdefault(alert["chat_id"], []).append(format_alert(alert))
 
-Confidence: {conf}%
-Grade: {grade_level}
-{warning}
+    async def send(chat_id, lines):
+        try:
+            with PERF.measure("send_message", "await"):
+                await bot.send_message(
+                    chat_id=chat_id,
+                    text="🔔 PRICE ALERT\n\n" + "\n".join(lines) + f"\n\nPrice: {price:,.2f} USDT\n🕒 {time_str()}"
+                )
+        except Exception:
+            pass
 
-⚠️ این یک تحلیل و سناریو است، نه تضمین.
-"""
-    return {
-        "date": today_str(),
-        "grade": grade_level,
-        "tf": tf,
-        "bias": bias,
-        "entry": entry,
-        "tp": tp,
-        "sl": sl,
-        "message": message
-    }, None
+    items = list(by_chat.items())
+    for i in range(0, len(items), ALERT_SEND_BATCH):
+        if i:
+            await asyncio.sleep(1)
+        await asyncio.gather(*(send(cid, lines) for cid, lines in items[i:i + ALERT_SEND_BATCH]))
 
 # =========================
-# PRICE ACTION – STRATEGY B (BREAKOUT)
+# SIGNAL OUTBOX DELIVERY
 # =========================
-def find_swings(c):
-    highs = []
-    lows = []
-    for i in range(2, len(c)-2):
-        if c[i]["high"] > c[i-1]["high"] and c[i]["high"] > c[i+1]["high"]:
-            highs.append(c[i]["high"])
-        if c[i]["low"] < c[i-1]["low"] and c[i]["low"] < c[i+1]["low"]:
-            lows.append(c[i]["low"])
-    return (highs[-1] if highs else None), (lows[-1] if lows else None)
-
-def pa_breakout_signal():
-    c = get_klines("15m", limit=60)
-    if not c or len(c) < 20:
-        return None
-
-    last = c[-1]["close"]
-    swing_high, swing_low = find_swings(c)
+# ژورنال outbox محلی همین نسخه است؛ هر نسخه صف خودش را تخلیه می‌کند
+OUTBOX = Outbox()
+OUTBOX_BUSY = False
 
-    if swing_high and last > swing_high * 1.002:
-        return {"dir": "LONG", "ref": swing_high, "price": last}
+async def send_outbox(bot, batch_id, chat_id, text):
+    # خروجی: وضعیت ack، یا None یعنی بعداً دوباره تلاش شود
+    try:
+        with PERF.measure("send_message", "await"):
+            await bot.send_message(chat_id=chat_id, text=text)
+        return "sent"
+    except RetryAfter as e:
+        await asyncio.sleep(e.retry_after)
+        return None
+    except (Forbidden, BadRequest):
+        return "failed"  # ربات بلاک شده یا چت وجود ندارد
+    except Exception:
+        if OUTBOX.attempt(batch_id, chat_id) >= OUTBOX_MAX_ATTEMPTS:
+            return "failed"
+        return None
 
-    if swing_low and last < swing_low * 0.998:
-        return {"dir": "SHORT", "ref": swing_low, "price": last}
+async def deliver_outbox(bot):
+    # فقط یک تخلیه‌کننده؛ دسته‌ی تازه‌ای که وسط کار اضافه شود در همین دور ارسال می‌شود
+    global OUTBOX_BUSY
+    if OUTBOX_BUSY:
+        return
+    OUTBOX_BUSY = True
+    try:
+        OUTBOX.expire()
+        deferred = set()
+        first = True
+        while True:
+            chunk = OUTBOX.due(OUTBOX_SEND_BATCH, deferred)
+            if not chunk:
+                break
+            if not first:
+                await asyncio.sleep(1)
+            first = False
+            results = await asyncio.gather(*(send_outbox(bot, *item) for item in chunk))
+            acks = []
+            for (batch_id, chat_id, _), status in zip(chunk, results):
+                if status:
+                    acks.append((batch_id, chat_id, status))
+                else:
+                    deferred.add((batch_id, chat_id))
+            OUTBOX.ack(acks)
+    finally:
+        OUTBOX_BUSY = False
+
+@PERF.timed("job:outbox_job")
+async def outbox_job(context: ContextTypes.DEFAULT_TYPE):
+    await deliver_outbox(context.bot)
 
-    return None
+# =========================
+# WARM-START SNAPSHOT
+# =========================
+def save_snapshot():
+    return write_snapshot({
+        "symbol": SYMBOL,
+        "candles": cached_candles(),
+        "outcomes": OUTCOMES.to_state(),
+        "strong_moves": STRONG_MOVES.to_state(),
+        "limits": get_limit_state(),
+        "last_signal_run": LAST_SIGNAL_RUN.isoformat() if LAST_SIGNAL_RUN else None,
+        "last_signal_key": list(LAST_SIGNAL_KEY) if LAST_SIGNAL_KEY else None,
+    })
 
-def build_pa_message(sig):
-    direction = sig["dir"]
-    ref = sig["ref"]
-    price = sig["price"]
+def load_snapshot():
+    global OUTCOMES, STRONG_MOVES, LAST_SIGNAL_RUN, LAST_SIGNAL_KEY
+    state = read_snapshot()
+    if state is None:
+        return False
+    try:
+        outcomes = OutcomeTracker.from_state(state["outcomes"])
+        strong_moves = StrongMoveDetector.from_state(state["strong_moves"])
+        last_run = datetime.fromisoformat(state["last_signal_run"]) if state.get("last_signal_run") else None
+        last_key = tuple(state["last_signal_key"]) if state.get("last_signal_key") else None
+    except (KeyError, TypeError, ValueError):
+        return False  # snapshot ناسازگار؛ شروع سرد
+    restore_candles(state.get("candles") or {})
+    OUTCOMES, STRONG_MOVES = outcomes, strong_moves
+    LAST_SIGNAL_RUN, LAST_SIGNAL_KEY = last_run, last_key
+    limits = state.get("limits")
+    if limits and limits.get("date") == today_str():
+        for grade in ("C", "D"):
+            key = _limit_key(grade, limits["date"])
+            if STATE.get(key) is None:
+                for _ in range(limits.get(grade.lower() + "_count", 0)):
+                    STATE.incr(key, ttl=2 * 86400)
+    return True
 
-    c = get_klines("15m", limit=60)
-    atr = calculate_atr(c)
+@PERF.timed("job:snapshot_job")
+async def snapshot_job(context: ContextTypes.DEFAULT_TYPE):
+    save_snapshot()
 
-    if direction == "LONG":
-        sl = ref - 1.5 * atr
-        tp1 = price + 1.2 * atr
-        tp2 = price + 2.0 * atr
-    else:
-        sl = ref + 1.5 * atr
-        tp1 = price - 1.2 * atr
-        tp2 = price - 2.0 * atr
+async def perf_start(app):
+    PERF.start()
 
-    return f"""
-📡 BTC BREAKOUT SIGNAL – NDS PRO V7.9 (Strategy B)
+async def snapshot_on_shutdown(app):
+    PERF.stop()
+    save_snapshot()
+    try:
+        STATE.release_lease("leader", INSTANCE_ID)
+    except Exception:
+        pass
 
-Direction: {direction}
-TF: 15m
+@PERF.timed("job:leader_job")
+async def leader_job(context: ContextTypes.DEFAULT_TYPE):
+    if renew_leadership():
+        # تازه leader شده‌ایم: وضعیت را از backend مشترک بگیر
+        restore_open_signals()
+        ALERTS.load()
 
-Break Level: {ref:.2f}
-Price: {price:.2f}
+@PERF.timed("job:sync_state")
+async def sync_state(context: ContextTypes.DEFAULT_TYPE):
+    load_vips()
 
-Entry: {ref:.2f}
-SL: {sl:.2f}
-TP1: {tp1:.2f}
-TP2: {tp2:.2f}
+# =========================
+# SUBSCRIPTIONS
+# =========================
+SUBS = SubscriptionIndex()
 
-🕒 {time_str()}
-"""
+# =========================
+# REGIME SCANNER (UNIVERSE)
+# =========================
+REGIME = RegimeScanner()
+REGIME_SCAN = None  # آخرین نتیجه‌ی اسکن universe
+CLUSTER_GATE = ClusterGate()
+
+@PERF.timed("job:regime_scan")
+async def regime_scan(context: ContextTypes.DEFAULT_TYPE):
+    global REGIME_SCAN
+    # دریافت ۲۰۰ نماد در thread pool تا event loop بلاک نشود؛
+    # نمادهای گرم فقط چند کندل آخر را می‌گیرند
+    loop = asyncio.get_running_loop()
+    cold = REGIME.missing(UNIVERSE)
+    warm = [s for s in UNIVERSE if s not in cold]
+    fetched = {}
+    if cold:
+        fetched.update(await loop.run_in_executor(None, fetch_universe, cold, REGIME_TF, REGIME_BARS))
+    if warm:
+        fetched.update(await loop.run_in_executor(None, fetch_universe, warm, REGIME_TF, 3))
+    try:
+        REGIME.ingest(fetched)
+        REGIME_SCAN = REGIME.scan(UNIVERSE) or REGIME_SCAN
+    except RuntimeError:
+        # numpy نصب نیست؛ اسکنر غیرفعال می‌شود
+        context.job.schedule_removal()
 
 # =========================
 # AUTO SIGNAL – STRATEGY B (1000 USD FILTER)
 # =========================
-async def auto_signal(context: ContextTypes.DEFAULT_TYPE):
-    global LAST_SIGNAL_RUN
+
+async def auto_signal(context: ContextTypes.DEFAULT_TYPE, mode="poll"):
+    # mode="close": کندل تازه بسته‌شده بررسی می‌شود؛ "poll": کندل در حال شکل‌گیری.
+    # خروجی True یعنی قیمت نزدیک سطح breakout است و پول سریع لازم است.
+    global LAST_SIGNAL_RUN, LAST_CANDLE_HASH, LAST_SIGNAL_KEY, LAST_NEAR
     LAST_SIGNAL_RUN = iran_time()
+    STATE.set("last_signal_run", LAST_SIGNAL_RUN.isoformat())
 
-    c = get_klines("15m", limit=60)
+    c = await in_thread(get_candles, SIGNAL_TF, limit=60)
     if not c or len(c) < 20:
-        return
+        return False
 
-    last = c[-1]["close"]
+    track_strong_moves(c)
 
-    # پیدا کردن Swing High / Low ساده
-    swing_high = max(x["high"] for x in c[-10:-2])
-    swing_low = min(x["low"] for x in c[-10:-2])
+    if mode == "close" and c[-1]["time"] + TF_MS[SIGNAL_TF] > time.time() * 1000:
+        c = c[:-1]
 
-    direction = None
-    ref = None
+    h = candle_hash(c)
+    if h == LAST_CANDLE_HASH:
+        return LAST_NEAR
+    LAST_CANDLE_HASH = h
 
-    # Breakout با شرط حرکت حداقل 1000 دلار
-    if last > swing_high and (last - swing_high) >= 1000:
-        direction = "LONG"
-        ref = swing_high
-    elif last < swing_low and (swing_low - last) >= 1000:
-        direction = "SHORT"
-        ref = swing_low
-    else:
-        return  # اگر حرکت کمتر از 1000 دلار بود → سیگنال نده
+    direction, ref, distance = evaluate_breakout(c)
+    near = LAST_NEAR = distance <= NEAR_BREAKOUT_USD
+    if direction is None:
+        return near
 
-    # ATR
-    atr = calculate_atr(c)
-    if atr < 15:
-        atr = 15
+    signal_key = (c[-1]["time"], direction)
+    if signal_key == LAST_SIGNAL_KEY:
+        return near
 
-    entry = last
-
-    if direction == "LONG":
-        sl = entry - 1.5 * atr
-        tp1 = entry + 1.2 * atr
-        tp2 = entry + 2.0 * atr
-    else:
-        sl = entry + 1.5 * atr
-        tp1 = entry - 1.2 * atr
-        tp2 = entry - 2.0 * atr
+    last = c[-1]["close"]
 
-    msg = f"""
-📡 BTC SIGNAL – STRATEGY B (V7.9)
+    atr = signal_atr(c)
+    entry = last
+    sl, tp1, tp2 = trade_levels(direction, entry, atr)
 
-Direction: {direction}
-TF: 15m
+    depth = depth_features(direction, ref, entry, await in_thread(get_depth_book))
+    if DEPTH_FILTER and depth and depth["aligned"] < DEPTH_MIN_IMBALANCE:
+        return near
 
-Break Level: {ref:.2f}
-Entry: {entry:.2f}
-SL: {sl:.2f}
-TP1: {tp1:.2f}
-TP2: {tp2:.2f}
+    vwap = session_vwap()
+    if VWAP_FILTER and vwap and ((direction == "LONG") != (entry > vwap)):
+        return near
+    profile = profile_summary()
 
-Move Size: {abs(entry - ref):.2f} USDT
-ATR Used: {atr:.2f}
-🕒 {time_str()}
-"""
+    if not CLUSTER_GATE.allow(REGIME_SCAN, SYMBOL, direction):
+        return near  # همان حرکت خوشه قبلاً از نماد دیگری اعلام شده
 
-    logs = load_json(SIGNAL_LOG_FILE, [])
-    logs.append({
+    sig = {
+        "symbol": SYMBOL,
+        "grade": "D",
+        "tf": SIGNAL_TF,
+        "dir": direction,
+        "ref": ref,
+        "entry": entry,
+        "sl": sl,
+        "tp1": tp1,
+        "tp2": tp2,
+        "atr": atr,
+        "depth": depth,
+        "vwap": vwap,
+        "profile": profile,
+        "regime": regime_of(REGIME_SCAN, SYMBOL),
+        "time": time_str()
+    }
+    # کلید فقط بعد از ساخته شدن پیام ثبت می‌شود؛ خطای قبل از آن سیگنال را برای همیشه گم نمی‌کند
+    LAST_SIGNAL_KEY = signal_key
+
+    signal_id = f"{SYMBOL}-{int(time.time() * 1000)}"
+    opened_ts = time.time()
+    record_signal({
+        "id": signal_id,
         "date": today_str(),
+        "symbol": SYMBOL,
         "grade": "D",
-        "tf": "15m",
+        "tf": SIGNAL_TF,
         "bias": direction,
         "entry": entry,
-        "tp": None,
-        "sl": None
+        "tp": tp1,
+        "tp2": tp2,
+        "sl": sl,
+        "status": "open",
+        "opened_at": time_str(),
+        "opened_ts": opened_ts
     })
-    save_json(SIGNAL_LOG_FILE, logs[-1000:])
-
-    receivers = set(VIP_USERS)
-    if ADMIN_ID:
-        receivers.add(ADMIN_ID)
-
-    for rid in receivers:
-        try:
-            await context.bot.send_message(chat_id=rid, text=msg)
-        except:
-            pass
-
-
-
-
+    OUTCOMES.register(signal_id, SYMBOL, direction, entry, sl, tp1, tp2, opened_ts)
+
+    load_vips()
+    SUBS.sync()
+    admins = [ADMIN_ID] if ADMIN_ID else []
+    groups = SUBS.route(SYMBOL, "D", SIGNAL_TF, direction, set(VIP_USERS), always=admins)
+
+    # اول در outbox ماندگار می‌شود، بعد ارسال؛ سیگنال معوق قبلی همین نماد کنار می‌رود
+    messages = []
+    for fmt, receivers in groups.items():
+        msg = render_signal(sig, fmt)
+        messages += [(rid, msg) for rid in receivers]
+    OUTBOX.enqueue(signal_id, f"signal:{SYMBOL}:{SIGNAL_TF}", messages)
+    context.application.create_task(deliver_outbox(context.bot))
+
+    return near
+
+def schedule_signal(job_queue, delay, mode):
+    job_queue.run_once(signal_tick, when=max(delay, 0.5), data=mode, name="signal_tick")
+
+@PERF.timed("job:signal_tick")
+async def signal_tick(context: ContextTypes.DEFAULT_TYPE):
+    # هر اجرا اجرای بعدی را زمان‌بندی می‌کند (next_poll)
+    near = False
+    try:
+        if IS_LEADER:
+            near = await auto_signal(context, mode=context.job.data)
+    finally:
+        delay, mode = next_poll(near)
+        schedule_signal(context.job_queue, delay, mode)
 
 # =========================
 # FAKE D-1 TEST (ADMIN ONLY)
@@ -702,20 +481,15 @@ async def test_d1_admin(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # =========================
 # DAILY SUMMARY
 # =========================
+@PERF.timed("job:daily_summary")
 async def daily_summary(context: ContextTypes.DEFAULT_TYPE):
     if not ADMIN_ID:
         return
     today = today_str()
-    logs = load_json(SIGNAL_LOG_FILE, [])
-    strong_logs = load_json(STRONG_MOVE_LOG_FILE, [])
-    today_signals = [x for x in logs if x.get("date") == today]
-    today_strong = [x for x in strong_logs if x.get("date") == today]
-    if len(today_signals) == 0 and len(today_strong) == 0:
+    bucket = get_day_stats(today)
+    if bucket["total"] == 0 and bucket["strong"] == 0:
         return
-    a = sum(1 for x in today_signals if x.get("grade") == "A")
-    b = sum(1 for x in today_signals if x.get("grade") == "B")
-    c = sum(1 for x in today_signals if x.get("grade") == "C")
-    d = sum(1 for x in today_signals if x.get("grade") == "D")
+    a, b, c, d = grade_counts(bucket)
     await context.bot.send_message(
         chat_id=ADMIN_ID,
         text=f"""
@@ -724,10 +498,10 @@ async def daily_summary(context: ContextTypes.DEFAULT_TYPE):
 Date: {today}
 
 Signals:
-• Total: {len(today_signals)}
+• Total: {bucket["total"]}
 • A: {a} | B: {b} | C: {c} | D: {d}
 
-Strong Moves (No Entry): {len(today_strong)}
+Strong Moves (No Entry): {bucket["strong"]}
 
 🕒 {time_str()}
 """
@@ -737,25 +511,34 @@ async def summary(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_chat.id != ADMIN_ID:
         await update.message.reply_text("❌ فقط ادمین")
         return
+    days = 1
+    if context.args:
+        try:
+            days = max(1, min(int(context.args[0]), STATS_DAYS_KEPT))
+        except ValueError:
+            await update.message.reply_text("فرمت: /summary [days]")
+            return
     today = today_str()
-    logs = load_json(SIGNAL_LOG_FILE, [])
-    strong_logs = load_json(STRONG_MOVE_LOG_FILE, [])
-    today_signals = [x for x in logs if x.get("date") == today]
-    today_strong = [x for x in strong_logs if x.get("date") == today]
-    a = sum(1 for x in today_signals if x.get("grade") == "A")
-    b = sum(1 for x in today_signals if x.get("grade") == "B")
-    c = sum(1 for x in today_signals if x.get("grade") == "C")
-    d = sum(1 for x in today_signals if x.get("grade") == "D")
+    if days == 1:
+        bucket = get_day_stats(today)
+        period = today
+    else:
+        bucket = get_range_stats(days)
+        period = f"last {days} days (to {today})"
+    a, b, c, d = grade_counts(bucket)
+    longs = bucket["bias"].get("LONG", 0)
+    shorts = bucket["bias"].get("SHORT", 0)
     await update.message.reply_text(f"""
 📊 DAILY SUMMARY – BTC NDS PRO V7.9 (Manual)
 
-Date: {today}
+Date: {period}
 
 Signals:
-• Total: {len(today_signals)}
+• Total: {bucket["total"]}
 • A: {a} | B: {b} | C: {c} | D: {d}
+• LONG: {longs} | SHORT: {shorts}
 
-Strong Moves (No Entry): {len(today_strong)}
+Strong Moves (No Entry): {bucket["strong"]}
 
 🕒 {time_str()}
 """)
@@ -763,6 +546,7 @@ Strong Moves (No Entry): {len(today_strong)}
 # =========================
 # HEARTBEAT
 # =========================
+@PERF.timed("job:heartbeat")
 async def heartbeat(context: ContextTypes.DEFAULT_TYPE):
     if ADMIN_ID:
         await context.bot.send_message(
@@ -775,6 +559,7 @@ async def heartbeat(context: ContextTypes.DEFAULT_TYPE):
 # =========================
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     global ADMIN_ID
+    load_vips()
     cid = update.effective_chat.id
     if ADMIN_ID is None:
         ADMIN_ID = cid
@@ -797,6 +582,7 @@ async def approve(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except ValueError:
         await update.message.reply_text("شناسه نامعتبر است.")
         return
+    load_vips()
     VIP_USERS.add(uid)
     save_vips()
     await update.message.reply_text("✅ VIP شد")
@@ -812,6 +598,7 @@ async def remove(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except ValueError:
         await update.message.reply_text("شناسه نامعتبر است.")
         return
+    load_vips()
     VIP_USERS.discard(uid)
     save_vips()
     await update.message.reply_text("❌ حذف شد")
@@ -828,15 +615,26 @@ async def show_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(str(update.effective_chat.id))
 
 async def price(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        r = requests.get("https://api.mexc.com/api/v3/ticker/24hr", params={"symbol": SYMBOL}, timeout=10)
-        r.raise_for_status()
-        d = r.json()
-        price = float(d["lastPrice"])
-        change = float(d["priceChangePercent"])
-    except Exception:
+    if context.args and context.args[0] == "all":
+        comp = await in_thread(composite_ticker)
+        if comp is None:
+            await update.message.reply_text("❌ خطا در دریافت قیمت")
+            return
+        lines = "\n".join(f"• {name}: {t['price']:,.2f}" for name, t in sorted(comp["quotes"]))
+        await update.message.reply_text(f"""
+💰 BTC COMPOSITE PRICE
+
+Volume-Weighted: {comp['price']:,.2f} USDT
+{lines}
+🕒 {time_str()}
+""")
+        return
+    hit = await in_thread(hedged, "ticker", SYMBOL)
+    if hit is None:
         await update.message.reply_text("❌ خطا در دریافت قیمت")
         return
+    source, t = hit
+    price, change = t["price"], t["change"]
     sign = "🟢 +" if change >= 0 else "🔴 "
     await update.message.reply_text(f"""
 💰 BTC LIVE PRICE
@@ -844,35 +642,104 @@ async def price(update: Update, context: ContextTypes.DEFAULT_TYPE):
 Price: {price:,.2f} USDT
 24h Change: {sign}{change:.2f}%
 🕒 {time_str()}
-Source: MEXC
+Source: {source}
 """)
 
 async def high(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    try:
-        r = requests.get("https://api.mexc.com/api/v3/ticker/24hr", params={"symbol": SYMBOL}, timeout=10)
-        r.raise_for_status()
-        d = r.json()
-        high_price = float(d["highPrice"])
-    except Exception:
+    hit = await in_thread(hedged, "ticker", SYMBOL)
+    if hit is None:
         await update.message.reply_text("❌ خطا در دریافت High")
         return
+    source, t = hit
     await update.message.reply_text(f"""
 📈 BTC DAILY HIGH
 
-High Today: {high_price:,.2f} USDT
+High Today: {t['high']:,.2f} USDT
+🕒 {time_str()}
+Source: {source}
+""")
+
+async def vwap(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    hours = None
+    if context.args:
+        try:
+            hours = max(1, min(int(context.args[0]), 120))
+        except ValueError:
+            await update.message.reply_text("فرمت: /vwap [hours]")
+            return
+    c = await in_thread(get_candles, SIGNAL_TF, limit=LIMIT)
+    v = vwap_summary(SIGNAL_TF, hours)
+    if not c or v is None:
+        await update.message.reply_text("❌ خطا در دریافت کندل‌ها")
+        return
+    # اول روز UTC (هنوز حجمی ثبت نشده) VWAP روزانه وجود ندارد
+    lines = [f"VWAP (UTC day): {v['session']:,.2f}" if v["session"] else "VWAP (UTC day): —"]
+    if v["window"]:
+        lines.append(f"VWAP ({hours}h): {v['window']:,.2f}")
+    lines.append(f"Avg Volume (20): {v['avg_volume']:,.2f}")
+    await update.message.reply_text(f"""
+📊 BTC VWAP ({SIGNAL_TF})
+
+Price: {c[-1]['close']:,.2f} USDT
+""" + "\n".join(lines) + f"""
+🕒 {time_str()}
+""")
+
+async def profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not await in_thread(get_candles, SIGNAL_TF, limit=LIMIT):
+        await update.message.reply_text("❌ خطا در دریافت کندل‌ها")
+        return
+    p = profile_summary()
+    if p is None:
+        await update.message.reply_text("داده‌ای برای پروفایل حجم نیست.")
+        return
+    hours = p["candles"] * TF_MS[SIGNAL_TF] / 3600000
+    await update.message.reply_text(f"""
+📊 BTC VOLUME PROFILE ({hours:.0f}h, bin {PROFILE_BIN_USD} USDT)
+
+POC: {p['poc']:,.2f}
+Value Area ({int(VALUE_AREA_SHARE * 100)}%): {p['val']:,.2f} – {p['vah']:,.2f}
+Volume: {p['volume']:,.2f} BTC
 🕒 {time_str()}
-Source: MEXC
 """)
 
+async def regime(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_chat.id != ADMIN_ID:
+        await update.message.reply_text("❌ فقط ادمین")
+        return
+    scan = REGIME_SCAN
+    if scan is None:
+        await update.message.reply_text("هنوز اسکنی انجام نشده (اسکن فقط روی leader و با numpy اجرا می‌شود).")
+        return
+    counts = {}
+    for label in scan["label"].values():
+        counts[label] = counts.get(label, 0) + 1
+    lines = [
+        f"🧭 MARKET REGIME – {len(scan['symbols'])} symbols ({scan['tf']})",
+        "",
+        "Labels: " + " | ".join(f"{k}: {v}" for k, v in sorted(counts.items())),
+        f"Avg Correlation: {scan['avg_corr']:.2f}",
+    ]
+    mine = regime_of(scan, SYMBOL)
+    if mine:
+        lines.append(f"{SYMBOL}: {mine['label']} | ADX {mine['adx']:.1f} | Vol {mine['vol']:.1f}%/day")
+    groups = [g for g in scan["clusters"] if len(g) > 1][:5]
+    if groups:
+        lines.append(f"\nClusters (corr ≥ {REGIME_CLUSTER_CORR}):")
+        for g in groups:
+            lines.append(f"• {len(g)}: {', '.join(g[:8])}{' …' if len(g) > 8 else ''}")
+    lines.append(f"\nSuppressed duplicates: {CLUSTER_GATE.suppressed}")
+    lines.append(f"Scan: {scan['elapsed_ms']:.1f} ms | 🕒 {time_str()}")
+    await update.message.reply_text("\n".join(lines))
+
 async def ath(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        r = requests.get(
-            "https://api.mexc.com/api/v3/klines",
+        data = await in_thread(
+            MEXC.get,
+            "/api/v3/klines",
             params={"symbol": SYMBOL, "interval": "1d", "limit": 1000},
             timeout=15
         )
-        r.raise_for_status()
-        data = r.json()
         ath_price = 0
         ath_time = None
         for c in data:
@@ -893,43 +760,127 @@ ATH: {ath_price:,.2f} USDT
 Source: MEXC
 """)
 
+async def alert(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    cid = update.effective_chat.id
+    if cid not in VIP_USERS and cid != ADMIN_ID:
+        await update.message.reply_text("❌ فقط VIP")
+        return
+    ALERTS.sync()
+    usage = "فرمت: /alert above <price> | /alert below <price> | /alert move <percent>"
+    if len(context.args) != 2 or context.args[0] not in ("above", "below", "move"):
+        await update.message.reply_text(usage)
+        return
+    kind = context.args[0]
+    try:
+        value = float(context.args[1].replace(",", ""))
+    except ValueError:
+        await update.message.reply_text(usage)
+        return
+    if value <= 0:
+        await update.message.reply_text(usage)
+        return
+
+    last = await in_thread(get_last_price)
+    if kind == "move":
+        if last is None:
+            await update.message.reply_text("❌ خطا در دریافت قیمت")
+            return
+        a = ALERTS.add(cid, SYMBOL, "move", above=last * (1 + value / 100), below=last * (1 - value / 100), ref=value)
+    elif kind == "above":
+        if last is not None and value <= last:
+            await update.message.reply_text(f"قیمت فعلی ({last:,.2f}) بالاتر از این سطح است.")
+            return
+        a = ALERTS.add(cid, SYMBOL, "above", above=value)
+    else:
+        if last is not None and value >= last:
+            await update.message.reply_text(f"قیمت فعلی ({last:,.2f}) پایین‌تر از این سطح است.")
+            return
+        a = ALERTS.add(cid, SYMBOL, "below", below=value)
+
+    if a is None:
+        await update.message.reply_text(f"حداکثر {MAX_ALERTS_PER_USER} هشدار فعال مجاز است.")
+        return
+    await update.message.reply_text(f"✅ هشدار ثبت شد\n{format_alert(a)}")
+
+async def alerts(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    ALERTS.sync()
+    items = ALERTS.user_alerts(update.effective_chat.id)
+    if not items:
+        await update.message.reply_text("هشدار فعالی ندارید.")
+        return
+    await update.message.reply_text("\n".join(format_alert(a) for a in items))
+
+async def delalert(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    cid = update.effective_chat.id
+    if not context.args:
+        await update.message.reply_text("فرمت: /delalert <id|all>")
+        return
+    ALERTS.sync()
+    if context.args[0] == "all":
+        for a in ALERTS.user_alerts(cid):
+            ALERTS.remove(a["id"], save=False)
+        ALERTS.save()
+        await update.message.reply_text("❌ همه هشدارها حذف شد")
+        return
+    try:
+        alert_id = int(context.args[0].lstrip("#"))
+    except ValueError:
+        await update.message.reply_text("شناسه نامعتبر است.")
+        return
+    a = ALERTS.alerts.get(alert_id)
+    if a is None or a["chat_id"] != cid:
+        await update.message.reply_text("هشدار پیدا نشد.")
+        return
+    ALERTS.remove(alert_id)
+    await update.message.reply_text("❌ حذف شد")
+
+async def subscribe(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    cid = update.effective_chat.id
+    if cid not in VIP_USERS and cid != ADMIN_ID:
+        await update.message.reply_text("❌ فقط VIP")
+        return
+    pref = parse_subscription(context.args)
+    if not context.args or pref is None:
+        await update.message.reply_text(
+            "فرمت: /subscribe symbols=BTCUSDT grades=A,B tfs=15m dirs=LONG,SHORT format=full|compact"
+        )
+        return
+    SUBS.sync()
+    SUBS.set(cid, pref)
+    await update.message.reply_text("✅ اشتراک ذخیره شد\n" + format_subscription(pref))
+
+async def unsubscribe(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    SUBS.sync()
+    SUBS.clear(update.effective_chat.id)
+    await update.message.reply_text("✅ فیلترها حذف شد—همه‌ی سیگنال‌ها ارسال می‌شوند.")
+
+async def mysubs(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    SUBS.sync()
+    pref = SUBS.prefs.get(update.effective_chat.id)
+    if pref is None:
+        await update.message.reply_text("فیلتری ندارید—همه‌ی سیگنال‌ها ارسال می‌شوند.")
+        return
+    await update.message.reply_text(format_subscription(pref))
+
 # =========================
 # BACKTEST
 # =========================
 async def backtest(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_chat.id != ADMIN_ID:
         return
-    logs = load_json(SIGNAL_LOG_FILE, [])
-    if not logs:
+    stats = load_stats()
+    bucket = stats["all"]
+    if context.args:
+        try:
+            bucket = get_range_stats(max(1, min(int(context.args[0]), STATS_DAYS_KEPT)), stats)
+        except ValueError:
+            await update.message.reply_text("فرمت: /backtest [days]")
+            return
+    if bucket["total"] == 0:
         await update.message.reply_text("هیچ سیگنالی ثبت نشده—بک‌تست در دسترس نیست.")
         return
 
-    total_trades = len(logs)
-    a_trades = sum(1 for log in logs if log.get("grade") == "A")
-    b_trades = sum(1 for log in logs if log.get("grade") == "B")
-    c_trades = sum(1 for log in logs if log.get("grade") == "C")
-    d_trades = sum(1 for log in logs if log.get("grade") == "D")
-
-    wins = a_trades * 0.8 + b_trades * 0.6 + c_trades * 0.45 + d_trades * 0.35
-    win_rate = (wins / total_trades) * 100 if total_trades > 0 else 0
-    profit_factor = 1.8 if a_trades > b_trades else 1.5 if b_trades > c_trades else 1.2
-    max_drawdown = 12 if a_trades > 10 else 18
-
-    await update.message.reply_text(f"""
-📈 بک‌تست تقریبی (بر اساس لاگ سیگنال‌ها):
-
-تعداد کل ترید: {total_trades}
-• A: {a_trades}
-• B: {b_trades}
-• C: {c_trades}
-• D: {d_trades}
-
-Win Rate تقریبی: {win_rate:.1f}%
-Profit Factor تقریبی: {profit_factor}
-Max Drawdown تقریبی: {max_drawdown}%
-
-(برای دقت واقعی، بک‌تست روی داده‌های تاریخی لازم است)
-""")
+    await update.message.reply_text(backtest_report(bucket))
 
 # =========================
 # HEALTH & MONITOR
@@ -940,17 +891,25 @@ async def health(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     now = iran_time()
-    status_parts = []
+    status_parts = [f"Role: {'leader' if IS_LEADER else 'follower'} ({INSTANCE_ID})"]
+
+    last_run = LAST_SIGNAL_RUN
+    if not IS_LEADER:
+        shared = STATE.get("last_signal_run")
+        last_run = datetime.fromisoformat(shared) if shared else None
 
-    if LAST_SIGNAL_RUN:
-        diff = (now - LAST_SIGNAL_RUN).seconds
-        if diff > 360:
+    if last_run:
+        diff = (now - last_run).seconds
+        if diff > SIGNAL_STALE_SECONDS:
             status_parts.append(f"auto_signal DELAYED ({diff} sec)")
         else:
             status_parts.append(f"auto_signal OK (last {diff} sec ago)")
     else:
         status_parts.append("auto_signal NEVER RUN")
 
+    status_parts.append(MEXC.status())
+    status_parts.append(OUTBOX.status())
+
     try:
         info = await context.bot.get_webhook_info()
         if info.url:
@@ -966,6 +925,27 @@ async def health(update: Update, context: ContextTypes.DEFAULT_TYPE):
         + f"\n\n🕒 {time_str()}"
     )
 
+async def perf(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_chat.id != ADMIN_ID:
+        await update.message.reply_text("❌ فقط ادمین")
+        return
+    if context.args:
+        # /perf 2 → stack کامل دومین رکورد کند
+        slow = PERF.slowest(PERF_RING_SIZE)
+        try:
+            i = int(context.args[0])
+            if i < 1:
+                raise ValueError
+            r = slow[i - 1]
+        except (ValueError, IndexError):
+            await update.message.reply_text(f"شماره نامعتبر است (1 تا {len(slow)})")
+            return
+        text = f"{r['ms']:.0f} ms {r['kind']} – {r['name']}\n\n{r['stack'] or 'stack ثبت نشده'}"
+        await update.message.reply_text(text[-4000:])
+        return
+    await update.message.reply_text(render_perf(PERF)[:4000])
+
+@PERF.timed("job:monitor_signal")
 async def monitor_signal(context: ContextTypes.DEFAULT_TYPE):
     global LAST_SIGNAL_RUN
     now = iran_time()
@@ -975,7 +955,7 @@ async def monitor_signal(context: ContextTypes.DEFAULT_TYPE):
 
     diff = (now - LAST_SIGNAL_RUN).seconds
 
-    if diff > 360 and ADMIN_ID:
+    if diff > SIGNAL_STALE_SECONDS and ADMIN_ID:
         try:
             await context.bot.send_message(
                 chat_id=ADMIN_ID,
@@ -1011,27 +991,63 @@ def main():
     if not TOKEN:
         raise RuntimeError("TELEGRAM_TOKEN env var is missing")
 
-    app = Application.builder().token(TOKEN).build()
-
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("approve", approve))
-    app.add_handler(CommandHandler("remove", remove))
-    app.add_handler(CommandHandler("viplist", viplist))
-    app.add_handler(CommandHandler("id", show_id))
-    app.add_handler(CommandHandler("price", price))
-    app.add_handler(CommandHandler("high", high))
-    app.add_handler(CommandHandler("ath", ath))
-    app.add_handler(CommandHandler("summary", summary))
-    app.add_handler(CommandHandler("backtest", backtest))
-    app.add_handler(CommandHandler("health", health))
-    app.add_handler(CommandHandler("test_d1", test_d1_admin))
-
-    app.job_queue.run_repeating(auto_signal, interval=180, first=30)
-    app.job_queue.run_repeating(heartbeat, interval=10800, first=60)
-    app.job_queue.run_repeating(monitor_signal, interval=120, first=120)
+    load_vips()
+    warm = load_snapshot()
+
+    app = (
+        Application.builder().token(TOKEN)
+        .post_init(perf_start)
+        .post_shutdown(snapshot_on_shutdown)
+        .build()
+    )
+
+    # هر handler زمان‌گیری می‌شود تا /perf کندترین دستورها را نشان دهد
+    handlers = [
+        ("start", start),
+        ("approve", approve),
+        ("remove", remove),
+        ("viplist", viplist),
+        ("id", show_id),
+        ("price", price),
+        ("high", high),
+        ("ath", ath),
+        ("vwap", vwap),
+        ("profile", profile),
+        ("regime", regime),
+        ("alert", alert),
+        ("alerts", alerts),
+        ("delalert", delalert),
+        ("subscribe", subscribe),
+        ("unsubscribe", unsubscribe),
+        ("mysubs", mysubs),
+        ("summary", summary),
+        ("backtest", backtest),
+        ("health", health),
+        ("perf", perf),
+        ("test_d1", test_d1_admin),
+    ]
+    for name, fn in handlers:
+        app.add_handler(CommandHandler(name, PERF.timed("/" + name)(fn)))
+
+    renew_leadership()
+    restore_open_signals()
+    ALERTS.load()
+    SUBS.load()
+    OUTBOX.load()
+
+    app.job_queue.run_repeating(leader_job, interval=LEADER_RENEW_SECONDS, first=LEADER_RENEW_SECONDS)
+    app.job_queue.run_repeating(sync_state, interval=STATE_SYNC_SECONDS, first=STATE_SYNC_SECONDS)
+
+    schedule_signal(app.job_queue, 1 if warm else 30, "poll")
+    app.job_queue.run_repeating(leader_only(price_tick), interval=PRICE_TICK_SECONDS, first=15)
+    app.job_queue.run_repeating(leader_only(regime_scan), interval=REGIME_SCAN_SECONDS, first=20)
+    app.job_queue.run_repeating(outbox_job, interval=OUTBOX_DRAIN_SECONDS, first=5)
+    app.job_queue.run_repeating(snapshot_job, interval=SNAPSHOT_INTERVAL, first=SNAPSHOT_INTERVAL)
+    app.job_queue.run_repeating(leader_only(heartbeat), interval=10800, first=60)
+    app.job_queue.run_repeating(leader_only(monitor_signal), interval=120, first=120)
 
     daily_time_utc = dtime(hour=17, minute=0)
-    app.job_queue.run_daily(daily_summary, time=daily_time_utc)
+    app.job_queue.run_daily(leader_only(daily_summary), time=daily_time_utc)
 
     app.run_webhook(
         listen="0.0.0.0",
@@ -0,0 +1,5 @@
+# هسته‌ی سیگنال NDS (اندیکاتورها، استراتژی، ذخیره‌سازی) جدا از لایه‌ی تلگرام.
+# import این پکیج و زیرماژول‌هایش هیچ I/O انجام نمی‌دهد؛ requests فقط با
+# nds.market، numpy فقط در اولین اسکن رژیم و backend های sqlite/redis فقط هنگام
+# اولین استفاده بارگذاری می‌شوند.
+__version__ = "7.9"
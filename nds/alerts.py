@@ -0,0 +1,102 @@
+from .config import ALERT_FILE, MAX_ALERTS_PER_USER
+from .outcomes import TriggerIndex
+from .state import STATE, load_json, save_json
+from .timeutil import time_str
+
+# =========================
+# USER PRICE ALERTS
+# =========================
+class AlertBook:
+    # هشدارها در TriggerIndex هر نماد نگه داشته می‌شوند؛ بررسی هر تیک
+    # فقط سطوح رد شده را برمی‌دارد، نه کل هشدارها.
+    def __init__(self):
+        self.alerts = {}   # alert_id -> alert
+        self.index = {}    # symbol -> TriggerIndex
+        self.by_user = {}  # chat_id -> set(alert_id)
+        self.version = None
+
+    def load(self):
+        version = STATE.get("alerts:version")
+        data = load_json(ALERT_FILE, {"alerts": []})
+        self.__init__()
+        self.version = version
+        for a in data.get("alerts", []):
+            self._insert(a)
+
+    def save(self):
+        save_json(ALERT_FILE, {"alerts": list(self.alerts.values())})
+        self.version = str(STATE.incr("alerts:version"))
+
+    def sync(self):
+        # اگر نسخه‌ی دیگری هشدارها را تغییر داده، دوباره بارگذاری کن
+        if STATE.get("alerts:version") != self.version:
+            self.load()
+
+    def _insert(self, alert):
+        idx = self.index.setdefault(alert["symbol"], TriggerIndex())
+        if alert.get("above") is not None:
+            idx.add((alert["id"], "up"), alert["above"], "above")
+        if alert.get("below") is not None:
+            idx.add((alert["id"], "down"), alert["below"], "below")
+        self.alerts[alert["id"]] = alert
+        self.by_user.setdefault(alert["chat_id"], set()).add(alert["id"])
+
+    def add(self, chat_id, symbol, kind, above=None, below=None, ref=None):
+        if len(self.by_user.get(chat_id, ())) >= MAX_ALERTS_PER_USER:
+            return None
+        alert_id = STATE.incr("alerts:id")
+        while alert_id in self.alerts:
+            alert_id = STATE.incr("alerts:id")
+        alert = {
+            "id": alert_id,
+            "chat_id": chat_id,
+            "symbol": symbol,
+            "kind": kind,
+            "above": above,
+            "below": below,
+            "ref": ref,
+            "created": time_str(),
+        }
+        self._insert(alert)
+        self.save()
+        return alert
+
+    def remove(self, alert_id, save=True):
+        alert = self.alerts.pop(alert_id, None)
+        if alert is None:
+            return None
+        idx = self.index.get(alert["symbol"])
+        if idx is not None:
+            idx.remove((alert_id, "up"))
+            idx.remove((alert_id, "down"))
+        ids = self.by_user.get(alert["chat_id"])
+        if ids is not None:
+            ids.discard(alert_id)
+            if not ids:
+                del self.by_user[alert["chat_id"]]
+        if save:
+            self.save()
+        return alert
+
+    def user_alerts(self, chat_id):
+        return [self.alerts[i] for i in sorted(self.by_user.get(chat_id, ()))]
+
+    def check(self, symbol, price):
+        idx = self.index.get(symbol)
+        if idx is None or not len(idx):
+            return []
+        fired = []
+        for (alert_id, _), level in idx.crossed(price):
+            alert = self.remove(alert_id, save=False)
+            if alert is not None:
+                fired.append((alert, level))
+        if fired:
+            self.save()
+        return fired
+
+def format_alert(a):
+    if a["kind"] == "move":
+        return f"#{a['id']} {a['symbol']} ±{a['ref']}% ({a['below']:,.2f} – {a['above']:,.2f})"
+    if a["kind"] == "above":
+        return f"#{a['id']} {a['symbol']} ≥ {a['above']:,.2f}"
+    return f"#{a['id']} {a['symbol']} ≤ {a['below']:,.2f}"
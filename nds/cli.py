@@ -0,0 +1,152 @@
+import sys
+import json
+import argparse
+
+from .config import SYMBOL, SIGNAL_TF, DEPTH_FEATURE_BPS, STATS_DAYS_KEPT
+
+# =========================
+# OFFLINE TOOLS (python -m nds ...)
+# =========================
+# ماژول‌های سنگین فقط داخل هر زیرفرمان import می‌شوند تا --help و
+# backtest/replay بدون requests و python-telegram-bot اجرا شوند.
+
+def cmd_backtest(args):
+    from .storage import load_stats, get_range_stats, backtest_report
+
+    stats = load_stats(persist=False)
+    bucket = stats["all"]
+    if args.days:
+        bucket = get_range_stats(max(1, min(args.days, STATS_DAYS_KEPT)), stats)
+    if bucket["total"] == 0:
+        print("هیچ سیگنالی ثبت نشده—بک‌تست در دسترس نیست.")
+        return 1
+    print(backtest_report(bucket).strip())
+    return 0
+
+def cmd_backfill(args):
+    import time
+    import requests
+    from .market import fetch_klines_range
+
+    end_ms = int(time.time() * 1000)
+    start_ms = end_ms - int(args.days * 86400 * 1000)
+    try:
+        candles = fetch_klines_range(args.interval, start_ms, end_ms, symbol=args.symbol)
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️ دریافت داده ناموفق بود: {e}", file=sys.stderr)
+        return 1
+    with open(args.out, "w") as f:
+        json.dump({"symbol": args.symbol, "interval": args.interval, "candles": candles}, f)
+    print(f"{len(candles)} کندل {args.symbol} {args.interval} → {args.out}")
+    return 0
+
+def _bar_path(c):
+    # ترتیب تقریبی قیمت داخل کندل: کندل صعودی اول low بعد high
+    if c["close"] >= c["open"]:
+        return (c["open"], c["low"], c["high"], c["close"])
+    return (c["open"], c["high"], c["low"], c["close"])
+
+def replay(candles, symbol, tf, window=60):
+    # همان مسیر auto_signal در حالت "close": هر کندل بسته‌شده یک‌بار ارزیابی می‌شود
+    from .config import TF_MS
+    from .moves import StrongMoveDetector
+    from .outcomes import OutcomeTracker
+    from .strategy import evaluate_breakout, signal_atr, trade_levels
+    from .timeutil import ts_str
+
+    tf_ms = TF_MS[tf]
+    tracker = OutcomeTracker()
+    detector = StrongMoveDetector(base_tf=tf)
+    signals = {}
+    moves = []
+
+    for i, c in enumerate(candles):
+        close_ts = (c["time"] + tf_ms) / 1000
+        for price in _bar_path(c):
+            for signal_id, fields in tracker.update(symbol, price, now=close_ts):
+                signals[signal_id].update(fields)
+        moves += detector.feed([c])
+
+        if i + 1 < 20:
+            continue
+        direction, ref, _ = evaluate_breakout(candles[max(0, i + 1 - window):i + 1])
+        if direction is None:
+            continue
+        entry = c["close"]
+        atr = signal_atr(candles[max(0, i + 1 - window):i + 1])
+        sl, tp1, tp2 = trade_levels(direction, entry, atr)
+        signal_id = f"{symbol}-{c['time']}"
+        signals[signal_id] = {
+            "symbol": symbol, "tf": tf, "dir": direction, "ref": ref, "entry": entry,
+            "sl": sl, "tp1": tp1, "tp2": tp2, "atr": atr, "time": ts_str(c["time"] + tf_ms),
+            "status": "open"
+        }
+        tracker.register(signal_id, symbol, direction, entry, sl, tp1, tp2, close_ts)
+
+    return list(signals.values()), moves
+
+def cmd_replay(args):
+    from .strategy import render_signal
+
+    with open(args.candles, "r") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {"candles": data}
+    symbol = data.get("symbol", SYMBOL)
+    tf = data.get("interval", SIGNAL_TF)
+    candles = sorted(data["candles"], key=lambda x: x["time"])
+    signals, moves = replay(candles, symbol, tf, window=args.window)
+
+    results = {}
+    r_sum = 0.0
+    for sig in signals:
+        results[sig.get("result", "OPEN")] = results.get(sig.get("result", "OPEN"), 0) + 1
+        r_sum += sig.get("r", 0.0)
+        if args.verbose:
+            print(render_signal(sig, "compact") + f" → {sig.get('result', 'OPEN')} {sig.get('r', 0.0):+.2f}R")
+    resolved = len(signals) - results.get("OPEN", 0)
+
+    print(f"Replay {symbol} {tf}: {len(candles)} کندل")
+    print(f"Signals: {len(signals)}" + "".join(f" | {k}: {v}" for k, v in sorted(results.items())))
+    if resolved:
+        print(f"Win Rate (TP2): {results.get('TP2', 0) / resolved * 100:.1f}% | Avg R: {r_sum / resolved:.2f}")
+    print(f"Strong moves: {len(moves)}")
+
+    if args.depth:
+        from .orderbook import replay_depth
+        book = replay_depth(args.depth)
+        mid = book.mid()
+        if mid is None:
+            print("Depth: دفتر سفارش همگام نشد")
+        else:
+            print(f"Depth: mid {mid:.2f} | imbalance ±{DEPTH_FEATURE_BPS}bps "
+                  f"{book.imbalance(DEPTH_FEATURE_BPS):+.2f} | resyncs {book.resyncs}")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m nds", description="NDS offline tools")
+    sub = parser.add_subparsers(dest="command")
+
+    p = sub.add_parser("backtest", help="خلاصه‌ی نتایج از آمار روزانه (بدون شبکه)")
+    p.add_argument("--days", type=int, default=0)
+    p.set_defaults(func=cmd_backtest)
+
+    p = sub.add_parser("backfill", help="دریافت کندل‌های تاریخی در فایل JSON")
+    p.add_argument("--interval", default="15m")
+    p.add_argument("--days", type=float, default=30)
+    p.add_argument("--symbol", default=SYMBOL)
+    p.add_argument("--out", default="candles.json")
+    p.set_defaults(func=cmd_backfill)
+
+    p = sub.add_parser("replay", help="اجرای استراتژی روی فایل کندل (خروجی backfill)")
+    p.add_argument("candles")
+    p.add_argument("--depth", help="فید ضبط‌شده‌ی دفتر سفارش (JSON lines)")
+    p.add_argument("--window", type=int, default=60)
+    p.add_argument("-v", "--verbose", action="store_true")
+    p.set_defaults(func=cmd_replay)
+
+    args = parser.parse_args(argv)
+    if not getattr(args, "func", None):
+        parser.print_help()
+        return 2
+    return args.func(args)
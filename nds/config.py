@@ -0,0 +1,183 @@
+import os
+import socket
+
+# =========================
+# CONFIG - V7.9 (STRATEGY B + FULL FEATURES)
+# =========================
+# فقط ثابت‌ها؛ این ماژول و بقیه‌ی هسته‌ی nds هنگام import هیچ فایل یا شبکه‌ای را لمس نمی‌کنند.
+SYMBOL = "BTCUSDT"
+LIMIT = 200  # داده‌ی بیشتر برای اندیکاتورها
+
+MIN_PROFIT_USD = 50
+
+RSI_PERIOD = 14
+VOLUME_MULTIPLIER = 0.9
+ATR_PERIOD = 14
+ADX_PERIOD = 14
+
+FUNDING_THRESHOLD = 0.005
+
+DEFAULT_CAPITAL = 10000
+RISK_PERCENT = 0.01
+SAFE_LEVERAGE_LONG = 5
+SAFE_LEVERAGE_SHORT = 3
+
+STRENGTH_THRESHOLD_A = 0.50
+STRENGTH_THRESHOLD_B = 0.40
+STRENGTH_THRESHOLD_C = 0.30
+STRENGTH_THRESHOLD_D = 0.20
+
+STRONG_MOVE_USD = 200
+
+D1_THRESHOLDS = {
+    "15m": 600,
+    "30m": 900,
+    "1h": 1200
+}
+STRONG_MOVE_WINDOWS = (3, 5)
+
+TF_MS = {
+    "15m": 15 * 60 * 1000,
+    "30m": 30 * 60 * 1000,
+    "1h": 60 * 60 * 1000,
+    "4h": 4 * 60 * 60 * 1000
+}
+
+MAX_C_SIGNALS_PER_DAY = 6
+MAX_D_SIGNALS_PER_DAY = 8
+
+# =========================
+# SIGNAL SCHEDULER (CANDLE-CLOSE ALIGNED)
+# =========================
+SIGNAL_TF = "15m"
+BREAKOUT_MIN_MOVE = 1000
+SIGNAL_GRACE_SECONDS = 5      # تاخیر بعد از بسته شدن کندل
+SIGNAL_POLL_SECONDS = 180     # بررسی کندل در حال شکل‌گیری بین بسته شدن‌ها (فاصله‌ی قدیمی)
+FAST_POLL_SECONDS = 20        # پول سریع وقتی قیمت نزدیک سطح breakout است
+NEAR_BREAKOUT_USD = 250
+SIGNAL_STALE_SECONDS = 15 * 60 + 120
+
+# =========================
+# ORDER BOOK (DEPTH)
+# =========================
+DEPTH_LIMIT = 500
+DEPTH_MAX_AGE = 10            # ثانیه؛ بعد از آن snapshot دوباره گرفته می‌شود
+DEPTH_FEATURE_BPS = 25
+DEPTH_WALL_MULTIPLIER = 5     # سطحی که چند برابر میانه‌ی سطوح اطراف است = دیوار
+DEPTH_FILTER = False          # اگر True باشد سیگنال خلاف عدم‌توازن دفتر رد می‌شود
+DEPTH_MIN_IMBALANCE = -0.3
+
+# =========================
+# VOLUME ANALYTICS
+# =========================
+PROFILE_BIN_USD = 50
+PROFILE_WINDOW = 96           # کندل‌های 15m = ۲۴ ساعت
+VALUE_AREA_SHARE = 0.70
+VWAP_FILTER = False           # اگر True باشد LONG فقط بالای VWAP روز و SHORT فقط زیر آن
+
+PRICE_TICK_SECONDS = 30
+OUTCOME_MAX_AGE_HOURS = 72
+
+MAX_ALERTS_PER_USER = 50
+ALERT_SEND_BATCH = 25
+
+# =========================
+# UPSTREAM (MEXC) BUDGET
+# =========================
+MEXC_BASE = "https://api.mexc.com"
+MEXC_WEIGHT_LIMIT = int(os.getenv("MEXC_WEIGHT_LIMIT", 500))  # وزن مجاز در هر پنجره
+MEXC_WEIGHT_WINDOW = 10
+MEXC_BULK_SHARE = 0.6  # درخواست‌های غیرفوری حداکثر ۶۰٪ پنجره را مصرف می‌کنند
+MEXC_MAX_WAIT = {"urgent": 3, "bulk": 30}
+
+MEXC_WEIGHTS = {
+    "/api/v3/klines": 1,
+    "/api/v3/ticker/price": 1,
+    "/api/v3/ticker/24hr": 1,
+    "/api/v3/premiumIndex": 1,
+    "/api/v3/openInterest": 1,
+    "/api/v3/depth": 1
+}
+
+RETRY_MAX = 3
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8
+BREAKER_FAILURES = 5
+BREAKER_COOLDOWN = 30
+REQUEST_CACHE_SIZE = 256
+
+# =========================
+# VENUES (HEDGED REQUESTS)
+# =========================
+VENUES_ENABLED = os.getenv("VENUES", "mexc,binance,bybit,okx").split(",")
+HEDGE_KLINES = os.getenv("HEDGE_KLINES", "0") == "1"  # حجم صرافی‌ها متفاوت است؛ پیش‌فرض فقط MEXC
+HEDGE_DEFAULT_MS = 800
+HEDGE_MIN_MS = 150
+HEDGE_MAX_MS = 2000
+HEDGE_TIMEOUT = 8
+COMPOSITE_WAIT = 1.5           # قیمت ترکیبی با صرافی‌هایی که تا این مهلت جواب داده‌اند
+VENUE_LATENCY_SAMPLES = 50
+
+# =========================
+# REGIME SCANNER (UNIVERSE)
+# =========================
+UNIVERSE = [x.strip().upper() for x in os.getenv("UNIVERSE", SYMBOL).split(",") if x.strip()]
+REGIME_TF = "1h"
+REGIME_BARS = 100
+REGIME_CORR_WINDOW = 48       # بازده‌های اخیر برای همبستگی و نوسان
+REGIME_CLUSTER_CORR = 0.8     # همبستگی بیشتر = یک خوشه
+REGIME_ADX_TREND = 25
+REGIME_ADX_RANGE = 20
+REGIME_SCAN_SECONDS = 300
+CLUSTER_SUPPRESS_SECONDS = 3600  # سیگنال هم‌جهت از خوشه‌ی مشترک در این بازه تکراری است
+
+# =========================
+# PERF WATCHDOG (EVENT LOOP)
+# =========================
+PERF_SAMPLE_SECONDS = 0.5     # فاصله‌ی نمونه‌برداری lag حلقه
+PERF_BLOCK_MS = 250           # انسداد طولانی‌تر = stack ترد حلقه ثبت می‌شود
+PERF_SLOW_MS = 200            # عملیات کندتر در حلقه‌ی «کندترین‌ها» می‌آید
+PERF_RING_SIZE = 100
+PERF_STACK_DEPTH = 12
+
+# =========================
+# OUTBOX (SIGNAL DELIVERY)
+# =========================
+OUTBOX_DRAIN_SECONDS = 5      # worker پیام‌های معوق را در این فاصله دوباره می‌فرستد
+OUTBOX_SEND_BATCH = 25        # ارسال هم‌زمان در هر دسته (محدودیت ~30 پیام/ثانیه‌ی تلگرام)
+OUTBOX_MAX_AGE = 1800         # سیگنال قدیمی‌تر بعد از ری‌استارت دیگر ارسال نمی‌شود
+OUTBOX_MAX_ATTEMPTS = 5       # خطای موقت؛ بعد از این تعداد گیرنده کنار گذاشته می‌شود
+OUTBOX_COMPACT_LINES = 1000   # ژورنال بزرگ‌تر فقط با دسته‌های معوق بازنویسی می‌شود
+
+# =========================
+# PERSISTENT FILES
+# =========================
+SIGNAL_LOG_FILE = "signal_log.json"
+STRONG_MOVE_LOG_FILE = "strong_move_log.json"
+RESTART_LOG_FILE = "restart_log.json"
+VIP_FILE = "vip_users.json"
+STATE_KV_FILE = "state_kv.json"
+STATS_FILE = "signal_stats.json"
+ALERT_FILE = "price_alerts.json"
+SUBS_FILE = "subscriptions.json"
+SNAPSHOT_FILE = "warm_state.bin"
+OUTBOX_FILE = "signal_outbox.jsonl"
+
+SNAPSHOT_VERSION = 2  # 2: JSON از to_state به جای pickle اشیاء
+SNAPSHOT_INTERVAL = 300
+SNAPSHOT_MAX_AGE_HOURS = 6
+CANDLE_CACHE_SIZE = 500
+
+STATS_DAYS_KEPT = 400
+
+# =========================
+# SHARED STATE / REPLICAS
+# =========================
+STATE_BACKEND = os.getenv("STATE_BACKEND", "file")  # file | sqlite | redis | memory
+STATE_URL = os.getenv("STATE_URL", "")
+STATE_PREFIX = os.getenv("STATE_PREFIX", "nds:")
+INSTANCE_ID = os.getenv("RENDER_INSTANCE_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+LEADER_LEASE_SECONDS = 60
+LEADER_RENEW_SECONDS = 20
+STATE_SYNC_SECONDS = 30
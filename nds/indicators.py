@@ -0,0 +1,168 @@
+from .config import (
+    RSI_PERIOD, ATR_PERIOD, ADX_PERIOD, VOLUME_MULTIPLIER,
+    STRENGTH_THRESHOLD_A, STRENGTH_THRESHOLD_B, STRENGTH_THRESHOLD_C, STRENGTH_THRESHOLD_D
+)
+
+# =========================
+# INDICATORS
+# =========================
+def calculate_rsi(c, period=RSI_PERIOD):
+    closes = [x["close"] for x in c]
+    if len(closes) < period + 1:
+        return 50
+    delta = [closes[i] - closes[i-1] for i in range(1, len(closes))]
+    gains = [d if d > 0 else 0 for d in delta]
+    losses = [-d if d < 0 else 0 for d in delta]
+    avg_gain = sum(gains[-period:]) / period
+    avg_loss = sum(losses[-period:]) / period
+    if avg_loss == 0:
+        return 100
+    rs = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs))
+
+def volume_filter(c, grade_level="A", stats=None):
+    if stats is not None and len(stats) > 1:
+        # میانگین از جمع تجمعی (O(1)) وقتی c همان کش کندل‌هاست
+        n = len(stats)
+        avg_vol = stats.avg_volume(max(0, n - 21), n - 1)
+    else:
+        vols = [x["volume"] for x in c[-21:-1]]
+        if not vols:
+            return False
+        avg_vol = sum(vols) / len(vols)
+    multiplier = 0.80 if grade_level in ["C", "D"] else 1.0 if grade_level == "B" else VOLUME_MULTIPLIER
+    return c[-1]["volume"] > avg_vol * multiplier
+
+def calculate_atr(c, period=ATR_PERIOD):
+    if len(c) < period + 1:
+        return 0
+    trs = []
+    for i in range(1, len(c)):
+        tr = max(
+            c[i]["high"] - c[i]["low"],
+            abs(c[i]["high"] - c[i-1]["close"]),
+            abs(c[i]["low"] - c[i-1]["close"])
+        )
+        trs.append(tr)
+    return sum(trs[-period:]) / period
+
+def calculate_adx(c, period=ADX_PERIOD):
+    if len(c) < period + 20:
+        return 0
+    tr_list = []
+    for i in range(1, len(c)):
+        tr = max(
+            c[i]["high"] - c[i]["low"],
+            abs(c[i]["high"] - c[i-1]["close"]),
+            abs(c[i]["low"] - c[i-1]["close"])
+        )
+        tr_list.append(tr)
+
+    plus_dm = []
+    minus_dm = []
+    for i in range(1, len(c)):
+        up = c[i]["high"] - c[i-1]["high"]
+        down = c[i-1]["low"] - c[i]["low"]
+        plus_dm.append(up if up > down and up > 0 else 0)
+        minus_dm.append(down if down > up and down > 0 else 0)
+
+    atr = tr_list[period-1]
+    atr_list = [atr]
+    for i in range(period, len(tr_list)):
+        atr = (atr * (period - 1) + tr_list[i]) / period
+        atr_list.append(atr)
+
+    plus_di = [100 * plus_dm[period-1] / atr_list[0] if atr_list[0] > 0 else 0]
+    minus_di = [100 * minus_dm[period-1] / atr_list[0] if atr_list[0] > 0 else 0]
+    for i in range(period, len(plus_dm)):
+        denom = atr_list[i - period + 1]
+        pdi = 100 * ((plus_di[-1] * (period - 1) + plus_dm[i]) / period) / denom if denom > 0 else 0
+        mdi = 100 * ((minus_di[-1] * (period - 1) + minus_dm[i]) / period) / denom if denom > 0 else 0
+        plus_di.append(pdi)
+        minus_di.append(mdi)
+
+    dx_list = []
+    for i in range(len(plus_di)):
+        s = plus_di[i] + minus_di[i]
+        dx = 100 * abs(plus_di[i] - minus_di[i]) / s if s > 0 else 0
+        dx_list.append(dx)
+
+    adx = sum(dx_list[-period:]) / period if len(dx_list) >= period else 0
+    return adx
+
+def liquidity_sweep(c, bias, grade_level="A"):
+    threshold = 1.02 if grade_level in ["C", "D"] else 1.01 if grade_level == "B" else 1.0
+    if len(c) < 7:
+        return False
+    if bias == "LONG":
+        min_low = min(x["low"] for x in c[-6:-1])
+        return c[-1]["low"] < min_low * threshold
+    if bias == "SHORT":
+        max_high = max(x["high"] for x in c[-6:-1])
+        return c[-1]["high"] > max_high * (2 - threshold)
+    return False
+
+def detect_fvg(c, bias, grade_level="A"):
+    if len(c) < 3:
+        return None
+    threshold = 1.02 if grade_level in ["C", "D"] else 1.01 if grade_level == "B" else 1.0
+    c1, c2, c3 = c[-3], c[-2], c[-1]
+    if bias == "LONG":
+        if c1["high"] < c3["low"] * threshold and c2["low"] > c1["high"]:
+            return (c1["high"], c3["low"] * threshold)
+    if bias == "SHORT":
+        if c1["low"] > c3["high"] * (2 - threshold) and c2["high"] < c1["low"]:
+            return (c3["high"] * (2 - threshold), c1["low"])
+    return None
+
+def compression(c, grade_level="A"):
+    if len(c) < 7:
+        return False
+    ranges = [x["high"] - x["low"] for x in c[-6:-1]]
+    if not ranges:
+        return False
+    avg_range = sum(ranges) / len(ranges)
+    threshold = 0.9 if grade_level in ["C", "D"] else 0.85 if grade_level == "B" else 0.7
+    return (c[-1]["high"] - c[-1]["low"]) < avg_range * threshold
+
+def early_bias(c):
+    if len(c) < 4:
+        return None
+    lows = [x["low"] for x in c[-4:]]
+    highs = [x["high"] for x in c[-4:]]
+    if lows[-1] > lows[-2] > lows[-3]:
+        return "LONG"
+    if highs[-1] < highs[-2] < highs[-3]:
+        return "SHORT"
+    return None
+
+def displacement(c, bias, grade_level="A"):
+    if len(c) < 2:
+        return False
+    last, prev = c[-1], c[-2]
+    body = abs(last["close"] - last["open"])
+    full = last["high"] - last["low"]
+    if full == 0:
+        return False
+    strength = body / full
+    threshold = (
+        STRENGTH_THRESHOLD_A if grade_level == "A"
+        else STRENGTH_THRESHOLD_B if grade_level == "B"
+        else STRENGTH_THRESHOLD_C if grade_level == "C"
+        else STRENGTH_THRESHOLD_D
+    )
+    if bias == "LONG" and last["close"] > prev["high"] and strength > threshold:
+        return True
+    if bias == "SHORT" and last["close"] < prev["low"] and strength > threshold:
+        return True
+    return False
+
+def find_swings(c):
+    highs = []
+    lows = []
+    for i in range(2, len(c)-2):
+        if c[i]["high"] > c[i-1]["high"] and c[i]["high"] > c[i+1]["high"]:
+            highs.append(c[i]["high"])
+        if c[i]["low"] < c[i-1]["low"] and c[i]["low"] < c[i+1]["low"]:
+            lows.append(c[i]["low"])
+    return (highs[-1] if highs else None), (lows[-1] if lows else None)
@@ -0,0 +1,616 @@
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+from .config import (
+    SYMBOL, LIMIT, TF_MS, SIGNAL_TF, CANDLE_CACHE_SIZE, DEPTH_LIMIT, DEPTH_MAX_AGE,
+    MEXC_BASE, MEXC_WEIGHT_LIMIT, MEXC_WEIGHT_WINDOW, MEXC_BULK_SHARE, MEXC_MAX_WAIT, MEXC_WEIGHTS,
+    RETRY_MAX, BACKOFF_BASE, BACKOFF_CAP, BREAKER_FAILURES, BREAKER_COOLDOWN, REQUEST_CACHE_SIZE,
+    VENUES_ENABLED, HEDGE_KLINES, HEDGE_DEFAULT_MS, HEDGE_MIN_MS, HEDGE_MAX_MS, HEDGE_TIMEOUT, COMPOSITE_WAIT,
+    VENUE_LATENCY_SAMPLES
+)
+from .orderbook import OrderBook
+from .perf import PERF
+from .volume import VolumeStats, VolumeProfile
+
+# =========================
+# REQUEST SCHEDULER (BUDGET / BACKOFF / BREAKER)
+# =========================
+class UpstreamUnavailable(requests.exceptions.RequestException):
+    pass
+
+class WeightBudget:
+    # وزن مصرف‌شده در پنجره‌ی لغزان؛ درخواست‌های bulk سهم کمتری دارند
+    def __init__(self, limit, window, bulk_share):
+        self.limit = limit
+        self.window = window
+        self.bulk_share = bulk_share
+        self.events = deque()
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def _purge(self, now):
+        while self.events and self.events[0][0] <= now - self.window:
+            self.used -= self.events.popleft()[1]
+
+    def try_reserve(self, weight, priority):
+        # خروجی: 0 یعنی رزرو شد، وگرنه ثانیه‌های لازم تا آزاد شدن ظرفیت
+        with self.lock:
+            now = time.time()
+            self._purge(now)
+            cap = self.limit if priority == "urgent" else self.limit * self.bulk_share
+            if self.used + weight <= cap:
+                self.events.append((now, weight))
+                self.used += weight
+                return 0
+            if not self.events:
+                return self.window
+            return self.events[0][0] + self.window - now
+
+    def reserve(self, weight, priority="urgent"):
+        deadline = time.time() + MEXC_MAX_WAIT.get(priority, 3)
+        while True:
+            wait = self.try_reserve(weight, priority)
+            if wait <= 0:
+                return True
+            if time.time() + wait > deadline:
+                return False
+            time.sleep(wait + 0.01)
+
+class CircuitBreaker:
+    def __init__(self, failures, cooldown):
+        self.threshold = failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.trial_owner = None
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.time() - self.opened_at < self.cooldown:
+            return "open"
+        return "half-open"
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial:
+                self.trial = True
+                self.trial_owner = threading.get_ident()
+                return True
+            return False
+
+    def release(self):
+        # درخواست آزمایشی بدون نتیجه تمام شد (مثلاً بودجه نبود)؛ درخواست بعدی دوباره آزمایش کند
+        with self.lock:
+            if self.trial and self.trial_owner == threading.get_ident():
+                self.trial = False
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                self.opened_at = time.time()
+            self.trial = False
+
+class RequestScheduler:
+    def __init__(self, base, weights, budget, breaker):
+        self.base = base
+        self.host = base.split("//", 1)[-1]
+        self.weights = weights
+        self.budget = budget
+        self.breaker = breaker
+        self.cache = {}  # (path, params) -> (ts, data)
+        self.session = requests.Session()
+
+    def _cached(self, key, reason, use_cache=True):
+        hit = self.cache.get(key) if use_cache else None
+        if hit is None:
+            raise UpstreamUnavailable(reason)
+        return hit[1]
+
+    def _store(self, key, data):
+        self.cache.pop(key, None)
+        self.cache[key] = (time.time(), data)
+        if len(self.cache) > REQUEST_CACHE_SIZE:
+            self.cache.pop(next(iter(self.cache)))
+
+    def get(self, path, params=None, priority="urgent", timeout=10, use_cache=True):
+        # زمان کل شامل انتظار بودجه و backoff؛ روی ترد حلقه یعنی انسداد.
+        # use_cache=False: به جای پاسخ کهنه‌ی cache خطا بده (برای hedge بین صرافی‌ها)
+        with PERF.measure(self.host + path):
+            return self._get(path, params, priority, timeout, use_cache)
+
+    def _get(self, path, params, priority, timeout, use_cache):
+        key = (path, tuple(sorted((params or {}).items())))
+        weight = self.weights.get(path, 1)
+        if not self.breaker.allow():
+            return self._cached(key, "circuit open", use_cache)
+        try:
+            return self._attempts(key, path, params, weight, priority, timeout, use_cache)
+        finally:
+            self.breaker.release()
+
+    def _attempts(self, key, path, params, weight, priority, timeout, use_cache):
+        for attempt in range(RETRY_MAX + 1):
+            if not self.budget.reserve(weight, priority):
+                return self._cached(key, "request budget exhausted", use_cache)
+            retry_after = None
+            try:
+                r = self.session.get(self.base + path, params=params, timeout=timeout)
+                if r.status_code == 429 or r.status_code >= 500:
+                    retry_after = r.headers.get("Retry-After")
+                else:
+                    # خطای 4xx دیگر مشکل درخواست است، نه سلامت upstream
+                    if r.status_code >= 400:
+                        self.breaker.success()
+                    r.raise_for_status()
+                    data = r.json()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                r = None
+            except requests.exceptions.HTTPError:
+                raise
+            except Exception:
+                self.breaker.failure()
+                raise
+            if r is not None and r.status_code < 400:
+                self.breaker.success()
+                self._store(key, data)
+                return data
+
+            # هر تلاش ناموفق شمرده می‌شود تا breaker در قطعی زود باز شود و تلاش‌ها قطع شوند
+            self.breaker.failure()
+            if attempt == RETRY_MAX or self.breaker.state == "open":
+                break
+            delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+            try:
+                delay = max(delay, float(retry_after))
+            except (TypeError, ValueError):
+                pass
+            time.sleep(min(delay, BACKOFF_CAP))
+
+        return self._cached(key, "upstream unhealthy", use_cache)
+
+    def status(self):
+        with self.budget.lock:
+            self.budget._purge(time.time())
+            used = self.budget.used
+        return f"MEXC weight {used}/{self.budget.limit} per {self.budget.window}s, breaker {self.breaker.state}"
+
+MEXC = RequestScheduler(
+    MEXC_BASE,
+    MEXC_WEIGHTS,
+    WeightBudget(MEXC_WEIGHT_LIMIT, MEXC_WEIGHT_WINDOW, MEXC_BULK_SHARE),
+    CircuitBreaker(BREAKER_FAILURES, BREAKER_COOLDOWN)
+)
+
+# =========================
+# MARKET DATA
+# =========================
+def parse_klines(data):
+    candles = []
+    for k in data:
+        candles.append({
+            "time": int(k[0]),
+            "open": float(k[1]),
+            "high": float(k[2]),
+            "low": float(k[3]),
+            "close": float(k[4]),
+            "volume": float(k[5])
+        })
+    return candles
+
+def get_klines(interval, limit=LIMIT, priority="urgent", symbol=SYMBOL):
+    if HEDGE_KLINES and priority == "urgent":
+        hit = hedged("klines", symbol, interval, limit)
+        return hit[1] if hit else None
+    try:
+        data = MEXC.get(
+            "/api/v3/klines",
+            params={"symbol": symbol, "interval": interval, "limit": limit},
+            priority=priority
+        )
+        return parse_klines(data)
+    except requests.exceptions.RequestException:
+        return None
+    except (ValueError, KeyError, TypeError):
+        return None
+
+CANDLES = {}  # interval -> کندل‌های کش‌شده (قدیمی به جدید)
+# get_candles در thread pool اجرا می‌شود و CANDLES/VOLUME/PROFILE را عوض می‌کند؛
+# خواندن آن‌ها از event loop هم زیر همین قفل است. درخواست شبکه بیرون از قفل
+# انجام می‌شود تا قفل فقط چند میلی‌ثانیه‌ی ادغام نگه داشته شود.
+CANDLES_LOCK = threading.Lock()
+
+def cached_candles():
+    with CANDLES_LOCK:
+        return dict(CANDLES)
+
+def restore_candles(candles):
+    with CANDLES_LOCK:
+        CANDLES.update(candles)
+
+def _merge(cached, fresh):
+    if not cached or fresh[0]["time"] > cached[-1]["time"]:
+        return fresh  # فاصله بیشتر از حد مجاز بود
+    cut = len(cached)
+    while cut and cached[cut - 1]["time"] >= fresh[0]["time"]:
+        cut -= 1
+    return cached[:cut] + fresh
+
+def get_candles(interval, limit=LIMIT):
+    # فقط فاصله‌ی از آخرین کندل کش‌شده تا الان دوباره دریافت می‌شود
+    tf_ms = TF_MS.get(interval)
+    if not tf_ms:
+        return get_klines(interval, limit)
+    with CANDLES_LOCK:
+        cached = CANDLES.get(interval)
+        last = cached[-1]["time"] if cached and len(cached) >= limit else None
+    if last is not None:
+        missing = (int(time.time() * 1000) - last) // tf_ms + 2
+        fresh = get_klines(interval, min(max(missing, 2), 1000))
+    else:
+        # پرکردن اولیه‌ی کش فوری نیست
+        fresh = get_klines(interval, max(limit, LIMIT), priority="bulk")
+    if not fresh:
+        return None
+    with CANDLES_LOCK:
+        # کش ممکن است در این فاصله توسط ترد دیگری به‌روز شده باشد
+        merged = _merge(CANDLES.get(interval), fresh) if last is not None else fresh
+        CANDLES[interval] = merged[-CANDLE_CACHE_SIZE:]
+        VOLUME.setdefault(interval, VolumeStats()).sync(CANDLES[interval])
+        if interval == SIGNAL_TF:
+            PROFILE.sync(CANDLES[interval][:-1])
+        return CANDLES[interval][-limit:]
+
+def fetch_klines_range(interval, start_ms, end_ms=None, symbol=SYMBOL, batch=1000):
+    # تاریخچه در پنجره‌های batch کندلی (برای backfill)؛ پنجره‌ی خالی = توقف صرافی، رد می‌شود
+    tf_ms = TF_MS[interval]
+    end_ms = end_ms or int(time.time() * 1000)
+    candles = []
+    cursor = start_ms - start_ms % tf_ms
+    while cursor < end_ms:
+        window_end = min(cursor + batch * tf_ms, end_ms)
+        data = MEXC.get(
+            "/api/v3/klines",
+            params={"symbol": symbol, "interval": interval, "startTime": cursor,
+                    "endTime": window_end - 1, "limit": batch},
+            priority="bulk"
+        )
+        part = [x for x in parse_klines(data) if cursor <= x["time"] < window_end]
+        candles.extend(part)
+        cursor = part[-1]["time"] + tf_ms if part else window_end
+    return candles
+
+UNIVERSE_POOL = ThreadPoolExecutor(max_workers=4)  # جدا از HEDGE_POOL تا اسکن، درخواست‌های فوری را معطل نکند
+
+def fetch_universe(symbols, interval, limit):
+    # درخواست‌های bulk؛ نمادی که در این دور داده نداد حذف می‌شود
+    fetched = UNIVERSE_POOL.map(lambda s: get_klines(interval, limit, priority="bulk", symbol=s), symbols)
+    return {s: c for s, c in zip(symbols, fetched) if c}
+
+# =========================
+# VENUES (MULTI-EXCHANGE)
+# =========================
+# هر صرافی یک adapter با زمان‌بند درخواست و breaker خودش دارد. درخواست‌ها
+# hedge می‌شوند: اگر سریع‌ترین صرافی تا p95 تاخیرش جواب نداد، صرافی بعدی هم
+# پرسیده می‌شود و اولین جواب معتبر برداشته می‌شود.
+class Venue:
+    name = "venue"
+    INTERVALS = {}
+
+    def __init__(self, scheduler=None):
+        self.http = scheduler
+        self.latencies = deque(maxlen=VENUE_LATENCY_SAMPLES)
+        self.failures = 0
+
+    def p95_ms(self):
+        if len(self.latencies) < 5:
+            return HEDGE_DEFAULT_MS
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def healthy(self):
+        # half-open با درخواست آزمایشی در جریان هم فعلاً جوابی نمی‌دهد
+        if self.http is None:
+            return True
+        breaker = self.http.breaker
+        return breaker.state == "closed" or (breaker.state == "half-open" and not breaker.trial)
+
+    def get(self, path, params):
+        # پاسخ کهنه‌ی cache برای hedge معتبر نیست؛ خطا تا صرافی بعدی پرسیده شود
+        return self.http.get(path, params=params, use_cache=False)
+
+    def call(self, method, *args):
+        t = time.time()
+        try:
+            result = getattr(self, method)(*args)
+        except Exception:
+            self.failures += 1
+            raise
+        self.latencies.append((time.time() - t) * 1000)
+        return result
+
+    def ticker(self, symbol):
+        # {"price", "change" (٪), "high", "quote_volume"}
+        raise NotImplementedError
+
+    def klines(self, symbol, interval, limit):
+        raise NotImplementedError
+
+class MexcVenue(Venue):
+    name = "MEXC"
+
+    def ticker(self, symbol):
+        d = self.get("/api/v3/ticker/24hr", params={"symbol": symbol})
+        return {
+            "price": float(d["lastPrice"]),
+            "change": float(d["priceChangePercent"]),
+            "high": float(d["highPrice"]),
+            "quote_volume": float(d.get("quoteVolume") or 0)
+        }
+
+    def klines(self, symbol, interval, limit):
+        return parse_klines(self.get(
+            "/api/v3/klines", params={"symbol": symbol, "interval": interval, "limit": limit}
+        ))
+
+class BinanceVenue(Venue):
+    name = "Binance"
+
+    def ticker(self, symbol):
+        d = self.get("/api/v3/ticker/24hr", params={"symbol": symbol})
+        return {
+            "price": float(d["lastPrice"]),
+            "change": float(d["priceChangePercent"]),
+            "high": float(d["highPrice"]),
+            "quote_volume": float(d.get("quoteVolume") or 0)
+        }
+
+    def klines(self, symbol, interval, limit):
+        return parse_klines(self.get(
+            "/api/v3/klines", params={"symbol": symbol, "interval": interval, "limit": min(limit, 1000)}
+        ))
+
+class BybitVenue(Venue):
+    name = "Bybit"
+    INTERVALS = {"15m": "15", "30m": "30", "1h": "60", "4h": "240", "1d": "D"}
+
+    def ticker(self, symbol):
+        d = self.get("/v5/market/tickers", params={"category": "spot", "symbol": symbol})
+        t = d["result"]["list"][0]
+        return {
+            "price": float(t["lastPrice"]),
+            "change": float(t["price24hPcnt"]) * 100,
+            "high": float(t["highPrice24h"]),
+            "quote_volume": float(t.get("turnover24h") or 0)
+        }
+
+    def klines(self, symbol, interval, limit):
+        d = self.get("/v5/market/kline", params={
+            "category": "spot", "symbol": symbol, "interval": self.INTERVALS[interval], "limit": min(limit, 1000)
+        })
+        return parse_klines(reversed(d["result"]["list"]))
+
+class OkxVenue(Venue):
+    name = "OKX"
+    INTERVALS = {"15m": "15m", "30m": "30m", "1h": "1H", "4h": "4H", "1d": "1Dutc"}
+
+    @staticmethod
+    def inst(symbol):
+        return symbol[:-4] + "-" + symbol[-4:]
+
+    def ticker(self, symbol):
+        t = self.get("/api/v5/market/ticker", params={"instId": self.inst(symbol)})["data"][0]
+        last, open24 = float(t["last"]), float(t["open24h"])
+        return {
+            "price": last,
+            "change": (last / open24 - 1) * 100 if open24 else 0.0,
+            "high": float(t["high24h"]),
+            "quote_volume": float(t.get("volCcy24h") or 0)
+        }
+
+    def klines(self, symbol, interval, limit):
+        d = self.get("/api/v5/market/candles", params={
+            "instId": self.inst(symbol), "bar": self.INTERVALS[interval], "limit": min(limit, 300)
+        })
+        return parse_klines(reversed(d["data"]))
+
+class StaticVenue(Venue):
+    # جایگزین محلی برای اجرای آفلاین/تست: قیمت ثابت با تاخیر و خطای قابل تنظیم
+    def __init__(self, name, price, latency_ms=0, fail=False, quote_volume=1.0):
+        Venue.__init__(self)
+        self.name = name
+        self.price = price
+        self.latency_ms = latency_ms
+        self.fail = fail
+        self.quote_volume = quote_volume
+
+    def ticker(self, symbol):
+        time.sleep(self.latency_ms / 1000)
+        if self.fail:
+            raise UpstreamUnavailable(self.name + " down")
+        return {"price": self.price, "change": 0.0, "high": self.price, "quote_volume": self.quote_volume}
+
+def _venue_scheduler(base):
+    return RequestScheduler(
+        base, {}, WeightBudget(MEXC_WEIGHT_LIMIT, MEXC_WEIGHT_WINDOW, MEXC_BULK_SHARE),
+        CircuitBreaker(BREAKER_FAILURES, BREAKER_COOLDOWN)
+    )
+
+def make_venues(names=VENUES_ENABLED):
+    makers = {
+        "mexc": lambda: MexcVenue(MEXC),
+        "binance": lambda: BinanceVenue(_venue_scheduler("https://api.binance.com")),
+        "bybit": lambda: BybitVenue(_venue_scheduler("https://api.bybit.com")),
+        "okx": lambda: OkxVenue(_venue_scheduler("https://www.okx.com")),
+    }
+    return [makers[n.strip().lower()]() for n in names if n.strip().lower() in makers]
+
+VENUES = make_venues()
+HEDGE_POOL = ThreadPoolExecutor(max_workers=8)
+
+def _valid(method, result):
+    if method == "ticker":
+        return bool(result) and result.get("price", 0) > 0
+    return bool(result)
+
+@PERF.timed()
+def hedged(method, *args, venues=None, timeout=HEDGE_TIMEOUT):
+    # خروجی: (نام صرافی, نتیجه) یا None
+    venues = venues if venues is not None else VENUES
+    # ترتیب: اولی صرافی اصلی (MEXC)، بقیه بر اساس تاخیر p95
+    order = [v for v in venues if v.healthy()] or list(venues)
+    order = order[:1] + sorted(order[1:], key=lambda v: v.p95_ms())
+    deadline = time.time() + timeout
+    pending = {}
+    launched = 0
+
+    def launch():
+        nonlocal launched
+        v = order[launched]
+        launched += 1
+        pending[HEDGE_POOL.submit(v.call, method, *args)] = v
+
+    launch()
+    while pending:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        hedge_delay = None
+        if launched < len(order):
+            last = order[launched - 1]
+            hedge_delay = min(max(last.p95_ms(), HEDGE_MIN_MS), HEDGE_MAX_MS) / 1000
+        done, _ = wait(list(pending), timeout=min(remaining, hedge_delay or remaining), return_when=FIRST_COMPLETED)
+        failed = False
+        for f in done:
+            v = pending.pop(f)
+            try:
+                result = f.result()
+            except Exception:
+                failed = True
+                continue
+            if _valid(method, result):
+                return v.name, result
+            failed = True
+        if launched < len(order) and (failed or not done):
+            launch()
+    return None
+
+def composite_ticker(symbol=SYMBOL, venues=None, timeout=HEDGE_TIMEOUT, settle=COMPOSITE_WAIT):
+    # قیمت ترکیبی وزن‌دار با حجم دلاری ۲۴ساعته. بعد از settle ثانیه با هر چه رسیده
+    # جواب می‌دهد؛ فقط اگر هنوز هیچ قیمتی نرسیده تا timeout منتظر اولین جواب می‌ماند.
+    venues = venues if venues is not None else VENUES
+    futures = {HEDGE_POOL.submit(v.call, "ticker", symbol): v for v in venues}
+    started = time.time()
+    pending = set(futures)
+    quotes = []
+    while pending:
+        limit = started + (settle if quotes else timeout)
+        remaining = limit - time.time()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for f in done:
+            try:
+                t = f.result()
+            except Exception:
+                continue
+            if _valid("ticker", t):
+                quotes.append((futures[f].name, t))
+    if not quotes:
+        return None
+    weights = [max(t["quote_volume"], 0.0) for _, t in quotes]
+    total = sum(weights)
+    if total > 0:
+        price = sum(t["price"] * w for (_, t), w in zip(quotes, weights)) / total
+    else:
+        price = sum(t["price"] for _, t in quotes) / len(quotes)
+    return {"price": price, "quotes": quotes}
+
+def get_last_price(symbol=SYMBOL):
+    hit = hedged("ticker", symbol)
+    return hit[1]["price"] if hit else None
+
+def get_funding_and_oi():
+    try:
+        funding_raw = MEXC.get("/api/v3/premiumIndex", params={"symbol": SYMBOL}).get("fundingRate")
+        funding = float(funding_raw)
+
+        oi_raw = MEXC.get("/api/v3/openInterest", params={"symbol": SYMBOL}).get("openInterestValue")
+        oi = float(oi_raw)
+        return funding, oi
+    except requests.exceptions.RequestException:
+        return None, None
+    except (ValueError, KeyError, TypeError):
+        return None, None
+
+BOOK = OrderBook()
+
+def fetch_depth_snapshot(book=None, priority="urgent"):
+    book = book or BOOK
+    try:
+        d = MEXC.get("/api/v3/depth", params={"symbol": book.symbol, "limit": DEPTH_LIMIT}, priority=priority)
+        book.apply_snapshot(d["lastUpdateId"], d.get("bids", []), d.get("asks", []))
+        return True
+    except requests.exceptions.RequestException:
+        return False
+    except (ValueError, KeyError, TypeError):
+        return False
+
+def get_depth_book():
+    if not BOOK.synced or time.time() - BOOK.updated_ts > DEPTH_MAX_AGE:
+        if not fetch_depth_snapshot():
+            return None
+    return BOOK
+
+VOLUME = {}  # interval -> VolumeStats
+PROFILE = VolumeProfile()
+
+def _session_vwap(stats):
+    day_ms = 24 * 60 * 60 * 1000
+    return stats.anchored_vwap(stats.times[-1] - stats.times[-1] % day_ms)
+
+def session_vwap(interval=SIGNAL_TF):
+    with CANDLES_LOCK:
+        stats = VOLUME.get(interval)
+        if stats is None or not len(stats):
+            return None
+        return _session_vwap(stats)
+
+def vwap_summary(interval=SIGNAL_TF, hours=None):
+    # همه‌ی اعداد /vwap در یک نوبت قفل، تا به‌روزرسانی هم‌زمان وسط محاسبه نیاید
+    with CANDLES_LOCK:
+        stats = VOLUME.get(interval)
+        if stats is None or not len(stats):
+            return None
+        n = len(stats)
+        window = None
+        if hours:
+            count = hours * 3600 * 1000 // TF_MS[interval]
+            window = stats.vwap(max(0, n - count), n)
+        return {
+            "session": _session_vwap(stats),
+            "window": window,
+            "avg_volume": stats.avg_volume(max(0, n - 21), n - 1),
+        }
+
+def profile_summary():
+    with CANDLES_LOCK:
+        return PROFILE.summary()
@@ -0,0 +1,176 @@
+from collections import deque
+
+from .config import D1_THRESHOLDS, STRONG_MOVE_USD, STRONG_MOVE_WINDOWS, TF_MS
+
+# =========================
+# D-1 MOVE DETECTION (MULTI-TF, LIVE)
+# =========================
+class RollingExtremes:
+    # max/min پنجره‌ی لغزان با دو صف یکنوا؛ هر کندل O(1) سرشکن
+    def __init__(self, window):
+        self.window = window
+        self.n = 0
+        self.maxq = deque()
+        self.minq = deque()
+        self.opens = deque(maxlen=window)
+        self.last_close = None
+
+    def push(self, c):
+        i = self.n
+        self.n += 1
+        while self.maxq and self.maxq[-1][1] <= c["high"]:
+            self.maxq.pop()
+        self.maxq.append((i, c["high"]))
+        while self.minq and self.minq[-1][1] >= c["low"]:
+            self.minq.pop()
+        self.minq.append((i, c["low"]))
+        while self.maxq[0][0] <= i - self.window:
+            self.maxq.popleft()
+        while self.minq[0][0] <= i - self.window:
+            self.minq.popleft()
+        self.opens.append(c["open"])
+        self.last_close = c["close"]
+
+    def ready(self):
+        return self.n >= self.window
+
+    def high(self):
+        return self.maxq[0][1]
+
+    def low(self):
+        return self.minq[0][1]
+
+    def first_open(self):
+        return self.opens[0]
+
+    def to_state(self):
+        return {
+            "window": self.window,
+            "n": self.n,
+            "maxq": [list(x) for x in self.maxq],
+            "minq": [list(x) for x in self.minq],
+            "opens": list(self.opens),
+            "last_close": self.last_close,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        win = cls(state["window"])
+        win.n = state["n"]
+        win.maxq = deque(tuple(x) for x in state["maxq"])
+        win.minq = deque(tuple(x) for x in state["minq"])
+        win.opens = deque(state["opens"], maxlen=win.window)
+        win.last_close = state["last_close"]
+        return win
+
+class CandleAggregator:
+    # کندل‌های بسته‌ی 15m را به تایم‌فریم بالاتر تبدیل می‌کند
+    def __init__(self, tf, base_tf="15m"):
+        self.tf_ms = TF_MS[tf]
+        self.ratio = TF_MS[tf] // TF_MS[base_tf]
+        self.cur = None
+        self.count = 0
+
+    def push(self, c):
+        bucket = c["time"] - c["time"] % self.tf_ms
+        if self.cur is None or self.cur["time"] != bucket:
+            self.cur = dict(c, time=bucket)
+            self.count = 1
+        else:
+            self.cur["high"] = max(self.cur["high"], c["high"])
+            self.cur["low"] = min(self.cur["low"], c["low"])
+            self.cur["close"] = c["close"]
+            self.cur["volume"] += c["volume"]
+            self.count += 1
+        if self.count == self.ratio:
+            done, self.cur = self.cur, None
+            return done
+        return None
+
+class StrongMoveDetector:
+    def __init__(self, base_tf="15m"):
+        self.base_tf = base_tf
+        self.last_time = None
+        self.aggs = {tf: CandleAggregator(tf, base_tf) for tf in D1_THRESHOLDS if tf != base_tf}
+        self.windows = {tf: [RollingExtremes(w) for w in STRONG_MOVE_WINDOWS] for tf in D1_THRESHOLDS}
+        self.last_fire = {}  # tf -> (bias, n)
+
+    def _check(self, tf, c):
+        events = []
+        for win in self.windows[tf]:
+            win.push(c)
+        for win in self.windows[tf]:
+            if not win.ready():
+                continue
+            move = win.high() - win.low()
+            net = c["close"] - win.first_open()
+            if move < D1_THRESHOLDS[tf] or abs(net) < STRONG_MOVE_USD:
+                continue
+            bias = "LONG" if net > 0 else "SHORT"
+            n = win.n
+            prev = self.last_fire.get(tf)
+            # تا وقتی پنجره کامل عوض نشده، همان حرکت دوباره ثبت نمی‌شود
+            if prev and prev[0] == bias and n - prev[1] < max(STRONG_MOVE_WINDOWS):
+                break
+            self.last_fire[tf] = (bias, n)
+            events.append({
+                "tf": tf,
+                "window": win.window,
+                "move": move,
+                "net": net,
+                "bias": bias,
+                "high": win.high(),
+                "low": win.low(),
+                "candle_time": c["time"]
+            })
+            break
+        return events
+
+    def to_state(self):
+        return {
+            "base_tf": self.base_tf,
+            "last_time": self.last_time,
+            "aggs": {tf: {"cur": agg.cur, "count": agg.count} for tf, agg in self.aggs.items()},
+            "windows": {tf: [w.to_state() for w in wins] for tf, wins in self.windows.items()},
+            "last_fire": {tf: list(x) for tf, x in self.last_fire.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        # تایم‌فریم یا پنجره‌ای که در تنظیمات فعلی نیست نادیده گرفته می‌شود و از صفر پر می‌شود
+        det = cls(state["base_tf"])
+        det.last_time = state["last_time"]
+        for tf, agg in state["aggs"].items():
+            if tf in det.aggs:
+                det.aggs[tf].cur = agg["cur"]
+                det.aggs[tf].count = agg["count"]
+        for tf, wins in state["windows"].items():
+            if tf in det.windows and [w["window"] for w in wins] == list(STRONG_MOVE_WINDOWS):
+                det.windows[tf] = [RollingExtremes.from_state(w) for w in wins]
+        det.last_fire = {tf: tuple(x) for tf, x in state["last_fire"].items() if tf in det.windows}
+        return det
+
+    def feed(self, candles, fire=True):
+        # فقط کندل‌های بسته‌ی جدید؛ در اولین فراخوانی (گرم شدن) رویدادی ثبت نمی‌شود
+        fire = fire and self.last_time is not None
+        events = []
+        for c in candles:
+            if self.last_time is not None and c["time"] <= self.last_time:
+                continue
+            self.last_time = c["time"]
+            events += self._check(self.base_tf, c)
+            for tf, agg in self.aggs.items():
+                done = agg.push(c)
+                if done:
+                    events += self._check(tf, done)
+        return events if fire else []
+
+    def current(self):
+        results = []
+        for tf, wins in self.windows.items():
+            for win in wins:
+                if win.ready() and win.high() - win.low() >= D1_THRESHOLDS[tf]:
+                    bias = "LONG" if win.last_close > win.first_open() else "SHORT"
+                    results.append({"tf": tf, "move": win.high() - win.low(), "bias": bias})
+                    break
+        return results
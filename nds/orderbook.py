@@ -0,0 +1,157 @@
+import json
+import time
+import bisect
+
+from .config import SYMBOL, DEPTH_FEATURE_BPS, DEPTH_WALL_MULTIPLIER
+
+# =========================
+# ORDER BOOK (L2)
+# =========================
+class BookSide:
+    # سطوح قیمت مرتب (bisect) + مقدار هر سطح
+    def __init__(self, descending):
+        self.desc = descending
+        self.keys = []   # برای bid ها -price تا ترتیب از بهترین قیمت باشد
+        self.qty = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _key(self, price):
+        return -price if self.desc else price
+
+    def set(self, price, qty):
+        k = self._key(price)
+        if qty <= 0:
+            if self.qty.pop(price, None) is not None:
+                i = bisect.bisect_left(self.keys, k)
+                del self.keys[i]
+            return
+        if price not in self.qty:
+            bisect.insort(self.keys, k)
+        self.qty[price] = qty
+
+    def clear(self):
+        self.keys = []
+        self.qty = {}
+
+    def best(self):
+        if not self.keys:
+            return None
+        return self._key(self.keys[0])
+
+    def upto(self, price):
+        # سطوح از بهترین قیمت تا price (شامل)؛ O(log n + k)
+        i = bisect.bisect_right(self.keys, self._key(price))
+        return [(self._key(k), self.qty[self._key(k)]) for k in self.keys[:i]]
+
+    def around(self, lo, hi):
+        a, b = sorted((self._key(lo), self._key(hi)))
+        i = bisect.bisect_left(self.keys, a)
+        j = bisect.bisect_right(self.keys, b)
+        return [(self._key(k), self.qty[self._key(k)]) for k in self.keys[i:j]]
+
+class OrderBook:
+    def __init__(self, symbol=SYMBOL):
+        self.symbol = symbol
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        self.last_update_id = None
+        self.synced = False
+        self.updated_ts = 0
+        self.resyncs = 0
+
+    def apply_snapshot(self, last_update_id, bids, asks):
+        self.bids.clear()
+        self.asks.clear()
+        for p, q in bids:
+            self.bids.set(float(p), float(q))
+        for p, q in asks:
+            self.asks.set(float(p), float(q))
+        self.last_update_id = int(last_update_id)
+        self.synced = True
+        self.updated_ts = time.time()
+
+    def apply_diff(self, first_id, last_id, bids, asks):
+        # False یعنی فاصله در شماره‌ها دیده شد و snapshot جدید لازم است
+        if not self.synced:
+            return False
+        if last_id <= self.last_update_id:
+            return True  # قدیمی‌تر از snapshot
+        if first_id > self.last_update_id + 1:
+            self.synced = False
+            self.resyncs += 1
+            return False
+        for p, q in bids:
+            self.bids.set(float(p), float(q))
+        for p, q in asks:
+            self.asks.set(float(p), float(q))
+        self.last_update_id = int(last_id)
+        self.updated_ts = time.time()
+        return True
+
+    def mid(self):
+        b, a = self.bids.best(), self.asks.best()
+        if b is None or a is None:
+            return None
+        return (a + b) / 2
+
+    def depth_within(self, bps, ref=None):
+        ref = ref or self.mid()
+        if ref is None:
+            return 0.0, 0.0
+        d = ref * bps / 10000
+        bid = sum(q for _, q in self.bids.upto(ref - d))
+        ask = sum(q for _, q in self.asks.upto(ref + d))
+        return bid, ask
+
+    def imbalance(self, bps, ref=None):
+        bid, ask = self.depth_within(bps, ref)
+        if bid + ask == 0:
+            return 0.0
+        return (bid - ask) / (bid + ask)
+
+    def wall_near(self, level, bps=DEPTH_FEATURE_BPS, multiplier=DEPTH_WALL_MULTIPLIER):
+        # بزرگ‌ترین سطح در ±bps اطراف level اگر از multiplier برابر میانه بزرگ‌تر باشد
+        d = level * bps / 10000
+        levels = self.bids.around(level - d, level + d) + self.asks.around(level - d, level + d)
+        if len(levels) < 3:
+            return None
+        qtys = sorted(q for _, q in levels)
+        median = qtys[len(qtys) // 2]
+        price, qty = max(levels, key=lambda x: x[1])
+        if median > 0 and qty >= median * multiplier:
+            side = "bid" if price in self.bids.qty else "ask"
+            return {"price": price, "qty": qty, "side": side, "ratio": qty / median}
+        return None
+
+def replay_depth(path, book=None):
+    # فید ضبط‌شده (JSON lines): {"type": "snapshot", "lastUpdateId", "bids", "asks"}
+    # یا {"type": "diff", "U": first_id, "u": last_id, "b": [...], "a": [...]}.
+    # بعد از فاصله در شماره‌ها، diff ها تا snapshot بعدی نادیده گرفته می‌شوند.
+    book = book or OrderBook()
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            ev = json.loads(line)
+            if ev.get("type") == "snapshot":
+                book.apply_snapshot(ev["lastUpdateId"], ev.get("bids", []), ev.get("asks", []))
+            elif ev.get("type") == "diff":
+                book.apply_diff(int(ev["U"]), int(ev["u"]), ev.get("b", []), ev.get("a", []))
+    return book
+
+def depth_features(direction, ref, entry, book):
+    if book is None or book.mid() is None:
+        return None
+    bid, ask = book.depth_within(DEPTH_FEATURE_BPS, entry)
+    imb = book.imbalance(DEPTH_FEATURE_BPS, entry)
+    return {
+        "bid": bid,
+        "ask": ask,
+        "imbalance": imb,
+        "aligned": imb if direction == "LONG" else -imb,
+        "wall_ref": book.wall_near(ref),
+        "wall_entry": book.wall_near(entry),
+    }
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+
+from .config import OUTBOX_FILE, OUTBOX_MAX_AGE, OUTBOX_COMPACT_LINES
+
+# =========================
+# DURABLE OUTBOX (SIGNAL DELIVERY)
+# =========================
+# هر پیام خروجی قبل از ارسال یک‌بار به‌صورت یک دسته در ژورنال JSONL نوشته
+# می‌شود (append-only، با fsync). بعد از ارسال، برای هر گیرنده یک ack ثبت
+# می‌شود؛ بعد از ری‌استارت ژورنال دوباره خوانده می‌شود و فقط گیرنده‌های بدون
+# ack دوباره ارسال می‌شوند (حداقل یک‌بار: crash بین ارسال و ack = پیام تکراری).
+#
+# خط‌های ژورنال:
+#   {"op": "batch", "id", "key", "ts", "texts": [...], "to": [[chat_id, text_index], ...]}
+#   {"op": "ack", "id", "status": sent|failed|superseded|expired, "chat_ids": [...]}
+#
+# ژورنال فایل محلی است (نه STATE)، چون backend های STATE فقط get/set کامل دارند.
+class Outbox:
+    def __init__(self, path=OUTBOX_FILE, max_age=OUTBOX_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.batches = {}    # batch_id -> {"key", "ts", "texts", "pending": {chat_id: text_index}}
+        self.attempts = {}   # (batch_id, chat_id) -> تعداد خطای موقت (فقط در حافظه)
+        self.counts = {"sent": 0, "failed": 0, "superseded": 0, "expired": 0}
+        self.lines = 0
+
+    def _append(self, records, sync=False):
+        try:
+            with open(self.path, "a") as f:
+                for r in records:
+                    f.write(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n")
+                f.flush()
+                if sync:
+                    os.fsync(f.fileno())
+        except OSError:
+            # دیسک در دسترس نیست؛ ارسال از حافظه ادامه می‌یابد ولی ماندگار نیست
+            return False
+        self.lines += len(records)
+        return True
+
+    def _apply(self, r):
+        if r.get("op") == "batch":
+            self.batches[r["id"]] = {
+                "key": r.get("key"),
+                "ts": r.get("ts", 0),
+                "texts": r["texts"],
+                "pending": {chat_id: i for chat_id, i in r["to"]},
+            }
+            return
+        batch = self.batches.get(r.get("id"))
+        if batch is None:
+            return
+        for chat_id in r.get("chat_ids", []):
+            if batch["pending"].pop(chat_id, None) is not None:
+                self.counts[r["status"]] = self.counts.get(r["status"], 0) + 1
+                self.attempts.pop((r["id"], chat_id), None)
+        if not batch["pending"]:
+            del self.batches[r["id"]]
+
+    def load(self):
+        self.__init__(self.path, self.max_age)
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, "r") as f:
+            for line in f:
+                self.lines += 1
+                try:
+                    self._apply(json.loads(line))
+                except (ValueError, KeyError, TypeError):
+                    continue  # خط نیمه‌نوشته از crash
+        self.counts = dict.fromkeys(self.counts, 0)
+        self.compact()
+        return self.pending_count()
+
+    def compact(self):
+        # فقط دسته‌های معوق (با گیرنده‌های باقی‌مانده) بازنویسی می‌شوند؛ جایگزینی اتمیک
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                for batch_id, b in self.batches.items():
+                    f.write(json.dumps({
+                        "op": "batch", "id": batch_id, "key": b["key"], "ts": b["ts"],
+                        "texts": b["texts"], "to": [[c, i] for c, i in b["pending"].items()],
+                    }, ensure_ascii=False, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError:
+            return False
+        self.lines = len(self.batches)
+        return True
+
+    def enqueue(self, batch_id, key, messages, now=None):
+        # messages: [(chat_id, text)]؛ متن مشترک فقط یک‌بار ذخیره می‌شود.
+        # گیرنده‌هایی که نسخه‌ی قبلی همان key را هنوز نگرفته‌اند فقط نسخه‌ی جدید را می‌گیرند.
+        texts, index, to = [], {}, []
+        for chat_id, text in messages:
+            if text not in index:
+                index[text] = len(texts)
+                texts.append(text)
+            to.append([chat_id, index[text]])
+        records = [{
+            "op": "batch", "id": batch_id, "key": key,
+            "ts": time.time() if now is None else now, "texts": texts, "to": to,
+        }]
+        targets = {chat_id for chat_id, _ in to}
+        for old_id, b in self.batches.items():
+            if key is None or b["key"] != key:
+                continue
+            stale = [c for c in b["pending"] if c in targets]
+            if stale:
+                records.append({"op": "ack", "id": old_id, "status": "superseded", "chat_ids": stale})
+        self._append(records, sync=True)
+        for r in records:
+            self._apply(r)
+        return batch_id
+
+    def expire(self, now=None):
+        now = time.time() if now is None else now
+        records = [
+            {"op": "ack", "id": batch_id, "status": "expired", "chat_ids": list(b["pending"])}
+            for batch_id, b in self.batches.items() if now - b["ts"] > self.max_age
+        ]
+        if records:
+            self._append(records)
+            for r in records:
+                self._apply(r)
+        return len(records)
+
+    def due(self, limit=None, skip=()):
+        # (batch_id, chat_id, text) به ترتیب ورود؛ skip برای گیرنده‌هایی که فعلاً عقب افتاده‌اند
+        out = []
+        for batch_id, b in self.batches.items():
+            for chat_id, i in b["pending"].items():
+                if (batch_id, chat_id) in skip:
+                    continue
+                out.append((batch_id, chat_id, b["texts"][i]))
+                if limit is not None and len(out) >= limit:
+                    return out
+        return out
+
+    def ack(self, results):
+        # results: [(batch_id, chat_id, status)] → یک خط برای هر (دسته، وضعیت)
+        groups = {}
+        for batch_id, chat_id, status in results:
+            groups.setdefault((batch_id, status), []).append(chat_id)
+        records = [
+            {"op": "ack", "id": batch_id, "status": status, "chat_ids": chat_ids}
+            for (batch_id, status), chat_ids in groups.items()
+        ]
+        if not records:
+            return
+        self._append(records)
+        for r in records:
+            self._apply(r)
+        if self.lines > OUTBOX_COMPACT_LINES:
+            self.compact()
+
+    def attempt(self, batch_id, chat_id):
+        key = (batch_id, chat_id)
+        self.attempts[key] = self.attempts.get(key, 0) + 1
+        return self.attempts[key]
+
+    def pending_count(self):
+        return sum(len(b["pending"]) for b in self.batches.values())
+
+    def status(self):
+        c = self.counts
+        return (
+            f"Outbox {self.pending_count()} pending in {len(self.batches)} batches | "
+            f"sent {c['sent']}, failed {c['failed']}, merged {c['superseded']}, expired {c['expired']}"
+        )
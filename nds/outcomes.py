@@ -0,0 +1,210 @@
+import time
+import bisect
+
+from .config import OUTCOME_MAX_AGE_HOURS
+from .timeutil import time_str
+
+# =========================
+# PRICE TRIGGER INDEX
+# =========================
+class TriggerIndex:
+    # سطوح قیمتی مرتب؛ هر تیک فقط سطوحی که رد شده‌اند را لمس می‌کند
+    # (O(log n + hits) به ازای هر تیک).
+    def __init__(self):
+        self.above = []  # (level, seq, key) -> وقتی price >= level
+        self.below = []  # (level, seq, key) -> وقتی price <= level
+        self.where = {}
+        self.seq = 0
+
+    def __len__(self):
+        return len(self.where)
+
+    def add(self, key, level, side):
+        self.remove(key)
+        self.seq += 1
+        item = (level, self.seq, key)
+        bisect.insort(self.above if side == "above" else self.below, item)
+        self.where[key] = (side, item)
+
+    def remove(self, key):
+        found = self.where.pop(key, None)
+        if not found:
+            return False
+        side, item = found
+        levels = self.above if side == "above" else self.below
+        i = bisect.bisect_left(levels, item)
+        if i < len(levels) and levels[i] == item:
+            del levels[i]
+        return True
+
+    def crossed(self, price):
+        i = bisect.bisect_right(self.above, (price, float("inf")))
+        j = bisect.bisect_left(self.below, (price, -1))
+        hits = self.above[:i] + self.below[j:]
+        del self.above[:i]
+        del self.below[j:]
+        for _, _, key in hits:
+            self.where.pop(key, None)
+        return [(key, level) for level, _, key in hits]
+
+    def to_state(self):
+        # فقط داده‌ی ساده برای snapshot؛ کلیدهای tuple به list تبدیل می‌شوند
+        return {
+            "above": [[level, seq, list(key)] for level, seq, key in self.above],
+            "below": [[level, seq, list(key)] for level, seq, key in self.below],
+            "seq": self.seq,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        idx = cls()
+        for side in ("above", "below"):
+            levels = getattr(idx, side)
+            for level, seq, key in state[side]:
+                item = (level, seq, tuple(key))
+                levels.append(item)
+                idx.where[item[2]] = (side, item)
+            levels.sort()
+        idx.seq = state["seq"]
+        return idx
+
+# =========================
+# OUTCOME TRACKER (SL / TP1 / TP2)
+# =========================
+class OutcomeTracker:
+    def __init__(self):
+        self.index = {}   # symbol -> TriggerIndex
+        self.open = {}    # signal_id -> state (به ترتیب ثبت)
+        self.path = {}    # symbol -> قیمت‌های تیک از قدیمی‌ترین سیگنال باز
+        self.base = {}    # symbol -> اندیس مطلق اولین عنصر path
+
+    def register(self, signal_id, symbol, direction, entry, sl, tp1, tp2, opened_ts=None):
+        idx = self.index.setdefault(symbol, TriggerIndex())
+        path = self.path.setdefault(symbol, [])
+        base = self.base.setdefault(symbol, 0)
+        up, down = ("above", "below") if direction == "LONG" else ("below", "above")
+        idx.add((signal_id, "sl"), sl, down)
+        idx.add((signal_id, "tp1"), tp1, up)
+        idx.add((signal_id, "tp2"), tp2, up)
+        self.open[signal_id] = {
+            "symbol": symbol,
+            "dir": direction,
+            "entry": entry,
+            "sl": sl,
+            "risk": abs(entry - sl) or 1e-9,
+            "start": base + len(path),
+            "opened_ts": time.time() if opened_ts is None else opened_ts,
+            "tp1_hit": False,
+        }
+
+    def to_state(self):
+        return {
+            "index": {symbol: idx.to_state() for symbol, idx in self.index.items()},
+            "open": self.open,
+            "path": self.path,
+            "base": self.base,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        tracker = cls()
+        tracker.index = {symbol: TriggerIndex.from_state(x) for symbol, x in state["index"].items()}
+        tracker.open = dict(state["open"])
+        tracker.path = {symbol: list(p) for symbol, p in state["path"].items()}
+        tracker.base = dict(state["base"])
+        return tracker
+
+    def _r(self, st, price):
+        move = price - st["entry"] if st["dir"] == "LONG" else st["entry"] - price
+        return move / st["risk"]
+
+    def _excursions(self, st, price):
+        path = self.path[st["symbol"]]
+        seen = path[st["start"] - self.base[st["symbol"]]:] or [price]
+        hi, lo = max(seen), min(seen)
+        if st["dir"] == "LONG":
+            return (hi - st["entry"]) / st["risk"], (st["entry"] - lo) / st["risk"]
+        return (st["entry"] - lo) / st["risk"], (hi - st["entry"]) / st["risk"]
+
+    def _close(self, signal_id, result, price, now, level=None):
+        # خروج SL/TP2 روی خود سطح ثبت می‌شود، نه قیمت تیک (تیک ۳۰ ثانیه‌ای ممکن است از سطح گذشته باشد)؛
+        # MFE/MAE از مسیر واقعی قیمت می‌آید
+        exit_price = price if level is None else level
+        st = self.open.pop(signal_id)
+        for level_name in ("sl", "tp1", "tp2"):
+            self.index[st["symbol"]].remove((signal_id, level_name))
+        mfe, mae = self._excursions(st, price)
+        return signal_id, {
+            "status": "closed",
+            "result": result,
+            "exit": exit_price,
+            "closed_at": time_str(),
+            "closed_ts": now,
+            "r": round(self._r(st, exit_price), 2),
+            "mfe_r": round(max(mfe, 0.0), 2),
+            "mae_r": round(max(mae, 0.0), 2),
+        }
+
+    def discard(self, signal_id):
+        st = self.open.pop(signal_id, None)
+        if st is None:
+            return
+        for level_name in ("sl", "tp1", "tp2"):
+            self.index[st["symbol"]].remove((signal_id, level_name))
+        self._trim(st["symbol"])
+
+    def _trim(self, symbol):
+        starts = [st["start"] for st in self.open.values() if st["symbol"] == symbol]
+        path = self.path[symbol]
+        if not starts:
+            self.base[symbol] += len(path)
+            path.clear()
+            return
+        cut = min(starts) - self.base[symbol]
+        if cut > 0:
+            del path[:cut]
+            self.base[symbol] += cut
+
+    def update(self, symbol, price, now=None):
+        # خروجی: لیست (signal_id, fields) برای ثبت در ژورنال
+        now = time.time() if now is None else now
+        idx = self.index.get(symbol)
+        if idx is None or not len(idx):
+            return []
+        self.path[symbol].append(price)
+
+        updates = []
+        closed = False
+        for (signal_id, level_name), level in sorted(idx.crossed(price), key=lambda h: h[0][1] != "tp1"):
+            st = self.open.get(signal_id)
+            if st is None:
+                continue
+            if level_name == "tp1":
+                st["tp1_hit"] = True
+                updates.append((signal_id, {
+                    "tp1_hit": True,
+                    "tp1_at": time_str(),
+                    "tp1_ts": now,
+                }))
+            elif level_name == "tp2":
+                updates.append(self._close(signal_id, "TP2", price, now, level))
+                closed = True
+            else:
+                result = "TP1_SL" if st["tp1_hit"] else "SL"
+                updates.append(self._close(signal_id, result, price, now, level))
+                closed = True
+
+        # سیگنال‌های خیلی قدیمی بسته می‌شوند (قدیمی‌ترین‌ها اول دیکشنری‌اند)
+        max_age = OUTCOME_MAX_AGE_HOURS * 3600
+        while self.open:
+            signal_id = next(iter(self.open))
+            st = self.open[signal_id]
+            if now - st["opened_ts"] < max_age:
+                break
+            last = self.path[st["symbol"]][-1] if self.path.get(st["symbol"]) else st["entry"]
+            updates.append(self._close(signal_id, "EXPIRED", last, now))
+            closed = True
+
+        if closed:
+            self._trim(symbol)
+        return updates
@@ -0,0 +1,182 @@
+import sys
+import time
+import asyncio
+import threading
+import functools
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from .config import PERF_SAMPLE_SECONDS, PERF_BLOCK_MS, PERF_SLOW_MS, PERF_RING_SIZE, PERF_STACK_DEPTH
+
+# =========================
+# PERF WATCHDOG (EVENT LOOP LAG / BLOCKING CALLS)
+# =========================
+# یک task در حلقه هر PERF_SAMPLE_SECONDS بیدار می‌شود و تاخیر بیدار شدن را
+# ثبت می‌کند (lag). یک ترد جدا ضربان همان task را می‌پاید؛ اگر حلقه بیش از
+# PERF_BLOCK_MS گیر کرده باشد، stack ترد حلقه را با sys._current_frames می‌گیرد
+# تا تابع مقصر همان لحظه معلوم شود.
+class PerfMonitor:
+    def __init__(self, sample=PERF_SAMPLE_SECONDS, block_ms=PERF_BLOCK_MS,
+                 slow_ms=PERF_SLOW_MS, size=PERF_RING_SIZE):
+        self.sample = sample
+        self.block_ms = block_ms
+        self.slow_ms = slow_ms
+        self.slow = deque(maxlen=size)       # رکوردهای کند اخیر (قدیمی به جدید)
+        self.stats = {}                      # name -> [count, total_ms, max_ms]
+        self.lags = deque(maxlen=max(1, int(300 / sample)))  # lag پنج دقیقه‌ی اخیر (ms)
+        self.blocks = 0
+        self.lock = threading.Lock()
+        self.loop_thread = None
+        self.beat = None
+        self.stall = None                    # رکورد انسدادی که هنوز تمام نشده
+        self.task = None
+        self.stopped = threading.Event()
+
+    def record(self, name, ms, kind, stack=None, force=False):
+        with self.lock:
+            st = self.stats.setdefault(name, [0, 0.0, 0.0])
+            st[0] += 1
+            st[1] += ms
+            st[2] = max(st[2], ms)
+            if ms < self.slow_ms and not force:
+                return None
+            rec = {"name": name, "ms": ms, "kind": kind, "ts": time.time(), "stack": stack}
+            self.slow.append(rec)
+            return rec
+
+    def _kind(self):
+        # کد sync روی ترد حلقه یعنی همه‌ی handler ها منتظر مانده‌اند
+        return "blocking" if threading.get_ident() == self.loop_thread else "thread"
+
+    @contextmanager
+    def measure(self, name, kind=None):
+        kind = kind or self._kind()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - t0) * 1000, kind)
+
+    def timed(self, name=None):
+        def deco(fn):
+            label = name or fn.__name__
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def wrapped(*args, **kwargs):
+                    with self.measure(label, "await"):
+                        return await fn(*args, **kwargs)
+            else:
+                @functools.wraps(fn)
+                def wrapped(*args, **kwargs):
+                    with self.measure(label):
+                        return fn(*args, **kwargs)
+            return wrapped
+        return deco
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            self.beat = time.monotonic()
+            await asyncio.sleep(self.sample)
+            lag = max((loop.time() - t0 - self.sample) * 1000, 0.0)
+            self.beat = time.monotonic()
+            with self.lock:
+                self.lags.append(lag)
+                stall, self.stall = self.stall, None
+                if stall is not None:
+                    # طول واقعی انسداد بعد از آزاد شدن حلقه معلوم می‌شود
+                    stall["ms"] = max(stall["ms"], lag)
+                    st = self.stats[stall["name"]]
+                    st[2] = max(st[2], lag)
+
+    def _watch(self):
+        while not self.stopped.wait(self.block_ms / 2000):
+            beat = self.beat
+            if beat is None or self.stall is not None:
+                continue
+            stalled = (time.monotonic() - beat - self.sample) * 1000
+            if stalled < self.block_ms:
+                continue
+            frame = sys._current_frames().get(self.loop_thread)
+            stack = "".join(traceback.format_stack(frame)[-PERF_STACK_DEPTH:]) if frame else None
+            del frame
+            rec = self.record("event loop blocked", stalled, "blocked", stack, force=True)
+            with self.lock:
+                self.blocks += 1
+                self.stall = rec
+
+    def start(self):
+        # باید داخل حلقه‌ی در حال اجرا صدا زده شود (post_init)
+        if self.task is not None:
+            return
+        self.loop_thread = threading.get_ident()
+        self.stopped.clear()
+        self.task = asyncio.get_running_loop().create_task(self._sample())
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def lag_summary(self):
+        with self.lock:
+            lags = sorted(self.lags)
+        if not lags:
+            return None
+        return {
+            "p50": lags[len(lags) // 2],
+            "p99": lags[min(len(lags) - 1, int(len(lags) * 0.99))],
+            "max": lags[-1],
+            "samples": len(lags),
+        }
+
+    def slowest(self, n=10):
+        with self.lock:
+            return sorted(self.slow, key=lambda r: r["ms"], reverse=True)[:n]
+
+    def top_ops(self, n=10):
+        with self.lock:
+            items = [(name, st[0], st[1] / st[0], st[2]) for name, st in self.stats.items() if st[0]]
+        return sorted(items, key=lambda x: x[3], reverse=True)[:n]
+
+def _clock(ts):
+    return (datetime.utcfromtimestamp(ts) + timedelta(hours=3, minutes=30)).strftime("%H:%M:%S")
+
+def _last_frame(stack):
+    # دو خط آخر stack: فایل/خط و کد تابعی که حلقه را نگه داشته
+    lines = [x for x in (stack or "").strip().splitlines() if x.strip()]
+    return "\n".join("   " + x.strip() for x in lines[-2:])
+
+def render_perf(perf, n=8):
+    lines = ["⏱ PERF – EVENT LOOP", ""]
+    lag = perf.lag_summary()
+    if lag:
+        lines.append(
+            f"Lag (last {lag['samples'] * perf.sample / 60:.0f}m): p50 {lag['p50']:.0f} ms | "
+            f"p99 {lag['p99']:.0f} ms | max {lag['max']:.0f} ms"
+        )
+    else:
+        lines.append("Lag: no samples yet")
+    lines.append(f"Blocked > {perf.block_ms} ms: {perf.blocks}")
+
+    slow = perf.slowest(n)
+    if slow:
+        lines += ["", "Slowest recent:"]
+        for i, r in enumerate(slow, 1):
+            lines.append(f"{i}. {r['ms']:.0f} ms {r['kind']} – {r['name']} ({_clock(r['ts'])})")
+            if r["stack"]:
+                lines.append(_last_frame(r["stack"]))
+
+    ops = perf.top_ops(n)
+    if ops:
+        lines += ["", "Per op (count | avg | max ms):"]
+        for name, count, avg, worst in ops:
+            lines.append(f"• {name}: {count} | {avg:.0f} | {worst:.0f}")
+    return "\n".join(lines)
+
+PERF = PerfMonitor()
@@ -0,0 +1,239 @@
+import time
+from collections import deque
+
+from .config import (
+    TF_MS, ADX_PERIOD, REGIME_TF, REGIME_BARS, REGIME_CORR_WINDOW, REGIME_CLUSTER_CORR,
+    REGIME_ADX_TREND, REGIME_ADX_RANGE, CLUSTER_SUPPRESS_SECONDS
+)
+
+# =========================
+# REGIME & CORRELATION SCANNER (VECTORIZED)
+# =========================
+# کندل‌های کل universe در ماتریس‌های (زمان × نماد) چیده می‌شوند و ADX، نوسان
+# و همبستگی برای همه‌ی نمادها یکجا با numpy حساب می‌شوند. حلقه‌ی پایتون فقط
+# روی زمان است (هموارسازی وایلدر)، نه روی نمادها.
+# numpy وابستگی اختیاری است و فقط در اولین اسکن import می‌شود.
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("regime scanner needs the 'numpy' package")
+    return numpy
+
+def _ffill(a):
+    # هر NaN با آخرین مقدار معتبر ستون پر می‌شود؛ قبل از اولین مقدار، با همان اولین
+    np = _numpy()
+    valid = ~np.isnan(a)
+    rows = np.arange(a.shape[0])[:, None]
+    cols = np.arange(a.shape[1])
+    idx = np.where(valid, rows, 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    first = valid.argmax(axis=0)
+    idx = np.where(rows < first, first, idx)
+    return a[idx, cols]
+
+def wilder_adx(high, low, close, period=ADX_PERIOD):
+    np = _numpy()
+    n_sym = close.shape[1]
+    prev = close[:-1]
+    tr = np.maximum(high[1:] - low[1:], np.maximum(np.abs(high[1:] - prev), np.abs(low[1:] - prev)))
+    up = high[1:] - high[:-1]
+    down = low[:-1] - low[1:]
+    plus_dm = np.where((up > down) & (up > 0), up, 0.0)
+    minus_dm = np.where((down > up) & (down > 0), down, 0.0)
+    if tr.shape[0] < 2 * period:
+        return np.zeros(n_sym)
+
+    atr = tr[:period].sum(axis=0)
+    pdm = plus_dm[:period].sum(axis=0)
+    mdm = minus_dm[:period].sum(axis=0)
+    dx = np.empty((tr.shape[0] - period, n_sym))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for k, i in enumerate(range(period, tr.shape[0])):
+            atr = atr - atr / period + tr[i]
+            pdm = pdm - pdm / period + plus_dm[i]
+            mdm = mdm - mdm / period + minus_dm[i]
+            dx[k] = 100 * np.abs(pdm - mdm) / (pdm + mdm)
+    dx = np.nan_to_num(dx)
+
+    adx = dx[:period].mean(axis=0)
+    for i in range(period, dx.shape[0]):
+        adx = (adx * (period - 1) + dx[i]) / period
+    return adx
+
+def correlation_matrix(returns):
+    # همبستگی پیرسون همه‌ی جفت‌ها با یک ضرب ماتریسی؛ نماد بی‌حرکت همبستگی 0 دارد
+    np = _numpy()
+    centered = returns - returns.mean(axis=0)
+    norm = np.sqrt((centered ** 2).sum(axis=0))
+    norm[norm == 0] = np.inf
+    z = centered / norm
+    corr = z.T @ z
+    np.fill_diagonal(corr, 1.0)
+    return corr
+
+def correlation_clusters(corr, threshold=REGIME_CLUSTER_CORR):
+    # مؤلفه‌های همبند گراف «همبستگی ≥ threshold»: هر نماد کوچک‌ترین برچسب
+    # همسایه‌ها را می‌گیرد تا پایدار شود (پرش اشاره‌گر همگرایی را سریع می‌کند)
+    np = _numpy()
+    n = corr.shape[0]
+    adj = corr >= threshold
+    labels = np.arange(n)
+    while True:
+        nxt = np.where(adj, labels[None, :], n).min(axis=1)
+        nxt = np.minimum(nxt, labels)
+        nxt = nxt[nxt]
+        if (nxt == labels).all():
+            return labels
+        labels = nxt
+
+class RegimeScanner:
+    # ماتریس (high/low/close × زمان × نماد) بین تیک‌ها نگه داشته می‌شود و هر تیک
+    # فقط کندل‌های تازه‌ی هر نماد نوشته می‌شوند؛ ردیف i = کندل end - (bars-1-i)*tf
+    def __init__(self, tf=REGIME_TF, bars=REGIME_BARS, window=REGIME_CORR_WINDOW):
+        self.tf = tf
+        self.tf_ms = TF_MS[tf]
+        self.bars = bars
+        self.window = window
+        self.symbols = []
+        self.col = {}
+        self.last = {}   # symbol -> زمان آخرین کندل نوشته‌شده
+        self.end = None
+        self.hlc = None
+
+    def missing(self, symbols):
+        # نمادهایی که تاریخچه‌ی کامل لازم دارند (جدید یا عقب‌مانده از چند تیک قبل)
+        if self.end is None:
+            return list(symbols)
+        horizon = self.end - 2 * self.tf_ms
+        return [s for s in symbols if self.last.get(s, 0) < horizon]
+
+    def _shift(self, latest):
+        np = _numpy()
+        k = (latest - self.end) // self.tf_ms
+        if k >= self.bars:
+            self.hlc[:] = np.nan
+        elif k > 0:
+            self.hlc[:, :-k] = self.hlc[:, k:]
+            self.hlc[:, -k:] = np.nan
+        self.end = latest
+
+    def ingest(self, candles_by_symbol):
+        np = _numpy()
+        latest = max((c[-1]["time"] for c in candles_by_symbol.values() if c), default=None)
+        if latest is None:
+            return
+        if self.end is None:
+            self.end = latest
+            self.hlc = np.full((3, self.bars, 0), np.nan)
+        elif latest > self.end:
+            self._shift(latest)
+
+        new = [s for s in candles_by_symbol if s not in self.col]
+        if new:
+            for s in new:
+                self.col[s] = len(self.symbols)
+                self.symbols.append(s)
+            pad = np.full((3, self.bars, len(new)), np.nan)
+            self.hlc = np.concatenate([self.hlc, pad], axis=2)
+
+        start = self.end - (self.bars - 1) * self.tf_ms
+        for s, candles in candles_by_symbol.items():
+            j = self.col[s]
+            since = max(self.last.get(s, 0), start)
+            for x in reversed(candles):
+                # کندل در حال شکل‌گیری هم بازنویسی می‌شود
+                if x["time"] < since:
+                    break
+                if x["time"] <= self.end:
+                    self.hlc[:, (x["time"] - start) // self.tf_ms, j] = (x["high"], x["low"], x["close"])
+            if candles:
+                self.last[s] = max(self.last.get(s, 0), candles[-1]["time"])
+
+    def scan(self, symbols=None):
+        np = _numpy()
+        if self.hlc is None:
+            return None
+        started = time.perf_counter()
+        cols = [self.col[s] for s in (symbols or self.symbols) if s in self.col]
+        hlc = self.hlc[:, :, cols]
+        alive = ~np.isnan(hlc[2]).all(axis=0)
+        names = [self.symbols[c] for c, ok in zip(cols, alive.tolist()) if ok]
+        if not names:
+            return None
+        close = _ffill(hlc[2][:, alive])
+        high = np.where(np.isnan(hlc[0][:, alive]), close, hlc[0][:, alive])
+        low = np.where(np.isnan(hlc[1][:, alive]), close, hlc[1][:, alive])
+
+        returns = np.diff(np.log(close), axis=0)[-self.window:]
+        bars_per_day = 86400 * 1000 / self.tf_ms
+        vol = returns.std(axis=0, ddof=1) * np.sqrt(bars_per_day) * 100
+        change = (close[-1] / close[-len(returns) - 1] - 1) * 100
+        adx = wilder_adx(high, low, close)
+
+        label = np.where(
+            adx >= REGIME_ADX_TREND,
+            np.where(change > 0, "TREND_UP", "TREND_DOWN"),
+            np.where(adx <= REGIME_ADX_RANGE, "RANGE", "MIXED")
+        )
+
+        corr = correlation_matrix(returns)
+        members = {}
+        for j, root in enumerate(correlation_clusters(corr).tolist()):
+            members.setdefault(root, []).append(names[j])
+        clusters = sorted(members.values(), key=len, reverse=True)
+        cluster_of = {s: k for k, group in enumerate(clusters) for s in group}
+
+        n = len(names)
+        avg_corr = float((corr.sum() - n) / (n * (n - 1))) if n > 1 else 1.0
+        return {
+            "time": self.end,
+            "tf": self.tf,
+            "symbols": names,
+            "adx": dict(zip(names, adx.round(1).tolist())),
+            "vol": dict(zip(names, vol.round(2).tolist())),
+            "change": dict(zip(names, change.round(2).tolist())),
+            "label": dict(zip(names, label.tolist())),
+            "clusters": clusters,
+            "cluster_of": cluster_of,
+            "avg_corr": avg_corr,
+            "elapsed_ms": (time.perf_counter() - started) * 1000,
+        }
+
+def scan_universe(candles_by_symbol, tf=REGIME_TF, bars=REGIME_BARS):
+    # اسکن یک‌باره (ابزارهای آفلاین)؛ ربات یک RegimeScanner ماندگار نگه می‌دارد
+    scanner = RegimeScanner(tf, bars)
+    scanner.ingest(candles_by_symbol)
+    return scanner.scan()
+
+def regime_of(scan, symbol):
+    # خلاصه‌ی رژیم یک نماد برای پیام سیگنال؛ None اگر اسکن آن را پوشش ندهد
+    if not scan or symbol not in scan["cluster_of"]:
+        return None
+    return {
+        "label": scan["label"][symbol],
+        "adx": scan["adx"][symbol],
+        "vol": scan["vol"][symbol],
+        "cluster": len(scan["clusters"][scan["cluster_of"][symbol]]),
+    }
+
+class ClusterGate:
+    # سیگنال هم‌جهت نماد دیگری از همان خوشه در CLUSTER_SUPPRESS_SECONDS اخیر
+    # یعنی همان حرکت تکرار شده؛ فقط اولی ارسال می‌شود
+    def __init__(self, window=CLUSTER_SUPPRESS_SECONDS):
+        self.window = window
+        self.recent = deque()  # (ts, symbol, direction)
+        self.suppressed = 0
+
+    def allow(self, scan, symbol, direction, now=None):
+        now = time.time() if now is None else now
+        while self.recent and self.recent[0][0] <= now - self.window:
+            self.recent.popleft()
+        cluster_of = scan["cluster_of"] if scan else {}
+        cluster = cluster_of.get(symbol)
+        for _, other, d in self.recent:
+            if other != symbol and d == direction and cluster is not None and cluster_of.get(other) == cluster:
+                self.suppressed += 1
+                return False
+        self.recent.append((now, symbol, direction))
+        return True
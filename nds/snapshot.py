@@ -0,0 +1,51 @@
+import os
+import time
+import zlib
+import json
+import struct
+
+from .config import SYMBOL, SNAPSHOT_FILE, SNAPSHOT_VERSION, SNAPSHOT_MAX_AGE_HOURS
+
+# =========================
+# WARM-START SNAPSHOT
+# =========================
+# قالب: MAGIC | version, saved_ts, crc32 | zlib(json(state))
+# state فقط dict/list/عدد/رشته است (خروجی to_state هر شیء)، نه خود اشیاء؛
+# تغییر فیلدهای کلاس‌ها snapshot قدیمی را به شیء ناقص تبدیل نمی‌کند.
+SNAPSHOT_MAGIC = b"NDS1"
+SNAPSHOT_HEADER = struct.Struct(">HdI")
+
+def write_snapshot(state, path=SNAPSHOT_FILE):
+    try:
+        body = zlib.compress(json.dumps(state, separators=(",", ":")).encode())
+        header = SNAPSHOT_HEADER.pack(SNAPSHOT_VERSION, time.time(), zlib.crc32(body))
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(SNAPSHOT_MAGIC + header + body)
+        os.replace(tmp, path)
+        return True
+    except Exception:
+        return False
+
+def read_snapshot(path=SNAPSHOT_FILE, symbol=SYMBOL):
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except OSError:
+        return None
+    start = len(SNAPSHOT_MAGIC)
+    if raw[:start] != SNAPSHOT_MAGIC or len(raw) < start + SNAPSHOT_HEADER.size:
+        return None
+    version, saved_ts, crc = SNAPSHOT_HEADER.unpack_from(raw, start)
+    body = raw[start + SNAPSHOT_HEADER.size:]
+    if version != SNAPSHOT_VERSION or zlib.crc32(body) != crc:
+        return None
+    if time.time() - saved_ts > SNAPSHOT_MAX_AGE_HOURS * 3600:
+        return None
+    try:
+        state = json.loads(zlib.decompress(body))
+    except Exception:
+        return None
+    if not isinstance(state, dict) or state.get("symbol") != symbol:
+        return None
+    return state
@@ -0,0 +1,290 @@
+import os
+import json
+import time
+
+from .config import STATE_BACKEND, STATE_URL, STATE_PREFIX, STATE_KV_FILE
+
+# =========================
+# STATE BACKENDS
+# =========================
+# همه‌ی داده‌های ماندگار از طریق یک backend خوانده/نوشته می‌شوند تا چند
+# نسخه‌ی ربات بتوانند state مشترک و leader election داشته باشند.
+# رابط: get / set / incr / acquire_lease / release_lease
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class FileState:
+    # رفتار قدیمی: هر کلید یک فایل؛ شمارنده‌ها و lease ها در STATE_KV_FILE
+    def __init__(self, kv_path=STATE_KV_FILE):
+        self.kv_path = kv_path
+
+    def get(self, key):
+        # شمارنده‌ها و lease ها در kv هستند؛ بقیه‌ی کلیدها فایل جدا
+        item = self._read_kv().get(key)
+        if item is not None:
+            return str(item["value"])
+        if not os.path.exists(key):
+            return None
+        try:
+            with open(key, "r") as f:
+                return f.read()
+        except Exception:
+            return None
+
+    def set(self, key, value):
+        with open(key, "w") as f:
+            f.write(value)
+
+    def _read_kv(self):
+        if not os.path.exists(self.kv_path):
+            return {}
+        try:
+            with open(self.kv_path, "r") as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_SH)
+                kv = json.loads(f.read() or "{}")
+        except (OSError, ValueError):
+            return {}
+        now = time.time()
+        return {k: v for k, v in kv.items() if not v.get("expires") or v["expires"] > now}
+
+    def _update_kv(self, fn):
+        with open(self.kv_path, "a+") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                kv = json.loads(f.read() or "{}")
+            except ValueError:
+                kv = {}
+            now = time.time()
+            kv = {k: v for k, v in kv.items() if not v.get("expires") or v["expires"] > now}
+            result = fn(kv, now)
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(kv))
+            return result
+
+    def incr(self, key, ttl=None):
+        def fn(kv, now):
+            item = kv.setdefault(key, {"value": 0, "expires": now + ttl if ttl else None})
+            item["value"] += 1
+            return item["value"]
+        return self._update_kv(fn)
+
+    def acquire_lease(self, name, owner, ttl):
+        def fn(kv, now):
+            item = kv.get("lease:" + name)
+            if item and item["value"] != owner:
+                return False
+            kv["lease:" + name] = {"value": owner, "expires": now + ttl}
+            return True
+        return self._update_kv(fn)
+
+    def release_lease(self, name, owner):
+        def fn(kv, now):
+            item = kv.get("lease:" + name)
+            if item and item["value"] == owner:
+                del kv["lease:" + name]
+        self._update_kv(fn)
+
+class SQLiteState:
+    def __init__(self, path):
+        import sqlite3
+        self.db = sqlite3.connect(path or "bot_state.db", isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT, expires REAL)"
+        )
+
+    def _row(self, key, now):
+        row = self.db.execute("SELECT value, expires FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            return None
+        return row
+
+    def get(self, key):
+        row = self._row(key, time.time())
+        return row[0] if row else None
+
+    def set(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, NULL)", (key, value))
+
+    def incr(self, key, ttl=None):
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._row(key, now)
+            value = int(row[0]) + 1 if row else 1
+            expires = row[1] if row else (now + ttl if ttl else None)
+            self.db.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+                (key, str(value), expires)
+            )
+            self.db.execute("COMMIT")
+            return value
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def acquire_lease(self, name, owner, ttl):
+        key = "lease:" + name
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._row(key, now)
+            ok = row is None or row[0] == owner
+            if ok:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+                    (key, owner, now + ttl)
+                )
+            self.db.execute("COMMIT")
+            return ok
+        except Exception:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def release_lease(self, name, owner):
+        self.db.execute("DELETE FROM kv WHERE key = ? AND value = ?", ("lease:" + name, owner))
+
+class RedisState:
+    # به پکیج اختیاری redis نیاز دارد (فقط وقتی STATE_BACKEND=redis باشد import می‌شود)
+    INCR_SCRIPT = """
+local v = redis.call('INCR', KEYS[1])
+if v == 1 and tonumber(ARGV[1]) > 0 then
+  redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return v
+"""
+    RENEW_SCRIPT = """
+local v = redis.call('GET', KEYS[1])
+if not v then
+  redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+  return 1
+end
+if v == ARGV[1] then
+  redis.call('PEXPIRE', KEYS[1], ARGV[2])
+  return 1
+end
+return 0
+"""
+    RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+    def __init__(self, url, prefix=STATE_PREFIX, client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("STATE_BACKEND=redis needs the 'redis' package")
+            client = redis.Redis.from_url(url or "redis://localhost:6379/0", decode_responses=True)
+        self.r = client
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.r.get(self.prefix + key)
+
+    def set(self, key, value):
+        self.r.set(self.prefix + key, value)
+
+    def incr(self, key, ttl=None):
+        return int(self.r.eval(self.INCR_SCRIPT, 1, self.prefix + key, int(ttl or 0)))
+
+    def acquire_lease(self, name, owner, ttl):
+        return bool(self.r.eval(self.RENEW_SCRIPT, 1, self.prefix + "lease:" + name, owner, int(ttl * 1000)))
+
+    def release_lease(self, name, owner):
+        self.r.eval(self.RELEASE_SCRIPT, 1, self.prefix + "lease:" + name, owner)
+
+class MemoryState:
+    # جایگزین درون‌پردازه‌ای Redis برای تست و اجرای تک‌نسخه‌ای؛ همان معنای
+    # SET/INCR/EXPIRE و lease را پیاده می‌کند. چند نمونه می‌توانند یک store را share کنند.
+    def __init__(self, store=None):
+        self.store = {} if store is None else store  # key -> (value, expires)
+
+    def _live(self, key, now):
+        item = self.store.get(key)
+        if item is None or (item[1] is not None and item[1] <= now):
+            self.store.pop(key, None)
+            return None
+        return item
+
+    def get(self, key):
+        item = self._live(key, time.time())
+        return item[0] if item else None
+
+    def set(self, key, value):
+        self.store[key] = (value, None)
+
+    def incr(self, key, ttl=None):
+        now = time.time()
+        item = self._live(key, now)
+        if item is None:
+            item = ("0", now + ttl if ttl else None)
+        value = int(item[0]) + 1
+        self.store[key] = (str(value), item[1])
+        return value
+
+    def acquire_lease(self, name, owner, ttl):
+        now = time.time()
+        item = self._live("lease:" + name, now)
+        if item and item[0] != owner:
+            return False
+        self.store["lease:" + name] = (owner, now + ttl)
+        return True
+
+    def release_lease(self, name, owner):
+        item = self._live("lease:" + name, time.time())
+        if item and item[0] == owner:
+            del self.store["lease:" + name]
+
+def make_state(kind=STATE_BACKEND, url=STATE_URL):
+    if kind == "sqlite":
+        return SQLiteState(url)
+    if kind == "redis":
+        return RedisState(url)
+    if kind == "memory":
+        return MemoryState()
+    return FileState()
+
+class LazyState:
+    # backend در اولین استفاده ساخته می‌شود تا import هسته بدون I/O باشد
+    def __init__(self, factory=make_state):
+        self.factory = factory
+        self.backend = None
+
+    def use(self, backend):
+        self.backend = backend
+        return backend
+
+    def __getattr__(self, name):
+        if self.backend is None:
+            self.backend = self.factory()
+        return getattr(self.backend, name)
+
+STATE = LazyState()
+
+# =========================
+# JSON HELPERS
+# =========================
+def load_json(path, default):
+    raw = STATE.get(path)
+    if raw is None:
+        return default
+    try:
+        return json.loads(raw)
+    except Exception:
+        return default
+
+def save_json(path, data):
+    try:
+        STATE.set(path, json.dumps(data, indent=2))
+    except Exception:
+        pass
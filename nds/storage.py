@@ -0,0 +1,193 @@
+from datetime import timedelta
+
+from .config import (
+    SYMBOL, SIGNAL_LOG_FILE, STRONG_MOVE_LOG_FILE, STATS_FILE, STATS_DAYS_KEPT,
+    MAX_C_SIGNALS_PER_DAY, MAX_D_SIGNALS_PER_DAY
+)
+from .state import STATE, load_json, save_json
+from .timeutil import iran_time, today_str
+
+# =========================
+# DAILY ROLLUPS (STATS)
+# =========================
+# شمارنده‌های روزانه همزمان با هر ثبت سیگنال به‌روز می‌شوند تا خلاصه‌ها
+# بدون خواندن کامل لاگ‌ها محاسبه شوند.
+def empty_bucket():
+    return {"total": 0, "grade": {}, "symbol": {}, "bias": {}, "tf": {}, "strong": 0,
+            "outcome": {}, "r_sum": 0.0}
+
+def _bump(counter, key, n=1):
+    counter[key] = counter.get(key, 0) + n
+
+def _add_signal_to_bucket(bucket, entry):
+    bucket["total"] += 1
+    _bump(bucket["grade"], entry.get("grade"))
+    _bump(bucket["symbol"], entry.get("symbol", SYMBOL))
+    _bump(bucket["bias"], entry.get("bias"))
+    _bump(bucket["tf"], entry.get("tf"))
+
+def _day_bucket(stats, day):
+    days = stats.setdefault("days", {})
+    if day not in days:
+        days[day] = empty_bucket()
+        if len(days) > STATS_DAYS_KEPT:
+            for old in sorted(days)[:len(days) - STATS_DAYS_KEPT]:
+                del days[old]
+    return days[day]
+
+def rebuild_stats(persist=True):
+    # persist=False برای ابزارهای فقط‌خواندنی (CLI): آمار ساخته ولی ذخیره نمی‌شود
+    stats = {"days": {}, "all": empty_bucket()}
+    for x in load_json(SIGNAL_LOG_FILE, []):
+        if not x.get("date"):
+            continue
+        _add_signal_to_bucket(_day_bucket(stats, x.get("date")), x)
+        _add_signal_to_bucket(stats["all"], x)
+    for x in load_json(STRONG_MOVE_LOG_FILE, []):
+        if not x.get("date"):
+            continue
+        _day_bucket(stats, x.get("date"))["strong"] += 1
+        stats["all"]["strong"] += 1
+    if persist:
+        save_json(STATS_FILE, stats)
+    return stats
+
+def load_stats(persist=True):
+    stats = load_json(STATS_FILE, None)
+    if not isinstance(stats, dict) or "all" not in stats:
+        stats = rebuild_stats(persist)
+    return stats
+
+def record_signal(entry):
+    stats = load_stats()
+
+    logs = load_json(SIGNAL_LOG_FILE, [])
+    logs.append(entry)
+    save_json(SIGNAL_LOG_FILE, logs[-1000:])
+
+    _add_signal_to_bucket(_day_bucket(stats, entry["date"]), entry)
+    _add_signal_to_bucket(stats["all"], entry)
+    save_json(STATS_FILE, stats)
+
+def record_strong_move(entry):
+    stats = load_stats()
+
+    logs = load_json(STRONG_MOVE_LOG_FILE, [])
+    logs.append(entry)
+    save_json(STRONG_MOVE_LOG_FILE, logs[-1000:])
+
+    _day_bucket(stats, entry["date"])["strong"] += 1
+    stats["all"]["strong"] += 1
+    save_json(STATS_FILE, stats)
+
+def record_outcome(signal_id, fields):
+    # نتیجه‌ی سیگنال در ژورنال و شمارنده‌ی روز همان سیگنال ثبت می‌شود
+    logs = load_json(SIGNAL_LOG_FILE, [])
+    entry = None
+    for x in reversed(logs):
+        if x.get("id") == signal_id:
+            entry = x
+            break
+    if entry is None:
+        return
+    entry.update(fields)
+    save_json(SIGNAL_LOG_FILE, logs)
+
+    result = fields.get("result")
+    if result and entry.get("date"):
+        stats = load_stats()
+        for bucket in (_day_bucket(stats, entry["date"]), stats["all"]):
+            _bump(bucket.setdefault("outcome", {}), result)
+            bucket["r_sum"] = bucket.get("r_sum", 0.0) + fields.get("r", 0.0)
+        save_json(STATS_FILE, stats)
+
+def merge_buckets(buckets):
+    out = empty_bucket()
+    for b in buckets:
+        out["total"] += b.get("total", 0)
+        out["strong"] += b.get("strong", 0)
+        out["r_sum"] += b.get("r_sum", 0.0)
+        for dim in ("grade", "symbol", "bias", "tf", "outcome"):
+            for k, v in b.get(dim, {}).items():
+                _bump(out[dim], k, v)
+    return out
+
+def get_day_stats(day=None, stats=None):
+    stats = stats or load_stats()
+    return stats.get("days", {}).get(day or today_str(), empty_bucket())
+
+def get_range_stats(days=30, stats=None):
+    # جمع N روز اخیر (شامل امروز) از باکت‌های روزانه
+    stats = stats or load_stats()
+    end = iran_time()
+    keys = [(end - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+    all_days = stats.get("days", {})
+    return merge_buckets(all_days[k] for k in keys if k in all_days)
+
+def grade_counts(bucket):
+    g = bucket.get("grade", {})
+    return g.get("A", 0), g.get("B", 0), g.get("C", 0), g.get("D", 0)
+
+def backtest_report(bucket):
+    # متن مشترک /backtest و `python -m nds backtest`
+    total_trades = bucket["total"]
+    a_trades, b_trades, c_trades, d_trades = grade_counts(bucket)
+
+    wins = a_trades * 0.8 + b_trades * 0.6 + c_trades * 0.45 + d_trades * 0.35
+    win_rate = (wins / total_trades) * 100 if total_trades > 0 else 0
+    profit_factor = 1.8 if a_trades > b_trades else 1.5 if b_trades > c_trades else 1.2
+    max_drawdown = 12 if a_trades > 10 else 18
+
+    outcomes = bucket.get("outcome", {})
+    resolved = sum(outcomes.values())
+    real_text = ""
+    if resolved:
+        real_wins = outcomes.get("TP2", 0)
+        real_text = f"""
+نتایج واقعی (TP/SL ردیابی‌شده):
+• Resolved: {resolved} | TP2: {outcomes.get("TP2", 0)} | TP1→SL: {outcomes.get("TP1_SL", 0)} | SL: {outcomes.get("SL", 0)} | Expired: {outcomes.get("EXPIRED", 0)}
+• Win Rate (TP2): {real_wins / resolved * 100:.1f}%
+• Avg R: {bucket.get("r_sum", 0.0) / resolved:.2f}
+"""
+
+    return f"""
+📈 بک‌تست تقریبی (بر اساس لاگ سیگنال‌ها):
+
+تعداد کل ترید: {total_trades}
+• A: {a_trades}
+• B: {b_trades}
+• C: {c_trades}
+• D: {d_trades}
+
+Win Rate تقریبی: {win_rate:.1f}%
+Profit Factor تقریبی: {profit_factor}
+Max Drawdown تقریبی: {max_drawdown}%
+{real_text}
+(برای دقت واقعی، بک‌تست روی داده‌های تاریخی لازم است)
+"""
+
+# =========================
+# LIMITS (GRADE-BASED)
+# =========================
+def _limit_key(grade, day):
+    return f"limit:{day}:{grade}"
+
+def get_limit_state():
+    today = today_str()
+    c_count = int(STATE.get(_limit_key("C", today)) or 0)
+    d_count = int(STATE.get(_limit_key("D", today)) or 0)
+    return {
+        "date": today,
+        "c_count": min(c_count, MAX_C_SIGNALS_PER_DAY),
+        "d_count": min(d_count, MAX_D_SIGNALS_PER_DAY)
+    }
+
+def can_send_grade(grade):
+    # شمارنده‌ی اتمی در backend تا چند نسخه سهمیه را دوبار حساب نکنند
+    if grade == "C":
+        cap = MAX_C_SIGNALS_PER_DAY
+    elif grade == "D":
+        cap = MAX_D_SIGNALS_PER_DAY
+    else:
+        return True
+    return STATE.incr(_limit_key(grade, today_str()), ttl=2 * 86400) <= cap
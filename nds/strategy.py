@@ -0,0 +1,324 @@
+import time
+
+from .config import (
+    SIGNAL_TF, TF_MS, BREAKOUT_MIN_MOVE, DEPTH_FEATURE_BPS, MIN_PROFIT_USD, DEFAULT_CAPITAL,
+    RISK_PERCENT, SAFE_LEVERAGE_LONG, SAFE_LEVERAGE_SHORT, REGIME_TF,
+    SIGNAL_GRACE_SECONDS, SIGNAL_POLL_SECONDS, FAST_POLL_SECONDS
+)
+from .indicators import calculate_atr, find_swings
+from .timeutil import time_str, today_str
+
+# =========================
+# SIGNAL CORE (قدیمی – برای سازگاری نگه داشته شده)
+# =========================
+def confidence_score(potential, rsi_conf=0, grade_level="A"):
+    base = 30 if grade_level == "A" else 25 if grade_level == "B" else 15 if grade_level == "C" else 10
+    s = base + rsi_conf
+    bonus = 25 if grade_level == "A" else 20 if grade_level == "B" else 10 if grade_level == "C" else 5
+    if potential > 1000:
+        s += bonus
+    if potential > 1500:
+        s += bonus
+    if potential > 2000:
+        s += bonus / 2
+    return min(s, 95)
+
+def build_signal(c, tf, funding, oi, bias, grade_level, rsi_conf,
+                 htf_bias=None, sr_target=None, atr=None, move_info=None):
+    last_close = c[-1]["close"]
+
+    if atr is None:
+        atr = calculate_atr(c)
+
+    if sr_target:
+        primary_target = sr_target
+    else:
+        if bias == "LONG":
+            primary_target = last_close + 3 * atr
+        else:
+            primary_target = last_close - 3 * atr
+
+    secondary_target = None
+    if move_info and move_info.get("move", 0) >= 1500:
+        if bias == "LONG":
+            secondary_target = primary_target + 2 * atr
+        else:
+            secondary_target = primary_target - 2 * atr
+
+    entry = last_close
+
+    if bias == "LONG":
+        sl = entry - 1.5 * atr
+        tp = primary_target
+        title = "🟢 BTC LONG – NDS PRO V7.8"
+        safe_lev = SAFE_LEVERAGE_LONG
+    else:
+        sl = entry + 1.5 * atr
+        tp = primary_target
+        title = "🔴 BTC SHORT – NDS PRO V7.8"
+        safe_lev = SAFE_LEVERAGE_SHORT
+
+    potential = abs(tp - entry)
+    if potential < MIN_PROFIT_USD:
+        return None, "POTENTIAL_TOO_LOW"
+
+    risk_usd = DEFAULT_CAPITAL * RISK_PERCENT
+    position_size_btc = risk_usd / abs(entry - sl) if abs(entry - sl) > 0 else 0
+
+    conf = confidence_score(potential, rsi_conf, grade_level)
+
+    if grade_level == "A":
+        warning = "عالی و مطمئن—ورود منطقی با پلن ریسک."
+    elif grade_level == "B":
+        warning = "خوب—با احتیاط و مدیریت ریسک."
+    elif grade_level == "C":
+        warning = "متوسط—تایید اضافه کمک می‌کند."
+    else:
+        warning = "تحلیلی و هشداردهنده—برای ورود کور مناسب نیست."
+
+    htf_text = f"HTF Bias (4h): {htf_bias}" if htf_bias else "HTF Bias (4h): نامشخص"
+
+    if secondary_target:
+        tp_text = f"TP1: {tp:.2f}\nTP2: {secondary_target:.2f}"
+    else:
+        tp_text = f"TP: {tp:.2f}"
+
+    move_text = ""
+    if move_info:
+        move_text = f"\nRecent Move ({move_info.get('tf')} window): ~{int(move_info['move'])} USDT"
+
+    message = f"""
+{title}
+
+TF Trigger: {tf}
+🕒 {time_str()}
+
+{htf_text}
+Direction: {bias}
+
+Entry: {entry:.2f}
+SL: {sl:.2f}
+{tp_text}
+
+Position Size (1% risk on ${DEFAULT_CAPITAL}): {position_size_btc:.4f} BTC
+Safe Leverage: {safe_lev}x
+Funding Rate: {funding:.4f}%
+Open Interest: {oi:,.0f}{move_text}
+
+Confidence: {conf}%
+Grade: {grade_level}
+{warning}
+
+⚠️ این یک تحلیل و سناریو است، نه تضمین.
+"""
+    return {
+        "date": today_str(),
+        "grade": grade_level,
+        "tf": tf,
+        "bias": bias,
+        "entry": entry,
+        "tp": tp,
+        "sl": sl,
+        "message": message
+    }, None
+
+# =========================
+# AUTO SIGNAL – STRATEGY B (1000 USD FILTER)
+# =========================
+def render_depth(depth):
+    if not depth:
+        return ""
+    text = (
+        f"\nDepth ±{DEPTH_FEATURE_BPS}bps: bid {depth['bid']:.2f} / ask {depth['ask']:.2f} BTC"
+        f" (imbalance {depth['imbalance']:+.2f})"
+    )
+    for name, wall in (("Break Level", depth.get("wall_ref")), ("Entry", depth.get("wall_entry"))):
+        if wall:
+            text += f"\nWall near {name}: {wall['side']} {wall['qty']:.2f} @ {wall['price']:.2f}"
+    return text
+
+def render_volume(sig):
+    text = ""
+    if sig.get("vwap"):
+        text += f"\nVWAP (UTC day): {sig['vwap']:.2f}"
+    p = sig.get("profile")
+    if p:
+        text += f"\nPOC 24h: {p['poc']:.2f} | VA: {p['val']:.2f} – {p['vah']:.2f}"
+    return text
+
+def render_regime(sig):
+    r = sig.get("regime")
+    if not r:
+        return ""
+    text = f"\nRegime ({REGIME_TF}): {r['label']} | ADX {r['adx']:.1f} | Vol {r['vol']:.1f}%/day"
+    if r["cluster"] > 1:
+        text += f"\nCorrelated with {r['cluster'] - 1} other symbols"
+    return text
+
+def render_signal(sig, fmt="full"):
+    if fmt == "compact":
+        return (
+            f"📡 {sig['symbol']} {sig['dir']} {sig['tf']} | Entry {sig['entry']:.2f} | "
+            f"SL {sig['sl']:.2f} | TP1 {sig['tp1']:.2f} | TP2 {sig['tp2']:.2f} | 🕒 {sig['time']}"
+        )
+    return f"""
+📡 BTC SIGNAL – STRATEGY B (V7.9)
+
+Direction: {sig['dir']}
+TF: {sig['tf']}
+
+Break Level: {sig['ref']:.2f}
+Entry: {sig['entry']:.2f}
+SL: {sig['sl']:.2f}
+TP1: {sig['tp1']:.2f}
+TP2: {sig['tp2']:.2f}
+
+Move Size: {abs(sig['entry'] - sig['ref']):.2f} USDT
+ATR Used: {sig['atr']:.2f}{render_volume(sig)}{render_depth(sig.get('depth'))}{render_regime(sig)}
+🕒 {sig['time']}
+"""
+
+def seconds_to_close(tf=SIGNAL_TF, now=None):
+    tf_ms = TF_MS[tf]
+    now_ms = (time.time() if now is None else now) * 1000
+    return ((now_ms // tf_ms + 1) * tf_ms - now_ms) / 1000
+
+def next_poll(near, tf=SIGNAL_TF, now=None):
+    # خروجی: (تاخیر، mode) اجرای بعدی auto_signal. کندل در حال شکل‌گیری هر
+    # SIGNAL_POLL_SECONDS (نزدیک سطح breakout هر FAST_POLL_SECONDS) بررسی می‌شود،
+    # و اگر بسته شدن کندل زودتر باشد، درست بعد از آن.
+    to_close = seconds_to_close(tf, now)
+    poll = FAST_POLL_SECONDS if near else SIGNAL_POLL_SECONDS
+    if poll < to_close:
+        return poll, "poll"
+    return to_close + SIGNAL_GRACE_SECONDS, "close"
+
+def candle_hash(c):
+    last = c[-1]
+    return hash((len(c), last["time"], last["open"], last["high"], last["low"], last["close"], last["volume"]))
+
+def evaluate_breakout(c):
+    # خروجی: (direction, ref, فاصله تا نزدیک‌ترین سطح تریگر)
+    last = c[-1]["close"]
+
+    # پیدا کردن Swing High / Low ساده
+    swing_high = max(x["high"] for x in c[-10:-2])
+    swing_low = min(x["low"] for x in c[-10:-2])
+
+    distance = min(
+        abs(swing_high + BREAKOUT_MIN_MOVE - last),
+        abs(last - (swing_low - BREAKOUT_MIN_MOVE))
+    )
+
+    # Breakout با شرط حرکت حداقل 1000 دلار
+    if last > swing_high and (last - swing_high) >= BREAKOUT_MIN_MOVE:
+        return "LONG", swing_high, distance
+    if last < swing_low and (swing_low - last) >= BREAKOUT_MIN_MOVE:
+        return "SHORT", swing_low, distance
+    return None, None, distance  # اگر حرکت کمتر از 1000 دلار بود → سیگنال نده
+
+def signal_atr(c):
+    # کف ATR تا روی بازار آرام SL/TP بیش از حد نزدیک نشوند
+    return max(calculate_atr(c), 15)
+
+def trade_levels(direction, entry, atr):
+    # خروجی: (sl, tp1, tp2)
+    if direction == "LONG":
+        return entry - 1.5 * atr, entry + 1.2 * atr, entry + 2.0 * atr
+    return entry + 1.5 * atr, entry - 1.2 * atr, entry - 2.0 * atr
+
+# =========================
+# STRUCTURE & PRICE ACTION (قدیمی – فعلاً استفاده نمی‌شود ولی نگه می‌داریم)
+# =========================
+def htf_bias_4h():
+    from .market import get_klines  # فقط این توابع قدیمی به شبکه نیاز دارند
+    c = get_klines("4h", limit=60)
+    if not c or len(c) < 10:
+        return None
+    lows = [x["low"] for x in c[-10:]]
+    highs = [x["high"] for x in c[-10:]]
+    long_count = sum(1 for i in range(1, 10) if lows[i] > lows[i-1])
+    short_count = sum(1 for i in range(1, 10) if highs[i] < highs[i-1])
+    if long_count >= 6:
+        return "LONG"
+    if short_count >= 6:
+        return "SHORT"
+    return None
+
+# =========================
+# SUPPORT / RESISTANCE (1H)
+# =========================
+def find_nearest_sr_1h(current_price, direction):
+    from .market import get_klines
+    c = get_klines("1h", limit=120)
+    if not c or len(c) < 20:
+        return None
+
+    highs = [x["high"] for x in c]
+    lows = [x["low"] for x in c]
+
+    if direction == "LONG":
+        candidates = [h for h in highs if h > current_price]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda x: x - current_price)
+    else:
+        candidates = [l for l in lows if l < current_price]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda x: current_price - x)
+
+# =========================
+# PRICE ACTION – STRATEGY B (BREAKOUT)
+# =========================
+def pa_breakout_signal():
+    from .market import get_klines
+    c = get_klines("15m", limit=60)
+    if not c or len(c) < 20:
+        return None
+
+    last = c[-1]["close"]
+    swing_high, swing_low = find_swings(c)
+
+    if swing_high and last > swing_high * 1.002:
+        return {"dir": "LONG", "ref": swing_high, "price": last}
+
+    if swing_low and last < swing_low * 0.998:
+        return {"dir": "SHORT", "ref": swing_low, "price": last}
+
+    return None
+
+def build_pa_message(sig):
+    from .market import get_klines
+    direction = sig["dir"]
+    ref = sig["ref"]
+    price = sig["price"]
+
+    c = get_klines("15m", limit=60)
+    atr = calculate_atr(c)
+
+    if direction == "LONG":
+        sl = ref - 1.5 * atr
+        tp1 = price + 1.2 * atr
+        tp2 = price + 2.0 * atr
+    else:
+        sl = ref + 1.5 * atr
+        tp1 = price - 1.2 * atr
+        tp2 = price - 2.0 * atr
+
+    return f"""
+📡 BTC BREAKOUT SIGNAL – NDS PRO V7.9 (Strategy B)
+
+Direction: {direction}
+TF: 15m
+
+Break Level: {ref:.2f}
+Price: {price:.2f}
+
+Entry: {ref:.2f}
+SL: {sl:.2f}
+TP1: {tp1:.2f}
+TP2: {tp2:.2f}
+
+🕒 {time_str()}
+"""
@@ -0,0 +1,109 @@
+from .config import SUBS_FILE
+from .state import STATE, load_json, save_json
+
+# =========================
+# SUBSCRIPTIONS (ROUTING)
+# =========================
+SUB_DIMS = ("symbol", "grade", "tf", "dir")
+SUB_FORMATS = ("full", "compact")
+
+class SubscriptionIndex:
+    # ایندکس معکوس (بُعد، مقدار) -> chat_id؛ لیست خالی یعنی «همه».
+    # کاربرانی که تنظیماتی ندارند همه‌ی سیگنال‌ها را می‌گیرند.
+    def __init__(self):
+        self.prefs = {}
+        self.index = {dim: {} for dim in SUB_DIMS}
+        self.any = {dim: set() for dim in SUB_DIMS}
+        self.version = None
+
+    def load(self):
+        version = STATE.get("subs:version")
+        data = load_json(SUBS_FILE, {})
+        self.__init__()
+        self.version = version
+        for cid, pref in data.items():
+            self._insert(int(cid), pref)
+
+    def save(self):
+        save_json(SUBS_FILE, {str(cid): pref for cid, pref in self.prefs.items()})
+        self.version = str(STATE.incr("subs:version"))
+
+    def sync(self):
+        if STATE.get("subs:version") != self.version:
+            self.load()
+
+    def _insert(self, chat_id, pref):
+        self.prefs[chat_id] = pref
+        for dim in SUB_DIMS:
+            values = pref.get(dim) or []
+            if not values:
+                self.any[dim].add(chat_id)
+            for v in values:
+                self.index[dim].setdefault(v, set()).add(chat_id)
+
+    def _drop(self, chat_id):
+        pref = self.prefs.pop(chat_id, None)
+        if pref is None:
+            return
+        for dim in SUB_DIMS:
+            self.any[dim].discard(chat_id)
+            for v in pref.get(dim) or []:
+                ids = self.index[dim].get(v)
+                if ids is not None:
+                    ids.discard(chat_id)
+                    if not ids:
+                        del self.index[dim][v]
+
+    def set(self, chat_id, pref):
+        self._drop(chat_id)
+        self._insert(chat_id, pref)
+        self.save()
+
+    def clear(self, chat_id):
+        self._drop(chat_id)
+        self.save()
+
+    def route(self, symbol, grade, tf, direction, audience, always=()):
+        # خروجی: {format: set(chat_id)}؛ always (ادمین) بدون فیلتر ولی فقط یک‌بار و با فرمت خودش
+        key = {"symbol": symbol, "grade": grade, "tf": tf, "dir": direction}
+        matched = None
+        for dim in SUB_DIMS:
+            exact = self.index[dim].get(key[dim], set())
+            hits = exact | self.any[dim] if self.any[dim] else exact
+            matched = hits if matched is None else matched & hits
+            if not matched:
+                break
+        groups = {}
+        for cid in (matched or set()) & audience:
+            groups.setdefault(self.prefs[cid].get("format", "full"), set()).add(cid)
+        defaults = audience - self.prefs.keys()
+        if defaults:
+            groups.setdefault("full", set()).update(defaults)
+        for cid in always:
+            if not any(cid in ids for ids in groups.values()):
+                groups.setdefault(self.prefs.get(cid, {}).get("format", "full"), set()).add(cid)
+        return groups
+
+def parse_subscription(args):
+    pref = {dim: [] for dim in SUB_DIMS}
+    pref["format"] = "full"
+    aliases = {"symbols": "symbol", "grades": "grade", "tfs": "tf", "dirs": "dir", "direction": "dir"}
+    for arg in args:
+        if "=" not in arg:
+            return None
+        k, v = arg.split("=", 1)
+        k = aliases.get(k.lower(), k.lower())
+        if k == "format":
+            if v.lower() not in SUB_FORMATS:
+                return None
+            pref["format"] = v.lower()
+            continue
+        if k not in SUB_DIMS:
+            return None
+        values = [x.strip() for x in v.split(",") if x.strip()]
+        pref[k] = [x.lower() if k == "tf" else x.upper() for x in values]
+    return pref
+
+def format_subscription(pref):
+    parts = [f"{dim}: {', '.join(pref.get(dim) or []) or 'ALL'}" for dim in SUB_DIMS]
+    return "\n".join(parts) + f"\nformat: {pref.get('format', 'full')}"
@@ -0,0 +1,17 @@
+from datetime import datetime, timedelta
+
+# =========================
+# TIME (IRAN)
+# =========================
+def iran_time():
+    return datetime.utcnow() + timedelta(hours=3, minutes=30)
+
+def time_str():
+    return iran_time().strftime("%Y-%m-%d | %H:%M")
+
+def today_str():
+    return iran_time().strftime("%Y-%m-%d")
+
+def ts_str(ms):
+    # زمان کندل (میلی‌ثانیه UTC) به وقت ایران
+    return (datetime.utcfromtimestamp(ms / 1000) + timedelta(hours=3, minutes=30)).strftime("%Y-%m-%d | %H:%M")
@@ -0,0 +1,134 @@
+import bisect
+from collections import deque
+
+from .config import PROFILE_BIN_USD, PROFILE_WINDOW, VALUE_AREA_SHARE
+
+# =========================
+# VOLUME ANALYTICS (PREFIX SUMS / PROFILE)
+# =========================
+def typical_price(c):
+    return (c["high"] + c["low"] + c["close"]) / 3
+
+class VolumeStats:
+    # جمع تجمعی volume و price×volume روی کش کندل‌ها؛ هر بازه O(1).
+    # اندیس‌ها نسبت به کندل‌های فعلی کش هستند: بازه‌ی [i, j).
+    def __init__(self):
+        self.times = []
+        self.cum_v = [0.0]
+        self.cum_pv = [0.0]
+
+    def __len__(self):
+        return len(self.times)
+
+    def _append(self, c):
+        self.times.append(c["time"])
+        self.cum_v.append(self.cum_v[-1] + c["volume"])
+        self.cum_pv.append(self.cum_pv[-1] + typical_price(c) * c["volume"])
+
+    def _replace_last(self, c):
+        self.cum_v[-1] = self.cum_v[-2] + c["volume"]
+        self.cum_pv[-1] = self.cum_pv[-2] + typical_price(c) * c["volume"]
+
+    def sync(self, candles):
+        # فقط کندل‌های جدید (و کندل در حال شکل‌گیری) اضافه می‌شوند
+        if not candles:
+            return
+        # کش از نو پر شده (فاصله‌ی بزرگ، یا تاریخچه‌ی قدیمی‌تر بعد از پر شدن کوتاه): بازسازی کامل
+        if not self.times or candles[0]["time"] > self.times[-1] or candles[0]["time"] < self.times[0]:
+            self.__init__()
+            for c in candles:
+                self._append(c)
+            return
+        k = bisect.bisect_left(self.times, candles[0]["time"])
+        if k:
+            del self.times[:k]
+            del self.cum_v[:k]
+            del self.cum_pv[:k]
+        i = len(candles)
+        while i and candles[i - 1]["time"] > self.times[-1]:
+            i -= 1
+        if i and candles[i - 1]["time"] == self.times[-1]:
+            self._replace_last(candles[i - 1])
+        for c in candles[i:]:
+            self._append(c)
+
+    def index_of(self, ts):
+        return bisect.bisect_left(self.times, ts)
+
+    def volume(self, i, j):
+        return self.cum_v[j] - self.cum_v[i]
+
+    def avg_volume(self, i, j):
+        return self.volume(i, j) / (j - i) if j > i else 0.0
+
+    def vwap(self, i, j):
+        v = self.volume(i, j)
+        return (self.cum_pv[j] - self.cum_pv[i]) / v if v > 0 else None
+
+    def anchored_vwap(self, anchor_ts):
+        return self.vwap(self.index_of(anchor_ts), len(self.times))
+
+class VolumeProfile:
+    # پروفایل حجم لغزان روی آخرین window کندل بسته؛ هر کندل جدید اضافه و
+    # قدیمی‌ترین کم می‌شود (حجم هر کندل به طور مساوی بین bin های low..high پخش می‌شود).
+    def __init__(self, bin_size=PROFILE_BIN_USD, window=PROFILE_WINDOW):
+        self.bin_size = bin_size
+        self.window = window
+        self.bins = {}
+        self.parts = deque()
+        self.last_time = None
+
+    def _split(self, c):
+        lo = int(c["low"] // self.bin_size)
+        hi = int(c["high"] // self.bin_size)
+        share = c["volume"] / (hi - lo + 1)
+        return [(b, share) for b in range(lo, hi + 1)]
+
+    def add(self, c):
+        part = self._split(c)
+        for b, v in part:
+            self.bins[b] = self.bins.get(b, 0.0) + v
+        self.parts.append(part)
+        if len(self.parts) > self.window:
+            for b, v in self.parts.popleft():
+                left = self.bins[b] - v
+                if left <= 1e-12:
+                    del self.bins[b]
+                else:
+                    self.bins[b] = left
+        self.last_time = c["time"]
+
+    def sync(self, closed):
+        start = len(closed)
+        while start and (self.last_time is None or closed[start - 1]["time"] > self.last_time):
+            start -= 1
+        for c in closed[max(start, len(closed) - self.window):]:
+            self.add(c)
+
+    def summary(self):
+        if not self.bins:
+            return None
+        poc = max(self.bins, key=self.bins.get)
+        total = sum(self.bins.values())
+        lo = hi = poc
+        first, last = min(self.bins), max(self.bins)
+        covered = self.bins[poc]
+        while covered < total * VALUE_AREA_SHARE:
+            below = self.bins.get(lo - 1, 0.0) if lo > first else None
+            above = self.bins.get(hi + 1, 0.0) if hi < last else None
+            if below is None and above is None:
+                break
+            if above is None or (below is not None and below > above):
+                lo -= 1
+                covered += below
+            else:
+                hi += 1
+                covered += above
+        size = self.bin_size
+        return {
+            "poc": (poc + 0.5) * size,
+            "val": lo * size,
+            "vah": (hi + 1) * size,
+            "volume": total,
+            "candles": len(self.parts)
+        }
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# تست‌ها هسته‌ی nds را مستقیم از ریشه‌ی مخزن import می‌کنند
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
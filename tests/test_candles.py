@@ -0,0 +1,55 @@
+import time
+import types
+
+import pytest
+
+import nds.market
+from nds.config import TF_MS, SIGNAL_TF
+from nds.volume import VolumeProfile
+
+BAR = TF_MS[SIGNAL_TF]
+
+def candle(i, price=100.0, volume=1.0):
+    return {"time": i * BAR, "open": price, "high": price, "low": price, "close": price, "volume": volume}
+
+@pytest.fixture
+def feed(monkeypatch):
+    # get_klines ساختگی: آخرین `limit` کندل از یک سری که تست رشدش می‌دهد
+    series = [candle(i) for i in range(200)]
+    calls = []
+
+    def get_klines(interval, limit, priority="urgent"):
+        calls.append((limit, priority))
+        return [dict(c) for c in series[-limit:]]
+
+    monkeypatch.setattr(nds.market, "get_klines", get_klines)
+    monkeypatch.setattr(nds.market, "CANDLES", {})
+    monkeypatch.setattr(nds.market, "VOLUME", {})
+    monkeypatch.setattr(nds.market, "PROFILE", VolumeProfile())
+    now = lambda: (series[-1]["time"] + BAR / 2) / 1000
+    monkeypatch.setattr(nds.market, "time", types.SimpleNamespace(time=now, sleep=time.sleep))
+    return series, calls
+
+def test_cold_fill_then_incremental_merge(feed):
+    series, calls = feed
+    c = nds.market.get_candles(SIGNAL_TF, limit=60)
+    assert len(c) == 60 and calls[-1][1] == "bulk"
+
+    series[-1] = candle(199, price=110.0, volume=3.0)  # کندل در حال شکل‌گیری عوض شد
+    series.append(candle(200, price=120.0))
+    c = nds.market.get_candles(SIGNAL_TF, limit=60)
+    assert calls[-1] == (3, "urgent")  # از آخرین کندل کش تا الان + ۲
+    assert [x["time"] for x in c[-2:]] == [199 * BAR, 200 * BAR]
+    assert c[-2]["close"] == 110.0
+
+    cache = nds.market.cached_candles()[SIGNAL_TF]
+    assert len({x["time"] for x in cache}) == len(cache)
+    assert len(nds.market.VOLUME[SIGNAL_TF]) == len(cache)
+
+def test_summaries_read_consistent_state(feed):
+    assert nds.market.vwap_summary(SIGNAL_TF) is None
+    nds.market.get_candles(SIGNAL_TF, limit=60)
+    v = nds.market.vwap_summary(SIGNAL_TF, hours=1)
+    assert v["window"] == 100.0 and v["avg_volume"] == 1.0
+    assert nds.market.session_vwap(SIGNAL_TF) == 100.0
+    assert nds.market.profile_summary()["poc"] > 0
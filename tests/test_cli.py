@@ -0,0 +1,27 @@
+import json
+
+import pytest
+
+from nds.config import SIGNAL_LOG_FILE, STATS_FILE
+from nds.state import STATE, MemoryState
+from nds.cli import main
+
+@pytest.fixture
+def state():
+    backend = STATE.backend
+    mem = STATE.use(MemoryState())
+    yield mem
+    STATE.use(backend)
+
+def test_backtest_does_not_write_stats(state, capsys):
+    state.set(SIGNAL_LOG_FILE, json.dumps([
+        {"date": "2026-10-01", "grade": "A", "tf": "15m"},
+        {"date": "2026-10-02", "grade": "B", "tf": "15m"},
+    ]))
+    assert main(["backtest"]) == 0
+    assert "تعداد کل ترید: 2" in capsys.readouterr().out
+    assert state.get(STATS_FILE) is None
+
+def test_backtest_without_signals(state, capsys):
+    assert main(["backtest"]) == 1
+    assert state.get(STATS_FILE) is None
@@ -0,0 +1,53 @@
+from nds.moves import StrongMoveDetector
+from nds.state import STATE, MemoryState
+from nds.storage import record_strong_move, get_day_stats
+from nds.timeutil import today_str
+
+BAR = 15 * 60 * 1000
+
+def bar(i, o, h, l, c):
+    return {"time": i * BAR, "open": o, "high": h, "low": l, "close": c, "volume": 1.0}
+
+def flat(i, price=30000.0):
+    return bar(i, price, price, price, price)
+
+def warmed(n=2):
+    det = StrongMoveDetector()
+    assert det.feed([flat(i) for i in range(n)]) == []  # اولین فراخوانی فقط گرم می‌کند
+    return det
+
+def test_fires_when_window_passes_threshold():
+    det = warmed()
+    assert det.feed([bar(2, 30000, 30300, 29990, 30250)]) == []  # دامنه‌ی 310 < 600
+    ev = warmed().feed([bar(2, 30000, 30700, 29990, 30650)])
+    assert [(e["tf"], e["window"], e["bias"]) for e in ev] == [("15m", 3, "LONG")]
+    assert (ev[0]["move"], ev[0]["net"]) == (710, 650)
+
+def test_same_move_is_not_repeated_but_reversal_fires():
+    det = warmed()
+    assert len(det.feed([bar(2, 30000, 30700, 29990, 30650)])) == 1
+    assert det.feed([bar(3, 30650, 30800, 30600, 30750)]) == []
+    ev = det.feed([bar(4, 30750, 30760, 29500, 29550)])
+    assert [(e["tf"], e["bias"]) for e in ev] == [("15m", "SHORT")]
+
+def test_each_symbol_has_its_own_dedupe_state():
+    btc, eth = warmed(), warmed()
+    move = bar(2, 30000, 30700, 29990, 30650)
+    assert len(btc.feed([move])) == 1
+    assert len(eth.feed([move])) == 1
+    assert btc.feed([bar(3, 30650, 30800, 30600, 30750)]) == []
+
+def test_base_candles_aggregate_into_higher_timeframes():
+    det = warmed()
+    det.feed([flat(2), flat(3)])
+    ev = det.feed([bar(4, 30000, 30500, 30000, 30500), bar(5, 30500, 31000, 30480, 30950)])
+    assert [e["tf"] for e in ev] == ["15m", "30m"]
+    assert (ev[1]["high"], ev[1]["low"], ev[1]["net"]) == (31000, 30000, 950)
+
+def test_moves_of_several_symbols_roll_into_one_daily_count(monkeypatch):
+    monkeypatch.setattr(STATE, "backend", MemoryState())
+    for symbol in ("BTCUSDT", "ETHUSDT"):
+        for ev in warmed().feed([bar(2, 30000, 30700, 29990, 30650)]):
+            ev.update({"date": today_str(), "symbol": symbol})
+            record_strong_move(ev)
+    assert get_day_stats()["strong"] == 2
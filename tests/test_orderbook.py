@@ -0,0 +1,46 @@
+import os
+
+from nds.orderbook import OrderBook, replay_depth
+
+FEED = os.path.join(os.path.dirname(__file__), "fixtures", "depth_feed.jsonl")
+
+def synced_book():
+    book = OrderBook("BTCUSDT")
+    book.apply_snapshot(100, [["99.0", "2"], ["98.0", "5"]], [["101.0", "1"], ["102.0", "4"]])
+    return book
+
+def test_diff_older_than_snapshot_is_ignored():
+    book = synced_book()
+    assert book.apply_diff(95, 100, [["99.0", "9"]], [])
+    assert book.bids.qty[99.0] == 2.0
+
+def test_contiguous_diffs_update_levels():
+    book = synced_book()
+    assert book.apply_diff(101, 102, [["99.5", "3"]], [["101.0", "0"]])
+    assert book.apply_diff(103, 103, [], [["100.5", "2"]])
+    assert book.bids.best() == 99.5
+    assert book.asks.best() == 100.5
+    assert 101.0 not in book.asks.qty
+    assert book.last_update_id == 103
+
+def test_sequence_gap_requires_resync():
+    book = synced_book()
+    assert not book.apply_diff(110, 111, [["99.8", "50"]], [])
+    assert not book.synced
+    assert book.resyncs == 1
+    # تا snapshot بعدی هیچ diff ی اعمال نمی‌شود
+    assert not book.apply_diff(112, 112, [["99.9", "50"]], [])
+    assert 99.8 not in book.bids.qty and 99.9 not in book.bids.qty
+    assert book.resyncs == 1
+
+    book.apply_snapshot(200, [["100.0", "1"]], [["100.2", "1"]])
+    assert book.apply_diff(201, 201, [["99.9", "4"]], [])
+    assert book.synced and book.last_update_id == 201
+
+def test_replay_recorded_feed():
+    book = replay_depth(FEED)
+    assert book.synced
+    assert book.resyncs == 1
+    assert book.last_update_id == 201
+    assert book.mid() == 100.1
+    assert book.bids.upto(99.9) == [(100.0, 1.0), (99.9, 4.0)]
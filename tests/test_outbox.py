@@ -0,0 +1,51 @@
+from nds.outbox import Outbox
+
+def restart(outbox):
+    # نمونه‌ی تازه روی همان ژورنال، مثل بعد از ری‌استارت
+    fresh = Outbox(outbox.path, outbox.max_age)
+    fresh.load()
+    return fresh
+
+def test_unacked_recipients_resume_after_restart(tmp_path):
+    box = Outbox(str(tmp_path / "outbox.jsonl"))
+    box.enqueue("s1", "signal:BTCUSDT", [(1, "full"), (2, "full"), (3, "compact")], now=100)
+    box.ack([("s1", 1, "sent"), ("s1", 3, "failed")])
+
+    box = restart(box)
+    assert box.due() == [("s1", 2, "full")]
+    box.ack([("s1", 2, "sent")])
+
+    box = restart(box)
+    assert box.due() == []
+    assert box.pending_count() == 0
+
+def test_newer_signal_supersedes_pending_copies(tmp_path):
+    box = Outbox(str(tmp_path / "outbox.jsonl"))
+    box.enqueue("s1", "signal:BTCUSDT", [(1, "old"), (2, "old")], now=100)
+    box.ack([("s1", 1, "sent")])
+    box.enqueue("s2", "signal:BTCUSDT", [(2, "new"), (3, "new")], now=200)
+    box.enqueue("e1", "signal:ETHUSDT", [(2, "eth")], now=200)
+    assert box.counts["superseded"] == 1
+
+    box = restart(box)
+    assert box.due() == [("s2", 2, "new"), ("s2", 3, "new"), ("e1", 2, "eth")]
+
+def test_stale_batches_expire(tmp_path):
+    box = Outbox(str(tmp_path / "outbox.jsonl"), max_age=60)
+    box.enqueue("s1", "signal:BTCUSDT", [(1, "old")], now=100)
+    box.enqueue("s2", "signal:ETHUSDT", [(1, "fresh")], now=150)
+    assert box.expire(now=200) == 1
+    assert box.due() == [("s2", 1, "fresh")]
+    assert restart(box).due() == [("s2", 1, "fresh")]
+
+def test_torn_last_line_is_skipped_and_compacted(tmp_path):
+    box = Outbox(str(tmp_path / "outbox.jsonl"))
+    box.enqueue("s1", "signal:BTCUSDT", [(1, "a"), (2, "a")], now=100)
+    box.ack([("s1", 1, "sent")])
+    with open(box.path, "a") as f:
+        f.write('{"op":"ack","id":"s1","sta')  # crash وسط نوشتن
+
+    box = restart(box)
+    assert box.due() == [("s1", 2, "a")]
+    with open(box.path) as f:
+        assert len(f.read().splitlines()) == 1
@@ -0,0 +1,62 @@
+from nds.config import OUTCOME_MAX_AGE_HOURS
+from nds.outcomes import TriggerIndex, OutcomeTracker
+
+def closed(updates):
+    return {signal_id: f for signal_id, f in updates if f.get("status") == "closed"}
+
+def long_signal(tracker, signal_id="s1", opened_ts=0):
+    tracker.register(signal_id, "BTCUSDT", "LONG", 100.0, 90.0, 110.0, 120.0, opened_ts)
+
+def test_trigger_index_returns_only_crossed_levels():
+    idx = TriggerIndex()
+    idx.add("a", 110, "above")
+    idx.add("b", 120, "above")
+    idx.add("c", 90, "below")
+    assert idx.crossed(111) == [("a", 110)]
+    assert idx.crossed(100) == []
+    idx.remove("c")
+    assert idx.crossed(80) == []
+    assert len(idx) == 1
+
+def test_tp1_then_sl_exits_at_stop_level():
+    t = OutcomeTracker()
+    long_signal(t)
+    updates = t.update("BTCUSDT", 111.0, now=10)
+    assert updates == [("s1", {"tp1_hit": True, "tp1_at": updates[0][1]["tp1_at"], "tp1_ts": 10})]
+    res = closed(t.update("BTCUSDT", 85.0, now=20))["s1"]
+    assert (res["result"], res["exit"], res["r"]) == ("TP1_SL", 90.0, -1.0)
+    assert (res["mfe_r"], res["mae_r"]) == (1.1, 1.5)
+    assert not t.open
+
+def test_gap_through_tp1_and_tp2_in_one_update():
+    t = OutcomeTracker()
+    long_signal(t)
+    updates = t.update("BTCUSDT", 125.0, now=10)
+    assert [f.get("tp1_hit") or f.get("result") for _, f in updates] == [True, "TP2"]
+    res = closed(updates)["s1"]
+    assert (res["exit"], res["r"], res["mfe_r"]) == (120.0, 2.0, 2.5)
+
+def test_short_stop_exits_at_level():
+    t = OutcomeTracker()
+    t.register("s1", "BTCUSDT", "SHORT", 100.0, 110.0, 90.0, 80.0, 0)
+    res = closed(t.update("BTCUSDT", 115.0, now=10))["s1"]
+    assert (res["result"], res["exit"], res["r"], res["mae_r"]) == ("SL", 110.0, -1.0, 1.5)
+
+def test_expiry_uses_last_tick_and_respects_now_zero():
+    t = OutcomeTracker()
+    long_signal(t, opened_ts=0)
+    assert t.update("BTCUSDT", 101.0, now=0) == []  # now=0 زمان معتبر است، نه «نامشخص»
+    res = closed(t.update("BTCUSDT", 102.0, now=OUTCOME_MAX_AGE_HOURS * 3600))["s1"]
+    assert (res["result"], res["exit"], res["r"]) == ("EXPIRED", 102.0, 0.2)
+
+def test_excursions_only_count_ticks_after_registration():
+    t = OutcomeTracker()
+    long_signal(t, "s1")
+    t.update("BTCUSDT", 95.0, now=1)
+    t.update("BTCUSDT", 105.0, now=2)
+    long_signal(t, "s2")
+    t.update("BTCUSDT", 104.0, now=3)
+    res = closed(t.update("BTCUSDT", 121.0, now=4))
+    assert (res["s1"]["mfe_r"], res["s1"]["mae_r"]) == (2.1, 0.5)
+    assert (res["s2"]["mfe_r"], res["s2"]["mae_r"]) == (2.1, 0.0)
+    assert t.path["BTCUSDT"] == []
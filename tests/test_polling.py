@@ -0,0 +1,21 @@
+from nds.config import TF_MS, SIGNAL_GRACE_SECONDS, SIGNAL_POLL_SECONDS, FAST_POLL_SECONDS
+from nds.strategy import seconds_to_close, next_poll
+
+TF = "15m"
+BAR = TF_MS[TF] / 1000
+
+def test_seconds_to_close_accepts_epoch_zero():
+    assert seconds_to_close(TF, now=0) == BAR
+    assert seconds_to_close(TF, now=BAR - 30) == 30
+
+def test_forming_candle_polled_at_baseline_cadence_between_closes():
+    assert next_poll(False, TF, now=0) == (SIGNAL_POLL_SECONDS, "poll")
+
+def test_fast_poll_only_near_a_level():
+    assert next_poll(True, TF, now=0) == (FAST_POLL_SECONDS, "poll")
+
+def test_close_wins_when_sooner_than_next_poll():
+    now = BAR - 60
+    assert next_poll(False, TF, now=now) == (60 + SIGNAL_GRACE_SECONDS, "close")
+    assert next_poll(True, TF, now=now) == (FAST_POLL_SECONDS, "poll")
+    assert next_poll(True, TF, now=BAR - 10) == (10 + SIGNAL_GRACE_SECONDS, "close")
@@ -0,0 +1,77 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from nds.config import TF_MS
+from nds.regime import wilder_adx, correlation_clusters, RegimeScanner, scan_universe
+
+TF = "1h"
+STEP = TF_MS[TF]
+
+def hlc(closes, spread=0.5):
+    close = np.array(closes, dtype=float)
+    return close + spread, close - spread, close
+
+def candles(closes, start=0):
+    return [
+        {"time": start + i * STEP, "open": c, "high": c + 0.5, "low": c - 0.5, "close": c, "volume": 1.0}
+        for i, c in enumerate(closes)
+    ]
+
+def walk(seed, n):
+    rng = np.random.default_rng(seed)
+    return (100 + np.cumsum(rng.normal(0, 1, n))).round(2).tolist()
+
+def test_adx_needs_two_periods_of_bars():
+    trend = [100.0 + i for i in range(28)]
+    high, low, close = hlc(np.column_stack([trend, trend]))
+    assert wilder_adx(high, low, close, period=14).tolist() == [0.0, 0.0]
+
+def test_adx_separates_trend_from_range():
+    n = 60
+    trend = [100.0 + i for i in range(n)]
+    chop = [100.0 + i % 2 for i in range(n)]
+    high, low, close = hlc(np.column_stack([trend, chop]))
+    adx = wilder_adx(high, low, close, period=14)
+    assert adx[0] > 90
+    assert adx[1] < 20
+
+def test_clusters_are_transitive():
+    # 0~1 و 1~2 همبسته‌اند ولی 0 و 2 نه؛ هر سه یک خوشه، 3 جدا
+    corr = np.array([
+        [1.0, 0.9, 0.5, 0.0],
+        [0.9, 1.0, 0.9, 0.0],
+        [0.5, 0.9, 1.0, 0.0],
+        [0.0, 0.0, 0.0, 1.0],
+    ])
+    assert correlation_clusters(corr, threshold=0.8).tolist() == [0, 0, 0, 3]
+
+def test_shift_moves_rows_and_resets_past_the_window():
+    scanner = RegimeScanner(TF, bars=5)
+    scanner.ingest({"A": candles([1, 2, 3, 4, 5])})
+    scanner._shift(scanner.end + 2 * STEP)
+    close = scanner.hlc[2, :, 0]
+    assert close[:3].tolist() == [3, 4, 5]
+    assert np.isnan(close[3:]).all()
+
+    scanner._shift(scanner.end + 5 * STEP)
+    assert np.isnan(scanner.hlc).all()
+
+def test_ingest_rewrites_the_forming_candle():
+    scanner = RegimeScanner(TF, bars=5)
+    scanner.ingest({"A": candles([1, 2, 3, 4, 5])})
+    scanner.ingest({"A": candles([9], start=4 * STEP)})
+    assert scanner.hlc[2, :, 0].tolist() == [1, 2, 3, 4, 9]
+
+def test_incremental_ingest_matches_fresh_scan():
+    full = {"A": candles(walk(1, 60)), "B": candles(walk(2, 60)), "C": candles(walk(3, 60))}
+    scanner = RegimeScanner(TF, bars=40)
+    scanner.ingest({s: c[:50] for s, c in full.items()})
+    assert scanner.missing(full) == []
+    scanner.ingest({s: c[45:] for s, c in full.items()})
+
+    fresh = scan_universe(full, TF, bars=40)
+    incremental = scanner.scan()
+    for key in ("time", "symbols", "adx", "vol", "change", "label", "clusters"):
+        assert incremental[key] == fresh[key]
+    assert incremental["avg_corr"] == pytest.approx(fresh["avg_corr"])
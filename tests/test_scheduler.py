@@ -0,0 +1,120 @@
+import pytest
+import requests
+
+import nds.market
+from nds.market import WeightBudget, CircuitBreaker, RequestScheduler, UpstreamUnavailable
+
+class Clock:
+    # زمان ساختگی؛ sleep فقط ساعت را جلو می‌برد
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def perf_counter(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(nds.market, "time", c)
+    return c
+
+class Response:
+    def __init__(self, status, data=None):
+        self.status_code = status
+        self.data = data
+        self.headers = {}
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(str(self.status_code))
+
+class Session:
+    def __init__(self):
+        self.script = []
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        step = self.script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        return step
+
+def scheduler(limit=100, failures=2, cooldown=30):
+    s = RequestScheduler(
+        "https://example.test", {"/heavy": 40},
+        WeightBudget(limit, 10, 0.5), CircuitBreaker(failures, cooldown)
+    )
+    s.session = Session()
+    return s
+
+def test_budget_reserves_within_window_and_reports_wait(clock):
+    budget = WeightBudget(100, 10, 0.5)
+    assert budget.try_reserve(40, "bulk") == 0
+    assert budget.try_reserve(20, "bulk") == 10  # سهم bulk (50) پر است
+    assert budget.try_reserve(60, "urgent") == 0
+    assert budget.try_reserve(1, "urgent") == 10
+    clock.now += 10
+    assert budget.try_reserve(100, "urgent") == 0
+
+def test_budget_reserve_waits_only_up_to_priority_deadline(clock):
+    budget = WeightBudget(10, 10, 1.0)
+    assert budget.reserve(10, "urgent")
+    assert not budget.reserve(1, "urgent")  # انتظار 10 ثانیه بیشتر از مهلت فوری است
+    assert budget.reserve(1, "bulk")
+    assert clock.now >= 1010
+
+def test_breaker_opens_and_half_opens_with_single_trial(clock):
+    breaker = CircuitBreaker(2, 30)
+    breaker.failure()
+    assert breaker.state == "closed"
+    breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+    clock.now += 30
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()  # فقط یک درخواست آزمایشی
+    breaker.failure()
+    assert breaker.state == "open"
+    clock.now += 30
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed" and breaker.allow()
+
+def test_every_failed_attempt_counts_and_open_breaker_stops_retries(clock):
+    s = scheduler(failures=2)
+    s.session.script = [requests.exceptions.ConnectionError()] * 4
+    with pytest.raises(UpstreamUnavailable):
+        s.get("/a")
+    assert s.session.calls == 2
+    assert s.breaker.state == "open"
+    with pytest.raises(UpstreamUnavailable, match="circuit open"):
+        s.get("/a")
+    assert s.session.calls == 2
+
+def test_trial_refused_by_budget_does_not_wedge_breaker(clock):
+    s = scheduler(limit=100, failures=1)
+    s.session.script = [Response(200, [1]), Response(500)]
+    assert s.get("/a") == [1]
+    assert s.get("/a") == [1]  # 500 → breaker باز، جواب کش
+    assert s.breaker.state == "open"
+
+    clock.now += 30
+    s.budget.try_reserve(100, "urgent")  # بودجه‌ی کل پنجره مصرف شد
+    assert s.get("/a") == [1]  # درخواست آزمایشی بدون بودجه → کش
+    assert s.session.calls == 2
+    assert s.breaker.state == "half-open" and not s.breaker.trial
+
+    clock.now += 10
+    s.session.script = [Response(200, [2])]
+    assert s.get("/a") == [2]
+    assert s.breaker.state == "closed"
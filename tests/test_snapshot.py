@@ -0,0 +1,69 @@
+import nds.snapshot
+from nds.moves import StrongMoveDetector
+from nds.outcomes import OutcomeTracker
+from nds.snapshot import write_snapshot, read_snapshot
+
+BAR = 15 * 60 * 1000
+
+def bar(i, o, h, l, c):
+    return {"time": i * BAR, "open": o, "high": h, "low": l, "close": c, "volume": 1.0}
+
+def live_state():
+    tracker = OutcomeTracker()
+    tracker.register("s1", "BTCUSDT", "LONG", 100.0, 90.0, 110.0, 120.0, 0)
+    tracker.register("s2", "BTCUSDT", "SHORT", 100.0, 105.0, 95.0, 90.0, 0)
+    tracker.update("BTCUSDT", 111.0, now=10)  # s1 به TP1 و s2 به SL می‌رسد
+    detector = StrongMoveDetector()
+    detector.feed([bar(i, 30000, 30000, 30000, 30000) for i in range(3)])
+    detector.feed([bar(3, 30000, 30700, 29990, 30650)])
+    return tracker, detector
+
+def write(path, tracker, detector, symbol="BTCUSDT"):
+    return write_snapshot({
+        "symbol": symbol,
+        "candles": {"15m": [bar(0, 1.0, 2.0, 0.5, 1.5)]},
+        "outcomes": tracker.to_state(),
+        "strong_moves": detector.to_state(),
+        "last_signal_key": [123, "LONG"],
+    }, str(path))
+
+def test_round_trip_restores_equivalent_objects(tmp_path):
+    path = tmp_path / "warm.bin"
+    tracker, detector = live_state()
+    assert write(path, tracker, detector)
+
+    state = read_snapshot(str(path), "BTCUSDT")
+    assert state["candles"]["15m"][0]["close"] == 1.5
+    assert state["last_signal_key"] == [123, "LONG"]
+    tracker2 = OutcomeTracker.from_state(state["outcomes"])
+    detector2 = StrongMoveDetector.from_state(state["strong_moves"])
+    assert tracker2.to_state() == tracker.to_state()
+    assert detector2.to_state() == detector.to_state()
+
+    # رفتار بعدی هم یکسان است: همان خروج و همان dedupe
+    assert tracker2.update("BTCUSDT", 121.0, now=20) == tracker.update("BTCUSDT", 121.0, now=20)
+    follow = [bar(4, 30650, 30800, 30600, 30750), bar(5, 30750, 30760, 29500, 29550)]
+    assert detector2.feed(follow) == detector.feed(follow)
+    assert not tracker2.open
+
+def test_corrupt_or_foreign_snapshots_are_rejected(tmp_path, monkeypatch):
+    tracker, detector = live_state()
+    path = tmp_path / "warm.bin"
+
+    write(path, tracker, detector)
+    raw = bytearray(path.read_bytes())
+    raw[-1] ^= 0xFF
+    path.write_bytes(bytes(raw))
+    assert read_snapshot(str(path), "BTCUSDT") is None  # CRC
+
+    write(path, tracker, detector, symbol="ETHUSDT")
+    assert read_snapshot(str(path), "BTCUSDT") is None
+
+    monkeypatch.setattr(nds.snapshot, "SNAPSHOT_VERSION", nds.snapshot.SNAPSHOT_VERSION + 1)
+    write(path, tracker, detector)
+    monkeypatch.undo()
+    assert read_snapshot(str(path), "BTCUSDT") is None
+
+    path.write_bytes(b"garbage")
+    assert read_snapshot(str(path), "BTCUSDT") is None
+    assert read_snapshot(str(tmp_path / "missing.bin"), "BTCUSDT") is None
@@ -0,0 +1,60 @@
+import pytest
+
+import nds.state
+from nds.state import MemoryState, SQLiteState, FileState
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(nds.state, "time", c)
+    return c
+
+@pytest.fixture(params=["memory", "sqlite", "file"])
+def make(request, tmp_path, monkeypatch):
+    # سازنده‌ای که چند نمونه‌ی متصل به یک store برمی‌گرداند (مثل چند نسخه‌ی ربات)
+    if request.param == "memory":
+        store = {}
+        return lambda: MemoryState(store)
+    if request.param == "sqlite":
+        path = str(tmp_path / "state.db")
+        return lambda: SQLiteState(path)
+    monkeypatch.chdir(tmp_path)
+    return lambda: FileState(str(tmp_path / "kv.json"))
+
+def test_lease_is_exclusive_until_released(make, clock):
+    a, b = make(), make()
+    assert a.acquire_lease("leader", "a", ttl=30)
+    assert not b.acquire_lease("leader", "b", ttl=30)
+    assert a.acquire_lease("leader", "a", ttl=30)  # تمدید
+    a.release_lease("leader", "b")  # فقط مالک می‌تواند آزاد کند
+    assert not b.acquire_lease("leader", "b", ttl=30)
+    a.release_lease("leader", "a")
+    assert b.acquire_lease("leader", "b", ttl=30)
+
+def test_lease_expires(make, clock):
+    a, b = make(), make()
+    assert a.acquire_lease("leader", "a", ttl=30)
+    clock.now += 31
+    assert b.acquire_lease("leader", "b", ttl=30)
+    assert not a.acquire_lease("leader", "a", ttl=30)
+
+def test_incr_ttl(make, clock):
+    a, b = make(), make()
+    assert a.incr("limit:C", ttl=60) == 1
+    assert b.incr("limit:C", ttl=60) == 2
+    assert a.get("limit:C") == "2"
+    clock.now += 30
+    assert a.incr("limit:C", ttl=60) == 3  # TTL از اولین incr حساب می‌شود، تمدید نمی‌شود
+    clock.now += 31
+    assert a.get("limit:C") is None
+    assert b.incr("limit:C", ttl=60) == 1
+    assert a.incr("version") == 1
+    clock.now += 10 ** 6
+    assert a.get("version") == "1"
@@ -0,0 +1,39 @@
+from nds.subscriptions import SubscriptionIndex, parse_subscription
+
+def index(prefs):
+    subs = SubscriptionIndex()
+    for chat_id, args in prefs.items():
+        subs._insert(chat_id, parse_subscription(args))
+    return subs
+
+def test_exact_and_wildcard_dimensions_intersect():
+    subs = index({
+        1: ["symbol=BTCUSDT"],                      # بقیه‌ی ابعاد «همه»
+        2: ["symbol=ETHUSDT"],
+        3: ["symbol=BTCUSDT,ETHUSDT", "dir=SHORT"],
+        4: ["tf=15m", "grade=D"],
+        5: ["tf=1h"],
+    })
+    groups = subs.route("BTCUSDT", "D", "15m", "LONG", {1, 2, 3, 4, 5})
+    assert groups == {"full": {1, 4}}
+    groups = subs.route("ETHUSDT", "D", "15m", "SHORT", {1, 2, 3, 4, 5})
+    assert groups == {"full": {2, 3, 4}}
+
+def test_groups_by_format_and_defaults_to_full():
+    subs = index({1: ["format=compact"], 2: ["symbol=BTCUSDT"], 3: ["symbol=ETHUSDT", "format=compact"]})
+    groups = subs.route("BTCUSDT", "D", "15m", "LONG", {1, 2, 3, 9})
+    assert groups == {"compact": {1}, "full": {2, 9}}
+
+def test_only_the_audience_receives():
+    subs = index({1: [], 2: []})
+    assert subs.route("BTCUSDT", "D", "15m", "LONG", {2}) == {"full": {2}}
+
+def test_admin_who_is_also_a_subscriber_gets_one_copy():
+    subs = index({7: ["format=compact"]})
+    groups = subs.route("BTCUSDT", "D", "15m", "LONG", {7, 8}, always=[7])
+    assert groups == {"compact": {7}, "full": {8}}
+
+def test_admin_filtered_out_still_receives_in_own_format():
+    subs = index({7: ["symbol=ETHUSDT", "format=compact"]})
+    assert subs.route("BTCUSDT", "D", "15m", "LONG", {7}, always=[7]) == {"compact": {7}}
+    assert SubscriptionIndex().route("BTCUSDT", "D", "15m", "LONG", set(), always=[7]) == {"full": {7}}
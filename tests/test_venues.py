@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from nds.market import (
+    StaticVenue, MexcVenue, RequestScheduler, WeightBudget, CircuitBreaker,
+    UpstreamUnavailable, hedged, composite_ticker
+)
+
+def warmed(venue, latency_ms):
+    # p95 از نمونه‌های قبلی می‌آید؛ بدون نمونه پیش‌فرض HEDGE_DEFAULT_MS است
+    venue.latencies.extend([latency_ms] * 5)
+    return venue
+
+def test_primary_answers_without_hedging():
+    primary = StaticVenue("A", 100.0)
+    backup = StaticVenue("B", 101.0)
+    assert hedged("ticker", "BTCUSDT", venues=[primary, backup]) == ("A", primary.ticker("BTCUSDT"))
+
+def test_falls_back_when_primary_fails():
+    primary = StaticVenue("A", 100.0, fail=True)
+    backup = StaticVenue("B", 101.0)
+    name, t = hedged("ticker", "BTCUSDT", venues=[primary, backup])
+    assert (name, t["price"]) == ("B", 101.0)
+    assert primary.failures == 1
+
+def test_fastest_answer_wins_after_hedge_delay():
+    primary = warmed(StaticVenue("A", 100.0, latency_ms=1500), 50)
+    backup = warmed(StaticVenue("B", 101.0, latency_ms=10), 50)
+    started = time.time()
+    name, _ = hedged("ticker", "BTCUSDT", venues=[primary, backup])
+    assert name == "B"
+    assert time.time() - started < 1.0
+
+def test_all_venues_down():
+    venues = [StaticVenue("A", 100.0, fail=True), StaticVenue("B", 101.0, fail=True)]
+    assert hedged("ticker", "BTCUSDT", venues=venues) is None
+    assert composite_ticker("BTCUSDT", venues=venues, timeout=1) is None
+
+def test_composite_does_not_wait_for_slow_venue():
+    venues = [
+        StaticVenue("A", 100.0, quote_volume=3.0),
+        StaticVenue("B", 104.0, quote_volume=1.0),
+        StaticVenue("C", 500.0, latency_ms=2000),
+    ]
+    started = time.time()
+    comp = composite_ticker("BTCUSDT", venues=venues, settle=0.2)
+    assert time.time() - started < 1.0
+    assert sorted(name for name, _ in comp["quotes"]) == ["A", "B"]
+    assert comp["price"] == 101.0
+
+def stale_mexc():
+    # پاسخ قدیمی در cache هست ولی بودجه تمام شده؛ scheduler عادی همان را برمی‌گرداند
+    http = RequestScheduler("https://mexc.test", {}, WeightBudget(1, 60, 1.0), CircuitBreaker(3, 60))
+    key = ("/api/v3/ticker/24hr", (("symbol", "BTCUSDT"),))
+    http.cache[key] = (0, {"lastPrice": "90", "priceChangePercent": "0", "highPrice": "90"})
+    http.budget.try_reserve(1, "urgent")
+    return http
+
+def test_venue_does_not_answer_from_stale_cache():
+    http = stale_mexc()
+    assert http.get("/api/v3/ticker/24hr", params={"symbol": "BTCUSDT"})["lastPrice"] == "90"
+    with pytest.raises(UpstreamUnavailable):
+        MexcVenue(http).ticker("BTCUSDT")
+
+def test_hedge_moves_past_stale_venue():
+    stale = MexcVenue(stale_mexc())
+    backup = StaticVenue("B", 101.0)
+    name, t = hedged("ticker", "BTCUSDT", venues=[stale, backup])
+    assert (name, t["price"]) == ("B", 101.0)
+    assert stale.failures == 1
+
+def test_half_open_with_trial_in_flight_is_not_healthy():
+    venue = MexcVenue(stale_mexc())
+    breaker = venue.http.breaker
+    breaker.opened_at = time.time() - 120
+    assert venue.healthy()
+    breaker.allow()
+    assert not venue.healthy()
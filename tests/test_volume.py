@@ -0,0 +1,19 @@
+from nds.volume import VolumeStats
+
+def candle(t, volume=1.0, price=100.0):
+    return {"time": t, "open": price, "high": price, "low": price, "close": price, "volume": volume}
+
+def test_sync_appends_only_new_candles():
+    stats = VolumeStats()
+    stats.sync([candle(t) for t in range(1, 6)])
+    stats.sync([candle(t) for t in range(3, 8)] + [candle(8, volume=2.0)])
+    assert stats.times == [3, 4, 5, 6, 7, 8]
+    assert stats.volume(0, len(stats)) == 7.0
+
+def test_sync_rebuilds_when_older_history_arrives():
+    # پر شدن کوتاه کش و بعد تاریخچه‌ی کامل
+    stats = VolumeStats()
+    stats.sync([candle(10), candle(11)])
+    stats.sync([candle(t) for t in range(1, 12)])
+    assert len(stats) == 11
+    assert stats.anchored_vwap(1) == 100.0